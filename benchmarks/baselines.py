@@ -0,0 +1,48 @@
+"""
+Baselines to compare benchmark results against
+
+Timings only mean something next to timings from the same machine, python
+and json backend, so a baseline records where it was made and isn't compared
+against anywhere else.
+"""
+from iam_syncr import jsonlib
+
+import platform
+import json
+import os
+
+def environment():
+    """Return what our timings depend on other than our code"""
+    return {
+          "node": platform.node()
+        , "system": platform.system()
+        , "machine": platform.machine()
+        , "python": platform.python_version()
+        , "implementation": platform.python_implementation()
+        , "json": jsonlib.backend.name
+        }
+
+def save_baseline(location, results):
+    with open(location, "w") as fle:
+        json.dump({"environment": environment(), "results": results}, fle, sort_keys=True, indent=2, separators=(",", ": "))
+    print("Saved baseline to {0}".format(location))
+
+def load_baseline(location):
+    """Return the results in the baseline at this location, or None if there isn't one we can compare against"""
+    if not os.path.exists(location):
+        print("No baseline at {0}, use --save to make one".format(location))
+        return None
+
+    with open(location) as fle:
+        baseline = json.load(fle)
+
+    current = environment()
+    saved = baseline.get("environment") or {}
+    different = sorted(key for key in current if saved.get(key) != current[key])
+    if different:
+        print("WARNING: not comparing against {0}, it was made with a different {1}. Use --save to make a baseline here".format(location, ", ".join(different)))
+        for key in different:
+            print("    {0}: baseline={1} here={2}".format(key, saved.get(key), current[key]))
+        return None
+
+    return baseline["results"]
@@ -0,0 +1,154 @@
+"""
+Generate account folders full of configuration for benchmarking
+
+Makes folders in the shape of ``example/`` with an accounts.yaml next to a
+folder for each account. Each account gets ``items`` things spread across
+``files`` yaml files::
+
+    python -m benchmarks.generate /tmp/syncr 1000 --files 20
+"""
+import argparse
+import random
+import yaml
+import six
+import os
+
+ACCOUNTS = (("development", "888888888888"), ("staging", "999999999999"))
+
+SERVICES = ("ec2", "lambda", "ecs-tasks")
+ACTIONS = ("s3:GetObject", "s3:PutObject", "ec2:Describe*", "sqs:SendMessage", "sns:Publish", "dynamodb:Query", "logs:PutLogEvents", "kms:Decrypt")
+
+def generate(folder, items, files=10, seed=1, keys=not six.PY2):
+    """
+    Write accounts.yaml and a folder of configuration for each account into this folder
+
+    Return {account_name: account_id}
+    """
+    accounts = dict(ACCOUNTS)
+    rand = random.Random(seed)
+
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    with open(os.path.join(folder, "accounts.yaml"), "w") as fle:
+        yaml.safe_dump(accounts, fle, default_flow_style=False)
+
+    for account, _ in ACCOUNTS:
+        others = [name for name, _ in ACCOUNTS if name != account]
+        configurations = make_account(account, others, items, rand, keys=keys)
+
+        account_folder = os.path.join(folder, account)
+        if not os.path.exists(account_folder):
+            os.makedirs(account_folder)
+
+        for index in range(files):
+            configuration = {}
+            for kind, things in configurations.items():
+                mine = sorted(things)[index::files]
+                if mine:
+                    configuration[kind] = dict((name, things[name]) for name in mine)
+
+            with open(os.path.join(account_folder, "things{0:04d}.yaml".format(index)), "w") as fle:
+                yaml.safe_dump(configuration, fle, default_flow_style=False)
+
+    return accounts
+
+def counts_for(items, keys=True):
+    """Return how many of each kind of thing make up this many items"""
+    templates = max(1, items // 20)
+    buckets = max(1, items // 8)
+    kms = max(1, items // 10) if keys else 0
+    roles = max(1, items - templates - buckets - kms)
+    return {"templates": templates, "roles": roles, "buckets": buckets, "keys": kms}
+
+def make_account(account, others, items, rand, keys=True):
+    """Return {kind: {name: definition}} for this account"""
+    counts = counts_for(items, keys=keys)
+    role_names = ["{0}-role-{1:05d}".format(account, index) for index in range(counts["roles"])]
+
+    def other_role():
+        other = rand.choice(others)
+        return {"account": other, "iam": "role/{0}-role-{1:05d}".format(other, rand.randrange(counts["roles"]))}
+
+    def permissions(resource):
+        return [{"action": sorted(rand.sample(ACTIONS, rand.randint(1, 3))), "resource": resource} for _ in range(rand.randint(1, 4))]
+
+    templates = {}
+    for index in range(counts["templates"]):
+        templates["template-{0:03d}".format(index)] = {
+              "description": "A template for roles"
+            , "allow_to_assume_me": [{"service": rand.choice(SERVICES)}]
+            , "allow_permission": permissions("*") + [{"action": "iam:GetRole", "resource": {"iam": "__self__"}}]
+            }
+
+    roles = {}
+    for index, name in enumerate(role_names):
+        role = {
+              "description": "Role number {0}".format(index)
+            , "allow_to_assume_me": [other_role() for _ in range(rand.randint(1, 3))]
+            , "allow_permission": permissions([{"s3": "{0}-bucket-{1:05d}/*".format(account, rand.randrange(counts["buckets"]))}])
+            }
+
+        if rand.random() < 0.3:
+            role["allow_permission"].append({"action": "sts:AssumeRole", "resource": [other_role() for _ in range(rand.randint(1, 3))]})
+        if rand.random() < 0.2:
+            role["allow_to_assume_me"].append({"federated": "arn:aws:iam::{0}:saml-provider/idp".format(dict(ACCOUNTS)[account])})
+        if rand.random() < 0.5:
+            role["use"] = "template-{0:03d}".format(rand.randrange(counts["templates"]))
+        if rand.random() < 0.3:
+            role["make_instance_profile"] = True
+        roles[name] = role
+
+    buckets = {}
+    for index in range(counts["buckets"]):
+        name = "{0}-bucket-{1:05d}".format(account, index)
+        buckets[name] = {
+              "location": "ap-southeast-2"
+            , "tags": {"owner": rand.choice(role_names), "number": str(index)}
+            , "allow_permission": [
+                  {"principal": other_role(), "action": "s3:GetObject", "resource": {"s3": "{0}/*".format(name)}}
+                ]
+            }
+
+    kms = {}
+    for index in range(counts["keys"]):
+        kms["{0}-key-{1:05d}".format(account, index)] = {
+              "location": "ap-southeast-2"
+            , "description": "Key number {0}".format(index)
+            , "admin_users": {"account": account, "iam": "role/{0}".format(rand.choice(role_names))}
+            , "grant": [{"grantee": {"account": account, "iam": "role/{0}".format(rand.choice(role_names))}, "operations": ["Decrypt", "Encrypt"]}]
+            }
+
+    result = {"templates": templates, "roles": roles, "buckets": buckets}
+    if kms:
+        result["keys"] = kms
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate configuration for benchmarking iam_syncr")
+    parser.add_argument("folder"
+        , help = "Folder to put the configuration in"
+        )
+
+    parser.add_argument("items"
+        , help = "How many things to make for each account"
+        , type = int
+        )
+
+    parser.add_argument("--files"
+        , help = "How many files to spread the things across"
+        , type = int
+        , default = 10
+        )
+
+    parser.add_argument("--seed"
+        , help = "Seed for the random choices"
+        , type = int
+        , default = 1
+        )
+
+    args = parser.parse_args(argv)
+    generate(args.folder, args.items, files=args.files, seed=args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Microbenchmarks of the cpu heavy parts of a sync
+
+Covers expanding statements, comparing documents and the json we make and
+parse, which is most of what a sync that changes nothing spends its time on::
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --save
+    python -m benchmarks.micro --only compare
+
+The inputs are fixed and each case is timed as the best of several repeats of
+a fixed number of calls, so runs on the same machine can be compared. Results
+are compared against a json baseline made on this machine, like
+``benchmarks.run`` does.
+"""
+from iam_syncr.amazon.documents import AmazonDocuments
+from iam_syncr.statements import Statements
+from iam_syncr import jsonlib
+from iam_syncr import policy
+
+from benchmarks.baselines import save_baseline, load_baseline
+
+import argparse
+import timeit
+import random
+import json
+import sys
+import os
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro_baseline.json")
+
+ACCOUNTS = dict(("account{0:02d}".format(index), str(100000000000 + index)) for index in range(30))
+ACCOUNT_ID = ACCOUNTS["account00"]
+
+def statements(name="thing", self_type="role", location=None):
+    return Statements(name, self_type, ACCOUNT_ID, ACCOUNTS, location=location)
+
+def document(statements):
+    return json.dumps({"Version": "2012-10-17", "Statement": statements}, indent=2)
+
+def reordered(doc, seed=1):
+    """Return the same document with all its lists and keys in a different order"""
+    rand = random.Random(seed)
+
+    def shuffle(obj):
+        if isinstance(obj, list):
+            obj = [shuffle(item) for item in obj]
+            rand.shuffle(obj)
+            return obj
+        if isinstance(obj, dict):
+            items = [(key, shuffle(val)) for key, val in obj.items()]
+            rand.shuffle(items)
+            return dict(items)
+        return obj
+
+    loaded = json.loads(doc)
+    loaded["Statement"] = [shuffle(statement) for statement in loaded["Statement"]]
+    return json.dumps(loaded)
+
+def big_statements(count=40):
+    """Statements like the ones we make for a role with a lot going on"""
+    found = []
+    for index in range(count):
+        found.append({
+              "Effect": "Allow"
+            , "Action": sorted(["s3:GetObject", "s3:PutObject", "sqs:SendMessage", "sns:Publish"][:1 + index % 4])
+            , "Resource": sorted(["arn:aws:s3:::bucket-{0}/{1}".format(index, key) for key in range(1 + index % 5)])
+            , "Principal": {"AWS": sorted("arn:aws:iam::{0}:role/role-{1}".format(account_id, index) for account_id in sorted(ACCOUNTS.values())[:1 + index % 6])}
+            })
+    return found
+
+def cases():
+    """Return [(group, name, func), ...] of everything we benchmark"""
+    role = statements()
+    bucket = statements("my-bucket", "bucket")
+    key = statements("my-key", "key", location="ap-southeast-2")
+
+    many_resources = {
+          "action": ["s3:GetObject", "s3:PutObject"]
+        , "resource": [{"s3": "bucket-{0}".format(index)} for index in range(20)]
+            + [{"iam": "role/role-{0}".format(index), "account": "account{0:02d}".format(index % 30)} for index in range(20)]
+            + ["arn:aws:sqs:ap-southeast-2:{0}:queue-{1}".format(ACCOUNT_ID, index) for index in range(10)]
+        }
+
+    many_accounts = {
+          "action": "sts:AssumeRole"
+        , "resource": {"iam": ["role/deploy", "role/ci"], "account": sorted(ACCOUNTS)}
+        }
+
+    many_principals = {"principal": [{"iam": "role/reader", "account": account} for account in sorted(ACCOUNTS)], "action": "s3:GetObject", "resource": {"s3": "__self__"}}
+
+    self_references = [
+          {"action": "iam:GetRole", "resource": {"iam": "__self__"}}
+        , {"action": "kms:Decrypt", "resource": {"kms": "__self__"}}
+        ]
+
+    federated = {"federated": {"iam": "saml-provider/idp", "account": ["account01", "account02"]}}
+    trust = [{"service": "ec2"}, {"iam": "role/ci", "account": sorted(ACCOUNTS)[:10]}]
+
+    small = document(big_statements(3))
+    large = document(big_statements(40))
+    different = json.loads(large)
+    different["Statement"][20]["Action"] = "s3:DeleteObject"
+    different = document(different["Statement"])
+    loaded = json.loads(large)
+
+    documents = AmazonDocuments()
+    def compare(first, second):
+        def compare():
+            # A sync only sees each document once, so don't let them be remembered
+            policy.documents.clear()
+            return list(documents.compare_two_documents(first, second) or [])
+        return compare
+
+    def detect(first, second):
+        def detect():
+            policy.documents.clear()
+            return bool(documents.document_change(first, second))
+        return detect
+
+    return [
+          ("statements", "many_resources", lambda: list(role.make_permission_statements(many_resources, allow=True)))
+        , ("statements", "many_accounts", lambda: list(role.make_permission_statements(many_accounts, allow=True)))
+        , ("statements", "many_principals", lambda: list(bucket.make_permission_statements(many_principals, allow=True)))
+        , ("statements", "self_references", lambda: [list(key.make_permission_statements(policy, allow=True)) for policy in self_references[1:]] + [list(role.make_permission_statements(self_references[0], allow=True))])
+        , ("statements", "federated_trust", lambda: list(role.expand_trust_statement(federated, allow=True)))
+        , ("statements", "expand_principal", lambda: [list(role.expand_trust_statement(statement, allow=True)) for statement in trust])
+        , ("compare", "identical_small", compare(small, small))
+        , ("compare", "identical_large", compare(large, large))
+        , ("compare", "reordered_large", compare(large, reordered(large)))
+        , ("compare", "different_large", compare(large, different))
+        , ("compare", "detect_different_large", detect(large, different))
+        , ("json", "dumps_large", lambda: jsonlib.dumps(loaded))
+        , ("json", "loads_large", lambda: jsonlib.loads(large))
+        ]
+
+def run(only=None, number=200, repeat=5):
+    """Return {"<group>.<name>": {"usec_per_call": <best>}}"""
+    results = {}
+    for group, name, func in cases():
+        if only and group not in only and "{0}.{1}".format(group, name) not in only:
+            continue
+
+        best = min(timeit.Timer(func).repeat(repeat=repeat, number=number))
+        results["{0}.{1}".format(group, name)] = {"usec_per_call": round(best / number * 1000000, 3)}
+    return results
+
+def regressions(results, baseline, threshold):
+    """Return [(case, expected, got), ...] for cases that got slower than the threshold allows"""
+    found = []
+    for case, result in sorted(results.items()):
+        if case in baseline:
+            expected = baseline[case]["usec_per_call"]
+            if result["usec_per_call"] > expected * (1 + threshold):
+                found.append((case, expected, result["usec_per_call"]))
+    return found
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks of statement expansion and document comparison")
+    parser.add_argument("--only"
+        , help = "Only run these groups or cases (i.e. statements or compare.identical_large)"
+        , nargs = "+"
+        )
+
+    parser.add_argument("--number"
+        , help = "How many calls make up one timing"
+        , type = int
+        , default = 200
+        )
+
+    parser.add_argument("--repeat"
+        , help = "How many timings to take the best of"
+        , type = int
+        , default = 5
+        )
+
+    parser.add_argument("--baseline"
+        , help = "Json file of results to compare against"
+        , default = BASELINE
+        )
+
+    parser.add_argument("--threshold"
+        , help = "How much slower than the baseline a case may get, as a fraction"
+        , type = float
+        , default = 0.25
+        )
+
+    parser.add_argument("--save"
+        , help = "Save these results as the baseline instead of comparing"
+        , action = "store_true"
+        )
+
+    args = parser.parse_args(argv)
+    results = run(only=args.only, number=args.number, repeat=args.repeat)
+    for case, result in sorted(results.items()):
+        print("{0:<32} {1:>12.3f} usec/call".format(case, result["usec_per_call"]))
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        return
+
+    found = regressions(results, baseline, args.threshold)
+    for case, expected, got in found:
+        print("REGRESSION case={0} baseline={1} got={2} usec/call".format(case, expected, got))
+
+    if found:
+        sys.exit(1)
+    print("No case got more than {0}% slower than the baseline".format(int(args.threshold * 100)))
+
+if __name__ == '__main__':
+    main()
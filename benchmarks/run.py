@@ -0,0 +1,225 @@
+"""
+End to end benchmarks of iam_syncr against the pretend amazon
+
+For each size we generate configuration, then time each phase of a sync of one
+account and report how many items per second it got through::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 10 100 --save
+    python -m benchmarks.run --threshold 0.3
+
+Results are compared against a json baseline and we exit with 1 if any phase
+got slower by more than the threshold. Timings only mean something next to
+timings from the same machine and python, so the baseline has to be made here
+with ``--save`` first, and a baseline made anywhere else isn't compared against.
+"""
+from iam_syncr.executor import make_amazon, find_configurations, parse_configurations
+from iam_syncr.amazon.fake import FakeAmazonBackend
+from iam_syncr.syncer import Sync
+
+from benchmarks.baselines import save_baseline, load_baseline
+from benchmarks.generate import generate
+
+from contextlib import contextmanager
+import argparse
+import tempfile
+import shutil
+import copy
+import time
+import sys
+import os
+
+timer = getattr(time, "perf_counter", time.time)
+
+PHASES = ("parse", "combine", "setup", "compile", "resolve", "noop_resolve")
+SIZES = (10, 100, 1000, 10000)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+@contextmanager
+def quiet():
+    """Don't let the changes we print get in the way"""
+    original = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = original
+
+def fake_backend(account_id, latency=0):
+    """Make a pretend account that has enough in it for Amazon.setup"""
+    backend = FakeAmazonBackend(account_id, latency=latency, seed=1)
+    backend.add_role("bootstrap")
+    backend.add_user("admin")
+    return backend
+
+def new_sync(amazon):
+    sync = Sync(amazon)
+    sync.register_default_types()
+    return sync
+
+def setup_things(sync, combined):
+    """Setup everything in combined the same way sync does, without resolving"""
+    for _, name in sorted(sync.the_types):
+        if name in combined:
+            things = sync.create_things(combined[name], name)
+            for thing in things:
+                thing.setup()
+            sync.remember_templates(name, things)
+
+def run_once(folder, latency=0):
+    """Time each phase of syncing the development account in this folder"""
+    timings = {}
+    account_folder = os.path.join(folder, "development")
+
+    @contextmanager
+    def timed(phase):
+        start = timer()
+        yield
+        timings[phase] = timer() - start
+
+    backend = fake_backend(888888888888, latency=latency)
+    amazon = make_amazon(account_folder, backend=backend)
+    found = find_configurations(account_folder, "*.yaml")
+
+    with timed("parse"):
+        parsed = parse_configurations(found)
+
+    with timed("combine"):
+        sync = new_sync(amazon)
+        for location, configuration in sorted(parsed.items()):
+            sync.add(configuration, location)
+        combined = sync.combine_configurations()
+
+    # Setting up changes the definitions, so each phase gets its own copy
+    items = sum(len(things) for things in combined.values())
+    fresh = [copy.deepcopy(combined) for _ in range(4)]
+
+    with timed("setup"):
+        setup_things(new_sync(amazon), fresh[0])
+
+    with timed("compile"):
+        new_sync(amazon).compile(fresh[1])
+
+    # Each sync gets its own Amazon so noop_resolve can't use what resolve read
+    # and has to ask the pretend amazon again, like a second run would
+    with quiet():
+        amazon = make_amazon(account_folder, backend=backend)
+        with timed("resolve"):
+            new_sync(amazon).sync(fresh[2])
+
+        amazon = make_amazon(account_folder, backend=backend)
+        with timed("noop_resolve"):
+            new_sync(amazon).sync(fresh[3])
+
+    return items, timings, backend.total_calls
+
+def run(sizes=SIZES, repeat=3, files=10, latency=0):
+    """Return {size: {phase: {seconds, items_per_second}}} using the best of repeat runs"""
+    results = {}
+    for size in sizes:
+        folder = tempfile.mkdtemp(prefix="iam_syncr_benchmark")
+        try:
+            generate(folder, size, files=files)
+            best = {}
+            for _ in range(repeat):
+                items, timings, calls = run_once(folder, latency=latency)
+                for phase, seconds in timings.items():
+                    best[phase] = min(best.get(phase, seconds), seconds)
+        finally:
+            shutil.rmtree(folder)
+
+        results[str(size)] = dict(
+              (phase, {"seconds": round(seconds, 6), "items_per_second": round(items / max(seconds, 1e-9), 2)})
+              for phase, seconds in best.items()
+            )
+        results[str(size)]["items"] = items
+        results[str(size)]["calls"] = calls
+    return results
+
+def regressions(results, baseline, threshold):
+    """Return [(size, phase, expected, got), ...] for phases that got slower than the threshold allows"""
+    found = []
+    for size, phases in sorted(results.items()):
+        for phase in PHASES:
+            if phase not in phases or phase not in baseline.get(size, {}):
+                continue
+
+            expected = baseline[size][phase]["items_per_second"]
+            got = phases[phase]["items_per_second"]
+            if got < expected * (1 - threshold):
+                found.append((size, phase, expected, got))
+    return found
+
+def report(results):
+    lines = ["{0:>8} {1:>8} {2:>8}  {3}".format("size", "items", "calls", "  ".join("{0:>14}".format(phase) for phase in PHASES))]
+    for size, phases in sorted(results.items(), key=lambda item: int(item[0])):
+        per_phase = "  ".join("{0:>14}".format(phases[phase]["items_per_second"] if phase in phases else "-") for phase in PHASES)
+        lines.append("{0:>8} {1:>8} {2:>8}  {3}".format(size, phases["items"], phases["calls"], per_phase))
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark iam_syncr against a pretend amazon (numbers are items per second)")
+    parser.add_argument("--sizes"
+        , help = "How many items to sync for each run"
+        , type = int
+        , nargs = "+"
+        , default = SIZES
+        )
+
+    parser.add_argument("--repeat"
+        , help = "How many times to run each size, the best run is used"
+        , type = int
+        , default = 3
+        )
+
+    parser.add_argument("--files"
+        , help = "How many files to spread the configuration across"
+        , type = int
+        , default = 10
+        )
+
+    parser.add_argument("--latency"
+        , help = "Seconds the pretend amazon takes for each call"
+        , type = float
+        , default = 0
+        )
+
+    parser.add_argument("--baseline"
+        , help = "Json file of results to compare against"
+        , default = BASELINE
+        )
+
+    parser.add_argument("--threshold"
+        , help = "How much slower than the baseline a phase may get, as a fraction"
+        , type = float
+        , default = 0.25
+        )
+
+    parser.add_argument("--save"
+        , help = "Save these results as the baseline instead of comparing"
+        , action = "store_true"
+        )
+
+    args = parser.parse_args(argv)
+    results = run(sizes=args.sizes, repeat=args.repeat, files=args.files, latency=args.latency)
+    print(report(results))
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        return
+
+    found = regressions(results, baseline, args.threshold)
+    for size, phase, expected, got in found:
+        print("REGRESSION size={0} phase={1} baseline={2} got={3} items/second".format(size, phase, expected, got))
+
+    if found:
+        sys.exit(1)
+    print("No phase got more than {0}% slower than the baseline".format(int(args.threshold * 100)))
+
+if __name__ == '__main__':
+    main()
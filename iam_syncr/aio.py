@@ -0,0 +1,65 @@
+"""
+Resolve the nodes of a dependency graph with asyncio
+
+Each node is a coroutine that waits for the nodes it requires and then runs
+its func in a bounded pool of threads, because boto only knows how to block.
+Waiting costs a coroutine instead of a thread, so a graph of thousands of
+things only needs as many threads as calls we want to make at once.
+
+Only works in python3.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import sys
+
+log = logging.getLogger("iam_syncr.aio")
+
+class AsyncRunner(object):
+    """Runs the nodes of a graph in an event loop of its own"""
+    def __init__(self, nodes, workers, prefetcher=None):
+        self.nodes = nodes
+        self.prefetcher = prefetcher
+        self.workers = max(1, workers)
+        self.failure = None
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            loop.run_until_complete(self.run_all(loop, executor))
+        finally:
+            executor.shutdown(wait=True)
+            loop.close()
+
+        if self.failure is not None:
+            raise self.failure[1].with_traceback(self.failure[2])
+
+    async def run_all(self, loop, executor):
+        done = dict((node, loop.create_future()) for node in self.nodes)
+        slots = asyncio.Semaphore(self.workers)
+
+        # Things that are ready at the same time get a slot in priority order
+        ordered = sorted(self.nodes, key=lambda node: node.order)
+        await asyncio.gather(*[self.run_node(node, done, slots, loop, executor) for node in ordered])
+
+    async def run_node(self, node, done, slots, loop, executor):
+        try:
+            for dependency in node.requires:
+                await done[dependency]
+
+            async with slots:
+                if self.failure is None:
+                    await loop.run_in_executor(executor, self.call, node)
+        finally:
+            done[node].set_result(None)
+
+    def call(self, node):
+        if self.failure is not None:
+            return
+
+        try:
+            node.run(self.prefetcher)
+        except Exception:
+            if self.failure is None:
+                self.failure = sys.exc_info()
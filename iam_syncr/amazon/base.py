@@ -1,7 +1,13 @@
+from iam_syncr.amazon.common import all_pages
+from iam_syncr.amazon.propagation import Propagation
+from iam_syncr.amazon.changes import ChangeRecorder
+from iam_syncr.amazon.calls import AmazonCalls
+from iam_syncr.amazon.reads import ReadCache
 from iam_syncr.errors import SyncrError
 
 from boto.iam.connection import IAMConnection
 from boto.s3.connection import S3Connection
+import threading
 import logging
 import boto
 import sys
@@ -14,6 +20,49 @@ else:
 
 log = logging.getLogger("iam_syncr.amazon.base")
 
+class BotoBackend(object):
+    """
+    Makes the boto connections that Amazon talks to
+
+    If we have a socket_timeout, then no connection waits longer than that for
+    amazon to connect or to say something.
+    """
+    def __init__(self, profile_name=None, socket_timeout=None):
+        self.profile_name = profile_name
+        self.socket_timeout = socket_timeout
+
+    def with_timeout(self, connection):
+        if self.socket_timeout and connection is not None:
+            connection.http_connection_kwargs["timeout"] = self.socket_timeout
+        return connection
+
+    def iam(self):
+        try:
+            return self.with_timeout(IAMConnection(profile_name=self.profile_name))
+        except boto.exception.NoAuthHandlerFound:
+            raise SyncrError("Export AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY before running this script (your aws credentials)")
+        except boto.provider.ProfileNotFoundError:
+            raise SyncrError("Couldn't find the aws profile for this account", profile=self.profile_name)
+
+    def s3(self):
+        try:
+            return self.with_timeout(S3Connection(profile_name=self.profile_name))
+        except boto.exception.NoAuthHandlerFound:
+            raise SyncrError("Export AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY before running this script (your aws credentials)")
+
+    def kms(self, location):
+        if KMSConnection is None:
+            raise SyncrError("Sorry, need python3 to do anything related to kms")
+
+        try:
+            connection = self.with_timeout(boto.kms.connect_to_region(location, profile_name=self.profile_name))
+        except boto.exception.NoAuthHandlerFound:
+            raise SyncrError("Export AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY before running this script (your aws credentials)")
+
+        if connection is None:
+            raise SyncrError("Couldn't find kms in that region", region=location)
+        return connection
+
 class Amazon(object):
     dry_run = False
     connection = None
@@ -22,6 +71,7 @@ class Amazon(object):
     accounts = None
     account_id = None
     account_name = None
+    profile_name = None
 
     @classmethod
     def set_boto_useragent(self, app_name, version):
@@ -31,44 +81,45 @@ class Amazon(object):
         if app_name not in useragent:
             sys.modules["boto.connection"].UserAgent = "{0} {1}/{2}".format(useragent, app_name, version)
 
-    def __init__(self, account_id, account_name, accounts, dry_run=False):
-        self.changes = False
+    def __init__(self, account_id, account_name, accounts, dry_run=False, profile_name=None, metrics=None, backend=None, cassette=None, limits=None, breakers=None, deadline=None, socket_timeout=None, change_sink=None):
+        self.lock = threading.Lock()
+        self.reads = ReadCache()
+        self.recorder = ChangeRecorder(sink=change_sink) if change_sink is not None else ChangeRecorder()
+        self.calls = AmazonCalls(account_name, metrics=metrics, cassette=cassette, limits=limits, breakers=breakers, deadline=deadline)
+        self.backend = backend if backend is not None else BotoBackend(profile_name=profile_name, socket_timeout=socket_timeout)
+        self.propagation = Propagation(account_name, self.calls.metrics)
         self.dry_run = dry_run
+        self.profile_name = profile_name
         self.accounts = accounts
         self.account_id = account_id
         self.account_name = account_name
 
     def setup(self):
         """Make sure our current credentials are for this account and set self.connection"""
-        try:
-            connection = IAMConnection()
-        except boto.exception.NoAuthHandlerFound:
-            raise SyncrError("Export AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY before running this script (your aws credentials)")
+        connection = self.calls.wrap(self.backend.iam(), "iam", "global")
 
         # Need roles to make sure we have the correct account
         log.info("Finding roles in your account")
         try:
-            result = connection.list_roles()
+            roles = self.all_roles = all_pages(connection.list_roles, "list_roles_response", "list_roles_result", "roles")
         except boto.exception.BotoServerError as error:
             if error.status == 403:
                 raise SyncrError("Your credentials aren't allowed to look at iam roles :(")
             else:
                 raise
 
-        roles = self.all_roles = result["list_roles_response"]["list_roles_result"]["roles"]
         if not roles:
             raise SyncrError("There are no roles in your account, I can't figure out the account id")
 
         # Need users for kms to be able to grant to users
         log.info("Finding users in your account")
         try:
-            result = connection.get_all_users()
+            self.all_users = all_pages(connection.get_all_users, "list_users_response", "list_users_result", "users")
         except boto.exception.BotoServerError as error:
             if error.status == 403:
                 raise SyncrError("Your credentials aren't allowed to look at iam users :(")
             else:
                 raise
-        self.all_users = result["list_users_response"]["list_users_result"]["users"]
 
         amazon_account_id = roles[0]['arn'].split(":")[4]
         if str(self.account_id) != str(amazon_account_id):
@@ -79,25 +130,32 @@ class Amazon(object):
         return connection
 
     @property
-    def s3_connection(self):
-        if getattr(self, "_s3_connection", None) is None:
-            try:
-                self._s3_connection = S3Connection()
-            except boto.exception.NoAuthHandlerFound:
-                raise SyncrError("Export AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY before running this script (your aws credentials)")
-        return self._s3_connection
+    def changes(self):
+        """Whether we have changed anything in amazon"""
+        return self.recorder.applied
 
-    def kms_connection_for(self, location):
-        if KMSConnection is None:
-            raise SyncrError("Sorry, need python3 to do anything related to kms")
+    @changes.setter
+    def changes(self, value):
+        with self.recorder.lock:
+            self.recorder.applied = value
+
+    @property
+    def metrics(self):
+        """The metrics for the calls we have made"""
+        return self.calls.metrics
 
-        if getattr(self, "_kms_connections", None) is None:
-            self._kms_connections = {}
+    @property
+    def s3_connection(self):
+        with self.lock:
+            if getattr(self, "_s3_connection", None) is None:
+                self._s3_connection = self.calls.wrap(self.backend.s3(), "s3", "global")
+            return self._s3_connection
 
-        if location not in self._kms_connections:
-            try:
-                self._kms_connections[location] = boto.kms.connect_to_region(location)
-            except boto.exception.NoAuthHandlerFound:
-                raise SyncrError("Export AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY before running this script (your aws credentials)")
-        return self._kms_connections[location]
+    def kms_connection_for(self, location):
+        with self.lock:
+            if getattr(self, "_kms_connections", None) is None:
+                self._kms_connections = {}
 
+            if location not in self._kms_connections:
+                self._kms_connections[location] = self.calls.wrap(self.backend.kms(location), "kms", location)
+            return self._kms_connections[location]
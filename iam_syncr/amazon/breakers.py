@@ -0,0 +1,129 @@
+"""
+Stop talking to amazon when it is clearly not going to work
+
+A Deadline is how long the whole run may take. No call starts after it has
+passed, so a stuck run ends with an error instead of hanging forever.
+
+A Breaker per (service, region) counts calls in a row that failed because of
+amazon rather than because of us: 5xx errors and connection problems. After
+``threshold`` of them it opens, and calls to that service and region fail
+straight away for ``cooldown`` seconds. After that one call is let through to
+see if amazon is better, which closes the breaker if it works and opens it
+again if it doesn't.
+"""
+from iam_syncr.errors import CircuitOpen, DeadlineExceeded
+
+import threading
+import logging
+import socket
+import boto
+import time
+
+log = logging.getLogger("iam_syncr.amazon.breakers")
+
+timer = getattr(time, "perf_counter", time.time)
+
+def is_outage(error):
+    """Say whether this error means amazon is having trouble rather than we asked for something wrong"""
+    if isinstance(error, boto.exception.BotoServerError):
+        return error.status is not None and error.status >= 500
+    return isinstance(error, (socket.error, IOError))
+
+class Deadline(object):
+    """When the run has to be finished by"""
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.start = timer()
+
+    def remaining(self):
+        return self.seconds - (timer() - self.start)
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, **info):
+        """Complain if we have run out of time"""
+        if self.expired:
+            raise DeadlineExceeded("Ran out of time before talking to amazon", deadline=self.seconds, **info)
+
+class Breaker(object):
+    """Whether calls to one service and region are allowed right now"""
+    def __init__(self, threshold, cooldown):
+        self.lock = threading.Lock()
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self.failures = 0
+        self.opened = None
+        self.trying = False
+
+    def allow(self):
+        """Say whether a call may go ahead"""
+        with self.lock:
+            if self.opened is None:
+                return True
+
+            if self.trying or timer() - self.opened < self.cooldown:
+                return False
+
+            # Let one call through to see if amazon is better
+            self.trying = True
+            return True
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trying = False
+
+    def failed(self):
+        """Count a failure and say whether that opened the breaker"""
+        with self.lock:
+            self.failures += 1
+            trying, self.trying = self.trying, False
+            if trying or (self.opened is None and self.failures >= self.threshold):
+                self.opened = timer()
+                return True
+            return False
+
+class Breakers(object):
+    """
+    A breaker for each (service, region)
+
+    A threshold of 0 means calls are never stopped.
+    """
+    def __init__(self, threshold=5, cooldown=30):
+        self.lock = threading.Lock()
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.breakers = {}
+
+    def breaker_for(self, service, region):
+        """Return the breaker for this service and region, or None if we never stop calls"""
+        if not self.threshold:
+            return None
+
+        key = (service, region)
+        with self.lock:
+            if key not in self.breakers:
+                self.breakers[key] = Breaker(self.threshold, self.cooldown)
+            return self.breakers[key]
+
+    def check(self, service, region, operation=None):
+        """Complain if calls to this service and region aren't allowed right now"""
+        breaker = self.breaker_for(service, region)
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpen("Amazon kept failing, so not asking it again for a while", service=service, region=region, operation=operation, cooldown=self.cooldown)
+
+    def record(self, service, region, error=None):
+        """Record how a call went"""
+        breaker = self.breaker_for(service, region)
+        if breaker is None:
+            return
+
+        if error is not None and is_outage(error):
+            if breaker.failed():
+                log.warning("Amazon keeps failing, stopping calls for a while\tservice=%s\tregion=%s\tcooldown=%s", service, region, self.cooldown)
+        else:
+            breaker.succeeded()
@@ -13,16 +13,22 @@ class AmazonBuckets(AmazonMixin, object):
     def __init__(self, amazon):
         self.amazon = amazon
         self.documents = AmazonDocuments()
-        self.connection = amazon.s3_connection
+
+    @property
+    def connection(self):
+        """Only make the s3 connection when we actually talk to s3"""
+        return self.amazon.s3_connection
 
     def bucket_info(self, name):
         """Return what amazon knows about this bucket"""
-        try:
-            return self.connection.get_bucket(name)
-        except boto.exception.S3ResponseError as error:
-            if error.status == 404:
-                return False
-            raise
+        def read():
+            try:
+                return self.connection.get_bucket(name)
+            except boto.exception.S3ResponseError as error:
+                if error.status == 404:
+                    return False
+                raise
+        return self.cached_read(("bucket", name), read)
 
     def current_policy(self, bucket):
         """Return the current policy for this bucket"""
@@ -51,38 +57,51 @@ class AmazonBuckets(AmazonMixin, object):
         with self.catch_boto_400("Couldn't create bucket", name=name):
             for _ in self.change("+", "bucket[{0}] ".format(location), name=name):
                 self.connection.create_bucket(name, location=location)
+                self.forget(("bucket", name))
 
         # And add our permissions
         if permission_document:
             with self.catch_boto_400("Couldn't add policy", "Bucket {0} - Permission document".format(name), permission_document, bucket=name):
                 for _ in self.change("+", "bucket_policy", bucket=name, document=permission_document):
-                    self.bucket_info(name).set_policy(permission_document)
+                    bucket = self.bucket_info(name)
+                    self.after_propagation("s3", "global", "set_policy", lambda: bucket.set_policy(permission_document), document=permission_document)
 
-    def modify_bucket(self, name, location, permission_document, tags):
-        """Modify a bucket"""
-        log.info("Inspecting bucket\tname=%s", name)
+    def remote_state(self, name):
+        """Return {bucket, location, policy, tags} for this bucket, or {bucket: False} if it doesn't exist"""
         bucket = self.bucket_info(name)
+        if not bucket:
+            return {"bucket": bucket}
+        return {"bucket": bucket, "location": bucket.get_location(), "policy": self.current_policy(bucket), "tags": self.current_tags(bucket)}
+
+    def modify_bucket(self, name, location, permission_document, tags, remote=None):
+        """Modify a bucket, remote is what remote_state gave back if we already asked"""
+        log.info("Inspecting bucket\tname=%s", name)
+        if remote is None:
+            remote = self.remote_state(name)
+
+        bucket = remote["bucket"]
         if not bucket:
             return
 
-        current_location = bucket.get_location()
+        current_location = remote["location"]
         if current_location != location:
             raise BadPolicy("The location of the bucket is wrong. You need to delete and recreate the bucket to have it in your specified location", current=current_location, wanted=location)
 
-        current_policy = self.current_policy(bucket)
-        changes = list(self.documents.compare_two_documents(current_policy, permission_document))
+        current_policy = remote["policy"]
+        changes = self.documents.document_change(current_policy, permission_document)
         if changes:
             with self.catch_boto_400("Couldn't modify policy", "Bucket {0} policy".format(name), permission_document, bucket=name):
                 for _ in self.change("M", "bucket_policy", bucket=name, changes=changes):
-                    bucket.set_policy(permission_document)
+                    self.after_propagation("s3", "global", "set_policy", lambda: bucket.set_policy(permission_document), document=permission_document)
 
-        self.modify_bucket_tags(name, bucket, tags)
+        self.modify_bucket_tags(name, bucket, tags, current_tags=remote["tags"])
 
-    def modify_bucket_tags(self, name, bucket, tags):
+    def modify_bucket_tags(self, name, bucket, tags, current_tags=None):
         """Modify the tags on a bucket"""
         changes = {}
         new_tags = TagSet()
-        current_tags = self.current_tags(bucket)
+        if current_tags is None:
+            current_tags = self.current_tags(bucket)
 
         for tag_name, tag_val in tags.items():
             if tag_name in current_tags:
@@ -0,0 +1,117 @@
+from iam_syncr.amazon.breakers import Breakers
+from iam_syncr.amazon.limits import Limits
+from iam_syncr.metrics import Metrics
+
+from boto.s3.bucket import Bucket
+import logging
+import boto
+import time
+
+log = logging.getLogger("iam_syncr.amazon.calls")
+
+timer = getattr(time, "perf_counter", time.time)
+
+def error_code_for(error):
+    """Return a short description of an error from amazon for our metrics"""
+    if isinstance(error, boto.exception.BotoServerError):
+        return error.error_code or str(error.status)
+    return error.__class__.__name__
+
+class AmazonCalls(object):
+    """
+    Every call we make to amazon goes through here
+
+    Connections are wrapped with ``wrap`` so that calling a method on them
+    ends up in ``call``.
+
+    With a cassette we either record every call, or replay calls from it
+    instead of talking to amazon.
+
+    Calls wait for a slot from our limits, so only so many calls to each
+    service and region happen at once.
+
+    No call starts after our deadline, or while the breaker for its service
+    and region is open.
+    """
+    def __init__(self, account, metrics=None, cassette=None, limits=None, breakers=None, deadline=None):
+        self.account = account
+        self.limits = limits if limits is not None else Limits()
+        self.breakers = breakers if breakers is not None else Breakers()
+        self.deadline = deadline
+        self.cassette = cassette
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def wrap(self, connection, service, region, target=None):
+        """Return a version of this connection that goes through us"""
+        return WrappedConnection(self, connection, service, region, target=target)
+
+    def call(self, service, region, operation, func, *args, **kwargs):
+        """Make a call to amazon"""
+        return self.make_call(service, region, None, operation, func, args, kwargs)
+
+    def make_call(self, service, region, target, operation, func, args, kwargs):
+        """Make a call to amazon, target is the bucket when we're calling a method on one"""
+        cassette = self.cassette
+        on_wait = lambda waited, depth: self.metrics.record_wait(self.account, service, region, waited, depth)
+
+        with self.limits.slot(service, region, on_wait=on_wait):
+            if self.deadline is not None:
+                self.deadline.check(service=service, region=region, operation=operation)
+            self.breakers.check(service, region, operation)
+
+            start = timer()
+            try:
+                if cassette is not None and cassette.replaying:
+                    result = cassette.replay(service, region, target, operation, args, kwargs)
+                else:
+                    result = func(*args, **kwargs)
+            except Exception as error:
+                duration = timer() - start
+                self.breakers.record(service, region, error)
+                self.metrics.record_call(self.account, service, region, operation, duration, error_code=error_code_for(error))
+                if cassette is not None and cassette.recording:
+                    cassette.record(service, region, target, operation, args, kwargs, duration, error=error)
+                raise
+
+            duration = timer() - start
+            self.breakers.record(service, region)
+
+        self.metrics.record_call(self.account, service, region, operation, duration)
+        if cassette is not None and cassette.recording:
+            cassette.record(service, region, target, operation, args, kwargs, duration, result=result)
+        return self.wrap_result(result, service, region)
+
+    def wrap_result(self, result, service, region):
+        """Boto gives back bucket objects that talk to amazon themselves"""
+        if isinstance(result, Bucket):
+            return self.wrap(result, service, region, target=result.name)
+        return result
+
+def region_for(connection):
+    """Return the region of a connection we wrapped, or None"""
+    return getattr(connection, "_region", None)
+
+class WrappedConnection(object):
+    """Proxy to a boto object that sends its methods through AmazonCalls"""
+    def __init__(self, calls, connection, service, region, target=None):
+        # Underscores so we don't hide attributes of what we're wrapping
+        self._calls = calls
+        self._region = region
+        self._target = target
+        self._service = service
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        attr = getattr(self._connection, name)
+        if not callable(attr):
+            return attr
+
+        def wrapped(*args, **kwargs):
+            return self._calls.make_call(self._service, self._region, self._target, name, attr, args, kwargs)
+        return wrapped
+
+    def __repr__(self):
+        return "<Wrapped {0} {1}/{2}>".format(repr(self._connection), self._service, self._region)
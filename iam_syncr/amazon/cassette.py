@@ -0,0 +1,193 @@
+"""
+Record the calls a sync makes to amazon and replay them later
+
+A cassette is a folder with a <account>.jsonl file for each account. Every
+line is one call with what it was called with, what came back (or what it
+raised) and how long it took.
+
+When replaying, calls are matched by service, region, bucket, operation and
+arguments. Calls that match the same recording are given back in the order
+they were recorded.
+"""
+from iam_syncr.errors import BadCassette, ReplayedError
+
+from boto.s3.tagging import Tags, TagSet
+from boto.s3.bucket import Bucket
+
+from collections import defaultdict, deque
+import threading
+import importlib
+import logging
+import base64
+import boto
+import json
+import time
+import six
+import os
+
+log = logging.getLogger("iam_syncr.amazon.cassette")
+
+def encode(obj):
+    """Turn what boto gives us into something json can hold"""
+    if obj is None or isinstance(obj, (bool, int, float) + six.string_types):
+        return obj
+    if isinstance(obj, six.binary_type):
+        return {"__bytes__": base64.b64encode(obj).decode("ascii")}
+    if isinstance(obj, dict):
+        return dict((str(key), encode(val)) for key, val in obj.items())
+    if isinstance(obj, (list, tuple)) and not isinstance(obj, Tags):
+        return [encode(item) for item in obj]
+    if isinstance(obj, Bucket):
+        return {"__bucket__": obj.name}
+    if isinstance(obj, Tags):
+        return {"__tags__": [[[tag.key, tag.value] for tag in tag_set] for tag_set in obj]}
+
+    log.warning("Recording something we don't know how to replay\ttype=%s", type(obj).__name__)
+    return {"__repr__": repr(obj)}
+
+def decode(obj):
+    """Turn what encode made back into what boto would have given us"""
+    if isinstance(obj, list):
+        return [decode(item) for item in obj]
+    if not isinstance(obj, dict):
+        return obj
+
+    if "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"].encode("ascii"))
+    if "__bucket__" in obj:
+        return Bucket(name=obj["__bucket__"])
+    if "__tags__" in obj:
+        tags = Tags()
+        for found in obj["__tags__"]:
+            tag_set = TagSet()
+            for key, value in found:
+                tag_set.add_tag(key, value)
+            tags.add_tag_set(tag_set)
+        return tags
+    if "__repr__" in obj:
+        return obj["__repr__"]
+
+    return dict((key, decode(val)) for key, val in obj.items())
+
+def encode_error(error):
+    """Remember enough about an error to raise it again"""
+    recorded = {"class": "{0}.{1}".format(error.__class__.__module__, error.__class__.__name__), "message": str(error)}
+    if isinstance(error, boto.exception.BotoServerError):
+        recorded.update(status=error.status, reason=error.reason, body=encode(error.body), error_code=error.error_code, error_message=error.error_message)
+    return recorded
+
+def decode_error(recorded):
+    """Make the error that encode_error remembered"""
+    if "status" in recorded:
+        module, _, name = recorded["class"].rpartition(".")
+        try:
+            kls = getattr(importlib.import_module(module), name)
+        except (ImportError, AttributeError):
+            kls = boto.exception.BotoServerError
+
+        error = kls(recorded["status"], recorded["reason"], decode(recorded["body"]))
+        error.error_code = recorded["error_code"]
+        error.error_message = recorded["error_message"]
+        return error
+
+    return ReplayedError(recorded["message"], error_class=recorded["class"])
+
+def key_for(service, region, target, operation, args, kwargs):
+    """The key calls are matched with"""
+    return json.dumps([service, region, target, operation, encode(list(args)), encode(kwargs)], sort_keys=True)
+
+class Cassette(object):
+    """
+    Either records calls to, or replays them from <folder>/<account>.jsonl
+
+    With ``latency`` replayed calls take as long as they did when recorded.
+    """
+    def __init__(self, folder, account, replaying=False, latency=False):
+        self.lock = threading.Lock()
+        self.folder = folder
+        self.account = account
+        self.latency = latency
+        self.replaying = replaying
+        self.location = os.path.join(folder, "{0}.jsonl".format(account))
+
+        self.handle = None
+        self.recorded = defaultdict(deque)
+        if replaying:
+            self.load()
+
+    @property
+    def recording(self):
+        return not self.replaying
+
+    def load(self):
+        if not os.path.exists(self.location):
+            raise BadCassette("Nothing was recorded for this account", location=self.location)
+
+        with open(self.location) as fle:
+            for line in fle:
+                if line.strip():
+                    interaction = json.loads(line)
+                    self.recorded[interaction["key"]].append(interaction)
+
+    def record(self, service, region, target, operation, args, kwargs, duration, result=None, error=None):
+        """Remember a call we made"""
+        interaction = {"key": key_for(service, region, target, operation, args, kwargs), "operation": operation, "duration": duration}
+        if error is not None:
+            interaction["error"] = encode_error(error)
+        else:
+            interaction["result"] = encode(result)
+
+        line = json.dumps(interaction, sort_keys=True)
+        with self.lock:
+            if self.handle is None:
+                if not os.path.exists(self.folder):
+                    os.makedirs(self.folder)
+                self.handle = open(self.location, "w")
+            self.handle.write(line)
+            self.handle.write("\n")
+            self.handle.flush()
+
+    def replay(self, service, region, target, operation, args, kwargs):
+        """Return or raise what was recorded for this call"""
+        key = key_for(service, region, target, operation, args, kwargs)
+        with self.lock:
+            if not self.recorded.get(key):
+                raise BadCassette("Nothing recorded for this call", location=self.location, service=service, region=region, operation=operation, bucket=target)
+            interaction = self.recorded[key].popleft()
+
+        if self.latency:
+            time.sleep(interaction["duration"])
+
+        if "error" in interaction:
+            raise decode_error(interaction["error"])
+        return decode(interaction["result"])
+
+    def close(self):
+        with self.lock:
+            if self.handle is not None:
+                self.handle.close()
+                self.handle = None
+
+class ReplayConnection(object):
+    """Stands in for a boto connection when everything comes from a cassette"""
+    def __init__(self, service):
+        self.service = service
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def not_replayed(*args, **kwargs):
+            raise BadCassette("Call wasn't replayed", service=self.service, operation=name)
+        return not_replayed
+
+class ReplayBackend(object):
+    """A backend for Amazon that doesn't need credentials or the network"""
+    def iam(self):
+        return ReplayConnection("iam")
+
+    def s3(self):
+        return ReplayConnection("s3")
+
+    def kms(self, location):
+        return ReplayConnection("kms")
@@ -0,0 +1,253 @@
+"""
+Record the changes we make, or would make in a dry run
+
+Changes made while resolving an item are kept until that item is finished and
+then given to the sink all at once, in the order the items were expected. So
+the output is the same no matter how many items are resolved at the same
+time, and the changes of one item never get mixed up with another's.
+
+Changes made outside of an item go to the sink straight away.
+
+The recorder also counts the creates, modifies and deletes of each type of
+thing, for the summary at the end.
+
+Changes are printed for people by default, or written as json lines by a
+JsonlWriter for other programs.
+"""
+from iam_syncr import jsonlib
+
+from contextlib import contextmanager
+from collections import defaultdict
+import threading
+import time
+
+timer = getattr(time, "perf_counter", time.time)
+
+# What each symbol given to AmazonMixin.change means
+KINDS = {"+": "create", "C": "create", "M": "modify", "-": "delete", "D": "delete"}
+
+class Change(object):
+    """One change to something in amazon"""
+    def __init__(self, symbol, typ, values, changes=None, document=None):
+        self.typ = typ
+        self.symbol = symbol
+        self.values = values
+        self.changes = changes
+        self.document = document
+
+        self.at = time.time()
+        self.item = None
+        self.item_seconds = None
+
+    @property
+    def kind(self):
+        return KINDS.get(self.symbol, "other")
+
+    @property
+    def name(self):
+        """The type without the extra we sometimes put on it, i.e. 'bucket[region] ' is 'bucket'"""
+        return self.typ.split("[")[0].strip()
+
+    def lines(self):
+        """Return the lines that show this change to people"""
+        values = ", ".join("{0}={1}".format(key, val) for key, val in sorted(self.values.items()))
+        lines = ["{0} {1}({2})".format(self.symbol, self.typ, values)]
+        if self.changes:
+            for change in self.changes:
+                lines.extend("\t{0}".format(line) for line in change.split('\n'))
+        elif self.document:
+            lines.extend("\t{0}".format(line) for line in jsonlib.pretty(self.document).split('\n'))
+        return lines
+
+    def canonical_document(self):
+        """Return our document as canonical json, or as it is if it isn't json"""
+        if not self.document:
+            return None
+
+        try:
+            if isinstance(self.document, (dict, list)):
+                return jsonlib.dumps(self.document)
+            return jsonlib.dumps(jsonlib.loads(self.document))
+        except (TypeError, ValueError):
+            return self.document
+
+    def as_dict(self):
+        """Return a json friendly dictionary of this change"""
+        return {
+              "symbol": self.symbol
+            , "kind": self.kind
+            , "type": self.name
+            , "identifiers": self.values
+            , "diff": list(self.changes or [])
+            , "digest": getattr(self.changes, "digest", None)
+            , "document": self.canonical_document()
+            , "at": self.at
+            , "item": list(self.item) if isinstance(self.item, tuple) else self.item
+            , "item_seconds": self.item_seconds
+            }
+
+def print_changes(changes):
+    """Print these changes in one go so nothing else gets printed in the middle"""
+    if changes:
+        print("\n".join(line for change in changes for line in change.lines()))
+
+def ignore_changes(changes):
+    """A sink for when only the counts of changes are wanted, so no diff is ever made"""
+
+class ChangeRecorder(object):
+    """
+    Thread safe buffer of the changes for each item
+
+    sink is called with a list of changes whenever some are ready to show.
+    """
+    def __init__(self, sink=print_changes):
+        self.sink = sink
+        self.lock = threading.RLock()
+        self.local = threading.local()
+
+        self.order = []
+        self.expected = set()
+        self.finished = {}
+        self.position = 0
+
+        self.applied = False
+        self.counts = defaultdict(lambda: defaultdict(int))
+
+    def expect(self, key):
+        """Say an item with this key will be resolved, after the items we already expect"""
+        with self.lock:
+            self.order.append(key)
+            self.expected.add(key)
+
+    @contextmanager
+    def item(self, key):
+        """Keep the changes recorded in this thread until the item is finished"""
+        previous = getattr(self.local, "changes", None)
+        changes = self.local.changes = []
+        start = timer()
+        try:
+            yield
+        finally:
+            self.local.changes = previous
+            took = timer() - start
+            for change in changes:
+                change.item = key
+                change.item_seconds = took
+            self.finish(key, changes)
+
+    def record(self, change):
+        """Record a change"""
+        with self.lock:
+            self.counts[change.name][change.kind] += 1
+
+        changes = getattr(self.local, "changes", None)
+        if changes is not None:
+            changes.append(change)
+        else:
+            with self.lock:
+                self.sink([change])
+
+    def finish(self, key, changes):
+        with self.lock:
+            if key not in self.expected:
+                self.sink(changes)
+                return
+
+            self.finished[key] = changes
+            while self.position < len(self.order) and self.order[self.position] in self.finished:
+                self.sink(self.finished.pop(self.order[self.position]))
+                self.position += 1
+
+    def flush(self):
+        """Give the sink whatever is finished, even if items before it never will be"""
+        with self.lock:
+            for key in self.order[self.position:]:
+                if key in self.finished:
+                    self.sink(self.finished.pop(key))
+            self.position = len(self.order)
+
+    @property
+    def total(self):
+        with self.lock:
+            return sum(sum(kinds.values()) for kinds in self.counts.values())
+
+    def as_dict(self):
+        """Return {<type>: {<kind>: <count>}} of everything we recorded"""
+        with self.lock:
+            return dict((typ, dict(kinds)) for typ, kinds in self.counts.items())
+
+    def summary(self):
+        """Return lines of a table of how many of each type we create, modify and delete"""
+        with self.lock:
+            rows = [(typ, kinds["create"], kinds["modify"], kinds["delete"]) for typ, kinds in sorted(self.counts.items())]
+
+        width = max([len("type")] + [len(row[0]) for row in rows])
+        template = "{0:<" + str(width) + "}  {1:>6}  {2:>6}  {3:>6}"
+        return [template.format("type", "create", "modify", "delete")] + [template.format(*row) for row in rows]
+
+class JsonlWriter(object):
+    """
+    Thread safe writer of one json object per line
+
+    Lines are written in batches of ``batch_size``, and once started whatever
+    we have is also written every ``interval`` seconds, so whatever reads them
+    gets them while we are still going, even if nothing finishes for a while.
+    """
+    def __init__(self, stream, batch_size=50, interval=1.0):
+        self.lock = threading.Lock()
+        self.stream = stream
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self.pending = []
+        self.last_write = timer()
+
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        """Start writing what we have every ``interval`` seconds until we are closed"""
+        if self.thread is None and self.interval:
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.keep_writing, name="jsonl-writer")
+            self.thread.daemon = True
+            self.thread.start()
+        return self
+
+    def keep_writing(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                if timer() - self.last_write >= self.interval:
+                    self.write_pending()
+
+    def close(self):
+        """Stop writing in the background and write whatever is left"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def write(self, records):
+        with self.lock:
+            self.pending.extend(jsonlib.dumps(record) for record in records)
+            if len(self.pending) >= self.batch_size or timer() - self.last_write >= self.interval:
+                self.write_pending()
+
+    def flush(self):
+        with self.lock:
+            self.write_pending()
+
+    def write_pending(self):
+        """Write the lines we have so far, must be called with the lock held"""
+        if self.pending:
+            self.stream.write("\n".join(self.pending) + "\n")
+            self.stream.flush()
+            self.pending = []
+        self.last_write = timer()
+
+def jsonl_sink(writer, account, dry_run=False):
+    """Return a sink for a ChangeRecorder that gives the changes for this account to a JsonlWriter"""
+    def sink(changes):
+        writer.write([dict(change.as_dict(), account=account, dry_run=dry_run) for change in changes])
+    return sink
@@ -1,25 +1,75 @@
+from __future__ import print_function
+
+from iam_syncr.amazon.changes import Change, ChangeRecorder, print_changes
+from iam_syncr.amazon.propagation import Propagation
+from iam_syncr.amazon.reads import ReadCache
 from iam_syncr.errors import BadAmazon
+from iam_syncr import jsonlib
 
 from contextlib import contextmanager
 import boto
+import sys
 
 class LeaveAlone(object):
     """Used to differentiate between None and not specified in a call signature"""
 
+def all_pages(method, response_key, result_key, items_key, *args):
+    """Follow the markers of a paginated iam call and return all the items"""
+    items = []
+    marker = None
+    while True:
+        result = method(*args, marker=marker)[response_key][result_key]
+        items.extend(result[items_key])
+
+        if result.get("is_truncated") not in (True, "true") or not result.get("marker"):
+            return items
+        marker = result["marker"]
+
 class AmazonMixin:
+    def cached_read(self, key, func):
+        """Return what func reads from amazon, sharing it with everything else that reads this key in this run"""
+        reads = getattr(self.amazon, "reads", None)
+        if not isinstance(reads, ReadCache):
+            return func()
+        return reads.get(key, func)
+
+    def forget(self, *keys):
+        """Forget what we read for these keys because we just changed them"""
+        reads = getattr(self.amazon, "reads", None)
+        if isinstance(reads, ReadCache):
+            reads.forget(*keys)
+
+    def made_role(self, arn):
+        """Remember we made this role so calls that need it can wait for amazon to know about it"""
+        propagation = getattr(self.amazon, "propagation", None)
+        if isinstance(propagation, Propagation):
+            propagation.made_role(arn)
+
+    def after_propagation(self, service, region, operation, func, arns=None, document=None):
+        """Call func, waiting for amazon to know about any roles we made that it needs"""
+        propagation = getattr(self.amazon, "propagation", None)
+        if not isinstance(propagation, Propagation):
+            return func()
+        return propagation.call(service, region, operation, func, arns=arns, document=document)
+
     @contextmanager
     def catch_boto_400(self, message, heading=None, document=None, **info):
-        """Turn a BotoServerError 400 into a BadAmazon"""
+        """
+        Turn a BotoServerError 400 into a BadAmazon
+
+        The document amazon didn't like is shown on stderr, so it never gets
+        mixed into the json lines on stdout with ``--output jsonl``
+        """
         try:
             yield
         except boto.exception.BotoServerError as error:
             if error.status == 400:
                 if heading or document:
-                    print("=" * 80)
+                    print("=" * 80, file=sys.stderr)
                     if heading:
-                        print(heading)
-                    print(document)
-                    print("=" * 80)
+                        print(heading, file=sys.stderr)
+                    print(jsonlib.pretty(document), file=sys.stderr)
+                    print("=" * 80, file=sys.stderr)
                 raise BadAmazon(message, error_code=error.code, error_message=error.message, **info)
             else:
                 raise
@@ -36,14 +86,13 @@ class AmazonMixin:
                 raise
 
     def print_change(self, symbol, typ, changes=None, document=None, **kwargs):
-        """Print out a change"""
-        values = ", ".join("{0}={1}".format(key, val) for key, val in sorted(kwargs.items()))
-        print("{0} {1}({2})".format(symbol, typ, values))
-        if changes:
-            for change in changes:
-                print("\n".join("\t{0}".format(line) for line in change.split('\n')))
-        elif document:
-            print("\n".join("\t{0}".format(line) for line in document.split('\n')))
+        """Record a change, which prints it out once the item it is for is finished"""
+        change = Change(symbol, typ, kwargs, changes=changes, document=document)
+        recorder = getattr(self.amazon, "recorder", None)
+        if isinstance(recorder, ChangeRecorder):
+            recorder.record(change)
+        else:
+            print_changes([change])
 
     def change(self, symbol, typ, **kwargs):
         """Print out a change and then do the change if not doing a dry run"""
@@ -0,0 +1,191 @@
+"""
+Structural diff of policy documents
+
+Statements are matched first by their canonical form, then by Sid, and what is
+left over was either added or removed. See ``iam_syncr.policy`` for what
+canonical form means.
+
+Knowing whether two documents differ is cheap, so a DocumentChange only works
+out the diff people read when something asks for its lines.
+"""
+from iam_syncr.policy import Document, Statement, thaw
+
+from collections import defaultdict, Counter
+import hashlib
+import json
+
+def dumped(value):
+    return json.dumps(value, sort_keys=True)
+
+def as_list(value):
+    return value if isinstance(value, list) else [value]
+
+def as_dict(statement):
+    return statement.as_dict() if isinstance(statement, Statement) else statement
+
+def canonical_text(statement):
+    return statement.dumps() if isinstance(statement, Statement) else dumped(statement)
+
+def sid_of(statement):
+    if isinstance(statement, Statement):
+        return statement.get("Sid")
+
+class StatementChange(object):
+    """A statement that was added, removed or modified"""
+    def __init__(self, symbol, statement, fields=None):
+        self.symbol = symbol
+        self.fields = fields or []
+        self.statement = statement
+
+    @property
+    def sid(self):
+        return sid_of(self.statement)
+
+    def lines(self):
+        if self.symbol == "~":
+            yield "~ statement Sid={0}".format(dumped(self.sid))
+            for field, old, new in self.fields:
+                if isinstance(old, list) or isinstance(new, list):
+                    old_items = dict((dumped(item), item) for item in as_list(old) if old is not None)
+                    new_items = dict((dumped(item), item) for item in as_list(new) if new is not None)
+                    for key in sorted(set(new_items) - set(old_items)):
+                        yield "    {0}: + {1}".format(field, key)
+                    for key in sorted(set(old_items) - set(new_items)):
+                        yield "    {0}: - {1}".format(field, key)
+                else:
+                    yield "    {0}: {1} -> {2}".format(field, dumped(old), dumped(new))
+        else:
+            yield "{0} statement {1}".format(self.symbol, dumped(as_dict(self.statement)))
+
+class DocumentDiff(object):
+    """The differences between two documents"""
+    def __init__(self, added=None, removed=None, modified=None, other=None):
+        self.added = added or []
+        self.removed = removed or []
+        self.modified = modified or []
+        self.other = other or []
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified or self.other)
+    __nonzero__ = __bool__
+
+    def lines(self):
+        """Yield a readable description of the differences"""
+        for key, old, new in self.other:
+            yield "{0}: {1} -> {2}".format(key, dumped(old), dumped(new))
+        for change in self.removed + self.modified + self.added:
+            for line in change.lines():
+                yield line
+
+class DocumentChange(object):
+    """
+    Two documents that are different
+
+    ``digest`` is of the canonical json of the document we want. The diff is
+    only made the first time ``lines`` is called, or we are iterated over.
+    """
+    def __init__(self, before, after):
+        self.before = before
+        self.after = after
+        self._lines = None
+
+    @property
+    def digest(self):
+        return hashlib.sha256(self.after.dumps().encode("utf-8")).hexdigest()
+
+    def lines(self):
+        """Return a readable description of the differences"""
+        if self._lines is None:
+            self._lines = list(diff_documents(self.before, self.after).lines())
+        return self._lines
+
+    def __iter__(self):
+        return iter(self.lines())
+
+    def __bool__(self):
+        return True
+    __nonzero__ = __bool__
+
+def same_documents(first, second):
+    """Say whether two documents have the same statements, in any order, and everything else the same"""
+    if first == second:
+        return True
+    if first.version != second.version or first.extra != second.extra or len(first.statements) != len(second.statements):
+        return False
+    return Counter(first.statements) == Counter(second.statements)
+
+def field_changes(old, new):
+    """Return [(field, old, new), ...] for the fields that differ between two statements"""
+    changes = []
+    for field in sorted(set(old) | set(new)):
+        if old.frozen(field) != new.frozen(field):
+            changes.append((field, thaw(old.frozen(field)), thaw(new.frozen(field))))
+    return changes
+
+def diff_documents(first, second):
+    """
+    Return a DocumentDiff between two documents
+
+    Documents may be Document objects or what json.loads gives back.
+
+    Statements are hashable, so matching is linear in the number of
+    statements, apart from sorting the output.
+    """
+    if not isinstance(first, Document):
+        first = Document.from_dict(first)
+    if not isinstance(second, Document):
+        second = Document.from_dict(second)
+
+    if first == second:
+        return DocumentDiff()
+
+    other = []
+    if first.version != second.version:
+        other.append(("Version", first.version, second.version))
+
+    before_extra, after_extra = thaw(first.extra), thaw(second.extra)
+    for key in sorted(set(before_extra) | set(after_extra)):
+        if before_extra.get(key) != after_extra.get(key):
+            other.append((key, before_extra.get(key), after_extra.get(key)))
+
+    unmatched = defaultdict(list)
+    for statement in first.statements:
+        unmatched[statement].append(statement)
+
+    added = []
+    for statement in second.statements:
+        existing = unmatched.get(statement)
+        if existing:
+            existing.pop()
+        else:
+            added.append(statement)
+
+    removed = [statement for statements in unmatched.values() for statement in statements]
+
+    # Statements with the same Sid are the same statement that changed
+    by_sid = {}
+    for statement in removed:
+        sid = sid_of(statement)
+        if sid and sid not in by_sid:
+            by_sid[sid] = statement
+
+    modified = []
+    still_added = []
+    were_modified = set()
+    for statement in added:
+        sid = sid_of(statement)
+        if sid and sid in by_sid:
+            old = by_sid.pop(sid)
+            were_modified.add(id(old))
+            modified.append(StatementChange("~", statement, fields=field_changes(old, statement)))
+        else:
+            still_added.append(statement)
+    removed = [statement for statement in removed if id(statement) not in were_modified]
+
+    order = lambda change: canonical_text(change.statement)
+    return DocumentDiff(
+          added = sorted([StatementChange("+", statement) for statement in still_added], key=order)
+        , removed = sorted([StatementChange("-", statement) for statement in removed], key=order)
+        , modified = sorted(modified, key=order)
+        , other = other
+        )
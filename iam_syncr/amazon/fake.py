@@ -0,0 +1,438 @@
+"""
+An in memory amazon for benchmarking and testing
+
+Pass a ``FakeAmazonBackend`` as the ``backend`` of an ``Amazon`` object and it
+will talk to dictionaries instead of the network.
+
+It only knows about the iam, s3 and kms operations that iam_syncr uses and
+gives back the same shapes of responses that boto does.
+"""
+from boto.exception import BotoServerError, S3ResponseError
+from boto.s3.tagging import Tags, TagSet
+from boto.s3.bucket import Bucket
+
+from six.moves.urllib import parse
+from collections import defaultdict
+import threading
+import logging
+import random
+import boto
+import time
+import uuid
+import six
+
+if not six.PY2:
+    import boto.kms.exceptions
+
+log = logging.getLogger("iam_syncr.amazon.fake")
+
+def iam_error(status, code, message=""):
+    """Make an error like the ones boto raises for iam"""
+    error = BotoServerError(status, message)
+    error.error_code = code
+    error.error_message = message
+    return error
+
+def s3_error(status, code, message=""):
+    """Make an error like the ones boto raises for s3"""
+    error = S3ResponseError(status, message)
+    error.error_code = code
+    error.error_message = message
+    return error
+
+def kms_not_found(key_id):
+    return boto.kms.exceptions.NotFoundException(400, "Bad Request", {"__type": "NotFoundException", "message": "Key '{0}' does not exist".format(key_id)})
+
+class FakeAmazonBackend(object):
+    """
+    Holds the state of a pretend amazon account
+
+    latency
+        Seconds to sleep for every call
+
+    throttle_probability
+        Chance between 0 and 1 that a call is throttled instead of made
+
+    page_size
+        How many items paginated iam calls return at a time
+
+    seed
+        Seed for the random that decides what calls get throttled
+
+    propagation_delay
+        Seconds after a role is made before putting policies on it or putting
+        it in an instance profile works
+    """
+    def __init__(self, account_id, latency=0, throttle_probability=0, page_size=100, seed=None, propagation_delay=0):
+        self.lock = threading.RLock()
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.propagation_delay = propagation_delay
+        self.page_size = page_size
+        self.account_id = str(account_id)
+        self.throttle_probability = throttle_probability
+
+        self.calls = defaultdict(int)
+
+        self.users = {}
+        self.roles = {}
+        self.made_roles = {}
+        self.role_policies = defaultdict(dict)
+        self.instance_profiles = {}
+
+        self.buckets = {}
+        self.keys = defaultdict(dict)
+        self.aliases = defaultdict(dict)
+        self.grants = defaultdict(list)
+
+    def iam(self):
+        return FakeIAMConnection(self)
+
+    def s3(self):
+        return FakeS3Connection(self)
+
+    def kms(self, location):
+        return FakeKMSConnection(self, location)
+
+    def request(self, service, operation, throttled):
+        """Pretend to go over the network"""
+        with self.lock:
+            self.calls[(service, operation)] += 1
+            throttle = self.throttle_probability and self.random.random() < self.throttle_probability
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if throttle:
+            raise throttled
+
+    def page(self, items, marker, items_key):
+        """Return a page of these items like a paginated iam call"""
+        start = int(marker or 0)
+        end = start + self.page_size
+        result = {items_key: items[start:end], "is_truncated": "false"}
+        if end < len(items):
+            result["is_truncated"] = "true"
+            result["marker"] = str(end)
+        return result
+
+    def arn(self, service, resource):
+        return "arn:aws:{0}::{1}:{2}".format(service, self.account_id, resource)
+
+    @property
+    def total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    def add_user(self, name):
+        """Add a user to the account"""
+        with self.lock:
+            self.users[name] = {"user_name": name, "user_id": "AIDA{0}".format(uuid.uuid4().hex[:16].upper()), "arn": self.arn("iam", "user/{0}".format(name)), "path": "/"}
+            return self.users[name]
+
+    def add_role(self, name, trust_document=None, path=None):
+        """Add a role to the account"""
+        path = path or "/"
+        if trust_document is None:
+            trust_document = '{"Version": "2012-10-17", "Statement": []}'
+
+        with self.lock:
+            self.roles[name] = {
+                  "role_name": name
+                , "role_id": "AROA{0}".format(uuid.uuid4().hex[:16].upper())
+                , "arn": self.arn("iam", "role{0}{1}".format(path, name))
+                , "path": path
+                , "assume_role_policy_document": parse.quote(trust_document)
+                }
+            return self.roles[name]
+
+class FakeConnection(object):
+    """Common bits of our fake connections"""
+    service = None
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = backend.lock
+
+    def request(self, operation):
+        self.backend.request(self.service, operation, self.throttled())
+
+class FakeIAMConnection(FakeConnection):
+    service = "iam"
+
+    def throttled(self):
+        return iam_error(400, "Throttling", "Rate exceeded")
+
+    def role(self, role_name, propagated=False):
+        """Return this role, and if propagated then only if every part of iam knows about it"""
+        made = self.backend.made_roles.get(role_name)
+        if propagated and made is not None and time.time() - made < self.backend.propagation_delay:
+            raise iam_error(404, "NoSuchEntity", "The role with name {0} cannot be found.".format(role_name))
+
+        if role_name not in self.backend.roles:
+            raise iam_error(404, "NoSuchEntity", "The role with name {0} cannot be found.".format(role_name))
+        return self.backend.roles[role_name]
+
+    def list_roles(self, marker=None):
+        self.request("list_roles")
+        with self.lock:
+            roles = [dict(role) for _, role in sorted(self.backend.roles.items())]
+        return {"list_roles_response": {"list_roles_result": self.backend.page(roles, marker, "roles")}}
+
+    def get_all_users(self, marker=None):
+        self.request("get_all_users")
+        with self.lock:
+            users = [dict(user) for _, user in sorted(self.backend.users.items())]
+        return {"list_users_response": {"list_users_result": self.backend.page(users, marker, "users")}}
+
+    def get_role(self, role_name):
+        self.request("get_role")
+        with self.lock:
+            return {"get_role_response": {"get_role_result": {"role": dict(self.role(role_name))}}}
+
+    def create_role(self, role_name, assume_role_policy_document=None, path=None):
+        self.request("create_role")
+        with self.lock:
+            if role_name in self.backend.roles:
+                raise iam_error(409, "EntityAlreadyExists", "Role with name {0} already exists.".format(role_name))
+            self.backend.add_role(role_name, assume_role_policy_document, path=path)
+            self.backend.made_roles[role_name] = time.time()
+
+    def update_assume_role_policy(self, role_name, policy_document):
+        self.request("update_assume_role_policy")
+        with self.lock:
+            self.role(role_name)["assume_role_policy_document"] = parse.quote(policy_document)
+
+    def delete_role(self, role_name):
+        self.request("delete_role")
+        with self.lock:
+            self.role(role_name)
+            if self.backend.role_policies.get(role_name):
+                raise iam_error(409, "DeleteConflict", "Cannot delete entity, must delete policies first.")
+            del self.backend.roles[role_name]
+
+    def list_role_policies(self, role_name, marker=None):
+        self.request("list_role_policies")
+        with self.lock:
+            self.role(role_name)
+            names = sorted(self.backend.role_policies[role_name])
+        return {"list_role_policies_response": {"list_role_policies_result": self.backend.page(names, marker, "policy_names")}}
+
+    def get_role_policy(self, role_name, policy_name):
+        self.request("get_role_policy")
+        with self.lock:
+            self.role(role_name)
+            if policy_name not in self.backend.role_policies[role_name]:
+                raise iam_error(404, "NoSuchEntity", "The role policy with name {0} cannot be found.".format(policy_name))
+            document = self.backend.role_policies[role_name][policy_name]
+        return {"get_role_policy_response": {"get_role_policy_result": {"role_name": role_name, "policy_name": policy_name, "policy_document": parse.quote(document)}}}
+
+    def put_role_policy(self, role_name, policy_name, policy_document):
+        self.request("put_role_policy")
+        with self.lock:
+            self.role(role_name, propagated=True)
+            self.backend.role_policies[role_name][policy_name] = policy_document
+
+    def delete_role_policy(self, role_name, policy_name):
+        self.request("delete_role_policy")
+        with self.lock:
+            self.role(role_name)
+            if policy_name not in self.backend.role_policies[role_name]:
+                raise iam_error(404, "NoSuchEntity", "The role policy with name {0} cannot be found.".format(policy_name))
+            del self.backend.role_policies[role_name][policy_name]
+
+    def list_instance_profiles_for_role(self, role_name):
+        self.request("list_instance_profiles_for_role")
+        profiles = []
+        with self.lock:
+            self.role(role_name)
+            for name, roles in sorted(self.backend.instance_profiles.items()):
+                if role_name in roles:
+                    profiles.append({"instance_profile_name": name, "roles": {"member": {"role_name": role_name}}})
+        return {"list_instance_profiles_for_role_response": {"list_instance_profiles_for_role_result": {"instance_profiles": profiles}}}
+
+    def create_instance_profile(self, instance_profile_name, path=None):
+        self.request("create_instance_profile")
+        with self.lock:
+            if instance_profile_name in self.backend.instance_profiles:
+                raise iam_error(409, "EntityAlreadyExists", "Instance Profile {0} already exists.".format(instance_profile_name))
+            self.backend.instance_profiles[instance_profile_name] = []
+
+    def add_role_to_instance_profile(self, instance_profile_name, role_name):
+        self.request("add_role_to_instance_profile")
+        with self.lock:
+            self.role(role_name, propagated=True)
+            if instance_profile_name not in self.backend.instance_profiles:
+                raise iam_error(404, "NoSuchEntity", "Instance Profile {0} cannot be found.".format(instance_profile_name))
+            if self.backend.instance_profiles[instance_profile_name]:
+                raise iam_error(409, "LimitExceeded", "Cannot exceed quota for InstanceSessionsPerInstanceProfile: 1")
+            self.backend.instance_profiles[instance_profile_name].append(role_name)
+
+    def remove_role_from_instance_profile(self, instance_profile_name, role_name):
+        self.request("remove_role_from_instance_profile")
+        with self.lock:
+            roles = self.backend.instance_profiles.get(instance_profile_name, [])
+            if role_name not in roles:
+                raise iam_error(404, "NoSuchEntity", "Role {0} is not in Instance Profile {1}".format(role_name, instance_profile_name))
+            roles.remove(role_name)
+
+class FakeS3Connection(FakeConnection):
+    service = "s3"
+
+    def throttled(self):
+        return s3_error(503, "SlowDown", "Please reduce your request rate.")
+
+    def get_bucket(self, bucket_name):
+        self.request("get_bucket")
+        with self.lock:
+            if bucket_name not in self.backend.buckets:
+                raise s3_error(404, "NoSuchBucket", "The specified bucket does not exist")
+        return FakeBucket(self, bucket_name)
+
+    def create_bucket(self, bucket_name, location=""):
+        self.request("create_bucket")
+        with self.lock:
+            if bucket_name in self.backend.buckets:
+                raise s3_error(409, "BucketAlreadyOwnedByYou", "Your previous request to create the named bucket succeeded and you already own it.")
+            self.backend.buckets[bucket_name] = {"location": location, "policy": None, "tags": {}}
+        return FakeBucket(self, bucket_name)
+
+class FakeBucket(Bucket):
+    """A boto bucket that keeps everything in our backend"""
+    def __init__(self, connection, name):
+        super(FakeBucket, self).__init__(connection=None, name=name)
+        self.fake = connection
+
+    @property
+    def state(self):
+        return self.fake.backend.buckets[self.name]
+
+    def get_location(self, headers=None):
+        self.fake.request("get_location")
+        with self.fake.lock:
+            return self.state["location"]
+
+    def get_policy(self, headers=None):
+        self.fake.request("get_policy")
+        with self.fake.lock:
+            policy = self.state["policy"]
+        if policy is None:
+            raise s3_error(404, "NoSuchBucketPolicy", "The bucket policy does not exist")
+        return policy.encode("utf-8")
+
+    def set_policy(self, policy, headers=None):
+        self.fake.request("set_policy")
+        with self.fake.lock:
+            self.state["policy"] = policy
+        return True
+
+    def get_tags(self, headers=None):
+        self.fake.request("get_tags")
+        with self.fake.lock:
+            current = dict(self.state["tags"])
+        if not current:
+            raise s3_error(404, "NoSuchTagSet", "The TagSet does not exist")
+
+        tag_set = TagSet()
+        for key, value in sorted(current.items()):
+            tag_set.add_tag(key, value)
+        tags = Tags()
+        tags.add_tag_set(tag_set)
+        return tags
+
+    def set_tags(self, tags, headers=None):
+        self.fake.request("set_tags")
+        with self.fake.lock:
+            self.state["tags"] = dict((tag.key, tag.value) for tag_set in tags for tag in tag_set)
+        return True
+
+    def delete_tags(self, headers=None):
+        self.fake.request("delete_tags")
+        with self.fake.lock:
+            self.state["tags"] = {}
+        return True
+
+class FakeKMSConnection(FakeConnection):
+    service = "kms"
+
+    def __init__(self, backend, location):
+        super(FakeKMSConnection, self).__init__(backend)
+        self.location = location
+        self.keys = backend.keys[location]
+        self.aliases = backend.aliases[location]
+
+    def throttled(self):
+        return iam_error(400, "ThrottlingException", "Rate exceeded")
+
+    def key(self, key_id):
+        if key_id.startswith("alias/"):
+            if key_id not in self.aliases:
+                raise kms_not_found(key_id)
+            key_id = self.aliases[key_id]
+
+        if key_id not in self.keys:
+            raise kms_not_found(key_id)
+        return self.keys[key_id]
+
+    def describe_key(self, key_id, grant_tokens=None):
+        self.request("describe_key")
+        with self.lock:
+            return {"KeyMetadata": dict(self.key(key_id)["metadata"])}
+
+    def create_key(self, policy=None, description=None, key_usage=None):
+        self.request("create_key")
+        key_id = str(uuid.uuid4())
+        metadata = {
+              "KeyId": key_id
+            , "Arn": "arn:aws:kms:{0}:{1}:key/{2}".format(self.location, self.backend.account_id, key_id)
+            , "AWSAccountId": self.backend.account_id
+            , "Description": description or ""
+            , "KeyUsage": key_usage or "ENCRYPT_DECRYPT"
+            , "Enabled": True
+            , "CreationDate": time.time()
+            }
+        with self.lock:
+            self.keys[key_id] = {"metadata": metadata, "policy": policy or "{}"}
+        return {"KeyMetadata": dict(metadata)}
+
+    def create_alias(self, alias_name, target_key_id):
+        self.request("create_alias")
+        with self.lock:
+            self.key(target_key_id)
+            if alias_name in self.aliases:
+                raise boto.kms.exceptions.AlreadyExistsException(400, "Bad Request", {"__type": "AlreadyExistsException", "message": "An alias with the name {0} already exists".format(alias_name)})
+            self.aliases[alias_name] = target_key_id
+
+    def update_key_description(self, key_id, description):
+        self.request("update_key_description")
+        with self.lock:
+            self.key(key_id)["metadata"]["Description"] = description
+
+    def get_key_policy(self, key_id, policy_name):
+        self.request("get_key_policy")
+        with self.lock:
+            return {"Policy": self.key(key_id)["policy"]}
+
+    def put_key_policy(self, key_id, policy_name, policy):
+        self.request("put_key_policy")
+        with self.lock:
+            self.key(key_id)["policy"] = policy
+
+    def list_grants(self, key_id, limit=None, marker=None):
+        self.request("list_grants")
+        with self.lock:
+            key_id = self.key(key_id)["metadata"]["KeyId"]
+            return {"Grants": [dict(grant, Operations=list(grant["Operations"])) for grant in self.backend.grants[key_id]]}
+
+    def create_grant(self, key_id, grantee_principal, retiring_principal=None, operations=None, constraints=None, grant_tokens=None):
+        self.request("create_grant")
+        grant = {"GrantId": uuid.uuid4().hex, "GranteePrincipal": grantee_principal, "IssuingAccount": self.backend.arn("iam", "root"), "Operations": list(operations or [])}
+        if retiring_principal is not None:
+            grant["RetiringPrincipal"] = retiring_principal
+        if constraints is not None:
+            grant["Constraints"] = constraints
+
+        with self.lock:
+            key_id = self.key(key_id)["metadata"]["KeyId"]
+            self.backend.grants[key_id].append(grant)
+        return {"GrantId": grant["GrantId"], "GrantToken": uuid.uuid4().hex}
@@ -1,5 +1,6 @@
 from iam_syncr.amazon.documents import AmazonDocuments
 from iam_syncr.amazon.common import AmazonMixin
+from iam_syncr.amazon.calls import region_for
 from iam_syncr.errors import BadAlias, BadRole
 
 import logging
@@ -19,17 +20,25 @@ class AmazonKms(AmazonMixin, object):
 
     def key_info(self, alias):
         """Return what amazon knows about this key"""
-        try:
-            return self.connection.describe_key("alias/{0}".format(alias))["KeyMetadata"]
-        except boto.kms.exceptions.NotFoundException:
-            return False
+        def read():
+            try:
+                return self.connection.describe_key("alias/{0}".format(alias))["KeyMetadata"]
+            except boto.kms.exceptions.NotFoundException:
+                return False
+        return self.cached_read(("key", self.connection, alias), read)
 
     def current_policy(self, key):
         """Return the current policy for this key"""
-        try:
-            return self.connection.get_key_policy(key["KeyId"], "default")["Policy"]
-        except boto.kms.exceptions.NotFoundException:
-            return "{}"
+        def read():
+            try:
+                return self.connection.get_key_policy(key["KeyId"], "default")["Policy"]
+            except boto.kms.exceptions.NotFoundException:
+                return "{}"
+        return self.cached_read(("key_policy", self.connection, key["KeyId"]), read)
+
+    def current_grants(self, key_id):
+        """Return the grants on this key"""
+        return self.cached_read(("key_grants", self.connection, key_id), lambda: self.connection.list_grants(key_id)["Grants"])
 
     def has_key(self, alias):
         """Return whether amazon has info about this key"""
@@ -39,12 +48,20 @@ class AmazonKms(AmazonMixin, object):
         """Create a key"""
         with self.catch_boto_400("Couldn't create key", document=permission_document, alias=alias):
             for _ in self.change("+", "key", alias=alias):
-                key = self.connection.create_key(permission_document, description)["KeyMetadata"]
+                key = self.after_propagation("kms", region_for(self.connection), "create_key", lambda: self.connection.create_key(permission_document, description), document=permission_document)["KeyMetadata"]
                 self.connection.create_alias("alias/{0}".format(alias), key["KeyId"])
+                self.forget(("key", self.connection, alias))
 
-    def modify_key(self, alias, description, permission_document):
-        """Modify a key"""
+    def remote_state(self, alias):
+        """Return {key, policy, grants} for this key, or {key: False} if it doesn't exist"""
         key = self.key_info(alias)
+        if not key:
+            return {"key": key}
+        return {"key": key, "policy": self.current_policy(key), "grants": self.current_grants(key["KeyId"])}
+
+    def modify_key(self, alias, description, permission_document, remote=None):
+        """Modify a key, remote is what remote_state gave back if we already asked"""
+        key = remote["key"] if remote is not None else self.key_info(alias)
         if not key:
             return
 
@@ -52,25 +69,31 @@ class AmazonKms(AmazonMixin, object):
         if current_description != description:
             for _ in self.change("M", "key_description", key=alias, description=description):
                 self.connection.update_key_description(key["KeyId"], description)
+                self.forget(("key", self.connection, alias))
 
-        current_policy = self.current_policy(key)
-        changes = list(self.documents.compare_two_documents(current_policy, permission_document))
+        current_policy = remote["policy"] if remote is not None else self.current_policy(key)
+        changes = self.documents.document_change(current_policy, permission_document)
         if changes:
             with self.catch_boto_400("Couldn't modify policy", "Key {0} policy".format(alias), permission_document, key=alias):
                 for _ in self.change("M", "key_policy", key=alias, changes=changes, description=description):
-                    self.connection.put_key_policy(key["KeyId"], 'default', permission_document)
+                    self.after_propagation("kms", region_for(self.connection), "put_key_policy", lambda: self.connection.put_key_policy(key["KeyId"], 'default', permission_document), document=permission_document)
+                    self.forget(("key_policy", self.connection, key["KeyId"]))
 
-    def modify_grant(self, alias, description, grant):
-        """Modify grants on a key"""
-        key = self.key_info(alias)
+    def modify_grant(self, alias, description, grant, remote=None):
+        """Modify grants on a key, remote is what remote_state gave back if we already asked"""
+        key = remote["key"] if remote is not None else self.key_info(alias)
         if not key:
             raise BadAlias("Where did the key go?", alias=alias)
 
         key_id = key["KeyId"]
         new_grants = []
-        current_grants = self.connection.list_grants(key_id)["Grants"]
-        for policy in current_grants:
-            policy["Operations"] = sorted(policy["Operations"])
+        if remote is not None:
+            current_grants = remote["grants"]
+        else:
+            current_grants = self.current_grants(key_id)
+
+        # The grants are what we remember amazon said, so compare sorted copies of them
+        current_grants = [dict(policy, Operations=sorted(policy["Operations"])) for policy in current_grants]
 
         for policy in grant:
             nxt = {"GranteePrincipal": policy["grantee"], "RetireePrincipal": policy.get("Retiree"), "Operations": sorted(policy["operations"]), "Constraints": policy.get("constraints"), "GrantTokens": policy.get("grant_tokens")}
@@ -86,6 +109,7 @@ class AmazonKms(AmazonMixin, object):
 
             for _ in self.change("+", "key_grant", key=alias, grantee=policy["grantee"]):
                 self.connection.create_grant(key_id, policy["grantee"], retiring_principal=policy.get("retiree"), operations=policy["operations"], constraints=policy.get("constraints"), grant_tokens=policy.get("grant_tokens"))
+                self.forget(("key_grants", self.connection, key_id))
 
     def user_from_arn(self, arn):
         """Convert an arn into the user id"""
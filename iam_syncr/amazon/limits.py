@@ -0,0 +1,83 @@
+"""
+Caps on how many calls we make to amazon at the same time
+
+Iam is one global endpoint with a tight rate limit, while s3 and kms are
+regional and happy to do a lot more at once. So each (service, region) gets
+its own cap and calls to one don't wait behind calls to another.
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+timer = getattr(time, "perf_counter", time.time)
+
+# How many calls to each service can happen at once unless told otherwise
+DEFAULT_CAPS = {"iam": 4, "s3": 16, "kms": 16}
+
+def parse_cap(spec):
+    """Turn "<service>[:<region>]=<count>" into (key, count)"""
+    key, _, count = spec.partition("=")
+    if not key or not count.isdigit():
+        raise ValueError("Expected <service>[:<region>]=<count>, got {0}".format(spec))
+    return key, int(count)
+
+class Limits(object):
+    """
+    Hands out slots for calls to each (service, region)
+
+    Caps are keyed by "<service>:<region>" or just "<service>", the first one
+    found wins. A cap of 0 means there is no limit.
+    """
+    def __init__(self, caps=None):
+        self.caps = dict(DEFAULT_CAPS)
+        self.caps.update(caps or {})
+
+        self.lock = threading.Lock()
+        self.waiting = {}
+        self.semaphores = {}
+
+    def cap_for(self, service, region):
+        for key in ("{0}:{1}".format(service, region), service):
+            if key in self.caps:
+                return self.caps[key]
+
+    def semaphore_for(self, service, region):
+        """Return the semaphore for this service and region, or None if it isn't limited"""
+        key = (service, region)
+        with self.lock:
+            if key not in self.semaphores:
+                cap = self.cap_for(service, region)
+                self.semaphores[key] = threading.BoundedSemaphore(cap) if cap else None
+            return self.semaphores[key]
+
+    @contextmanager
+    def slot(self, service, region, on_wait=None):
+        """
+        Wait for a slot to make a call in
+
+        on_wait is called with how long we waited and how many calls were
+        already waiting when we started waiting.
+        """
+        semaphore = self.semaphore_for(service, region)
+        if semaphore is None:
+            yield
+            return
+
+        key = (service, region)
+        with self.lock:
+            depth = self.waiting.get(key, 0)
+            self.waiting[key] = depth + 1
+
+        start = timer()
+        semaphore.acquire()
+        waited = timer() - start
+
+        with self.lock:
+            self.waiting[key] -= 1
+
+        try:
+            if on_wait is not None:
+                on_wait(waited, depth)
+            yield
+        finally:
+            semaphore.release()
@@ -0,0 +1,141 @@
+"""
+Wait for iam to tell everything else about roles we just made
+
+Iam is eventually consistent, so for a little while after a role is made,
+putting a policy on it, putting it in an instance profile, or a key or bucket
+policy that trusts it can fail as if the role doesn't exist.
+
+So we remember the arns of the roles we make, and calls that need one of them,
+or have a policy with one of them as a principal, are tried again with
+exponential backoff while they fail with an error that means amazon doesn't
+know about the role yet. A malformed policy only means that when amazon says
+the principal is invalid, so a policy that is wrong fails straight away. Calls
+that don't need a new role and any other error aren't tried again.
+
+How long each call had to wait after its role was made is kept in our metrics
+so we know how long amazon actually takes.
+"""
+from iam_syncr.amazon.calls import error_code_for
+from iam_syncr import jsonlib
+
+import threading
+import logging
+import boto
+import time
+
+log = logging.getLogger("iam_syncr.amazon.propagation")
+
+timer = getattr(time, "perf_counter", time.time)
+
+# What amazon says when it doesn't know about a role yet
+PROPAGATION_ERRORS = set([
+      "NoSuchEntity"
+    , "InvalidArnException"
+    ])
+
+# What amazon says about a policy that is wrong, including when a principal is a role it doesn't know about yet
+MALFORMED_POLICY_ERRORS = set([
+      "MalformedPolicyDocument"
+    , "MalformedPolicyDocumentException"
+    , "MalformedPolicy"
+    ])
+
+def is_propagation_error(error):
+    """Say whether this error means amazon doesn't know about a role yet"""
+    code = error_code_for(error)
+    if code in PROPAGATION_ERRORS:
+        return True
+
+    if code in MALFORMED_POLICY_ERRORS:
+        message = getattr(error, "error_message", None) or getattr(error, "body", None) or ""
+        return "invalid principal" in str(message).lower()
+
+    return False
+
+def principals_in(document):
+    """Return the AWS principals of the statements in this policy document"""
+    try:
+        parsed = jsonlib.loads(document) if not isinstance(document, dict) else document
+    except (TypeError, ValueError):
+        return []
+
+    statements = parsed.get("Statement", []) if isinstance(parsed, dict) else []
+    if isinstance(statements, dict):
+        statements = [statements]
+
+    found = []
+    for statement in statements:
+        principal = statement.get("Principal") if isinstance(statement, dict) else None
+        if isinstance(principal, dict):
+            principal = principal.get("AWS")
+        if isinstance(principal, list):
+            found.extend(principal)
+        elif principal:
+            found.append(principal)
+    return found
+
+class Propagation(object):
+    """
+    The roles we made in this run and how to wait for them
+
+    first
+        Seconds to wait before trying a call again the first time
+
+    most
+        Most seconds to wait between tries
+
+    give_up
+        Seconds after the role was made to stop trying
+    """
+    def __init__(self, account, metrics, first=0.5, most=8, give_up=60, sleep=time.sleep):
+        self.lock = threading.Lock()
+        self.account = account
+        self.metrics = metrics
+        self.sleep = sleep
+
+        self.first = first
+        self.most = most
+        self.give_up = give_up
+
+        self.created = {}
+
+    def made_role(self, arn):
+        """Remember that we just made the role with this arn"""
+        with self.lock:
+            self.created[arn] = timer()
+
+    def new_roles(self, arns=None, document=None):
+        """Return the arns from these, or the principals of this document, of roles we made in this run"""
+        with self.lock:
+            if not self.created:
+                return {}
+            created = dict(self.created)
+
+        wanted = list(arns or [])
+        if document:
+            wanted.extend(principals_in(document))
+        return dict((arn, created[arn]) for arn in wanted if arn in created)
+
+    def call(self, service, region, operation, func, arns=None, document=None):
+        """Call func, trying again while amazon doesn't know about the new roles it needs"""
+        waiting_for = self.new_roles(arns=arns, document=document)
+        if not waiting_for:
+            return func()
+
+        made = min(waiting_for.values())
+        delay = self.first
+        while True:
+            try:
+                result = func()
+            except boto.exception.BotoServerError as error:
+                code = error_code_for(error)
+                if not is_propagation_error(error) or timer() - made + delay > self.give_up:
+                    raise
+
+                log.info("Waiting for amazon to know about new roles\toperation=%s\troles=%s\terror=%s\tdelay=%s", operation, sorted(waiting_for), code, delay)
+                self.metrics.record_retry(self.account, service, region, operation)
+                self.sleep(delay)
+                delay = min(delay * 2, self.most)
+            else:
+                self.metrics.record_propagation(self.account, service, region, operation, timer() - made)
+                return result
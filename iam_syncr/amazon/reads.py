@@ -0,0 +1,83 @@
+"""
+Remember what we read from amazon for the rest of the run
+
+The same role, bucket or key gets asked about more than once in a sync, and
+with item workers those asks can happen at the same time. Only the first one
+talks to amazon, anyone asking while it does waits for its answer, and anyone
+asking after gets the answer we remembered.
+
+Writes forget what they change, so the next read asks amazon again.
+"""
+import threading
+import six
+import sys
+
+class Flight(object):
+    """A read that is talking to amazon right now"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.forgotten = False
+
+class ReadCache(object):
+    """Thread safe map of what we read to what amazon said"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.found = {}
+        self.flights = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get(self, key, func):
+        """Return what func gives back for this key, only calling it if no one else has or is"""
+        with self.lock:
+            if key in self.found:
+                self.hits += 1
+                return self.found[key]
+
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self.flights[key] = Flight()
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                six.reraise(*flight.error)
+            return flight.result
+
+        try:
+            flight.result = func()
+        except Exception:
+            flight.error = sys.exc_info()
+            raise
+        else:
+            with self.lock:
+                if not flight.forgotten:
+                    self.found[key] = flight.result
+        finally:
+            with self.lock:
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+            flight.done.set()
+
+        return flight.result
+
+    def forget(self, *keys):
+        """Forget these keys, including what is being read for them right now"""
+        with self.lock:
+            for key in keys:
+                self.found.pop(key, None)
+                flight = self.flights.pop(key, None)
+                if flight is not None:
+                    flight.forgotten = True
+
+    def clear(self):
+        with self.lock:
+            self.found.clear()
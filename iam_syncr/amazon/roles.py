@@ -1,10 +1,10 @@
-from iam_syncr.amazon.common import AmazonMixin, LeaveAlone
+from iam_syncr.amazon.common import AmazonMixin, LeaveAlone, all_pages
 from iam_syncr.amazon.documents import AmazonDocuments
+from iam_syncr.policy import Document
 
 from six.moves.urllib import parse
 import logging
 import boto
-import json
 
 log = logging.getLogger("iam_syncr.amazon.roles")
 
@@ -25,15 +25,23 @@ class AmazonRoles(AmazonMixin, object):
             path = "{0}/".format(path)
         return role_name, path
 
+    def arn_for(self, name):
+        """Return the arn of the role with this name"""
+        role_name, path = self.split_role_name(name)
+        return "arn:aws:iam::{0}:role{1}{2}".format(self.amazon.account_id, path or "/", role_name)
+
     def role_info(self, name):
         """Return what amazon knows about this role"""
-        try:
-            role_name, _ = self.split_role_name(name)
-            return self.connection.get_role(role_name)["get_role_response"]["get_role_result"]
-        except boto.exception.BotoServerError as error:
-            if error.status == 404:
-                return False
-            raise
+        role_name, _ = self.split_role_name(name)
+
+        def read():
+            try:
+                return self.connection.get_role(role_name)["get_role_response"]["get_role_result"]
+            except boto.exception.BotoServerError as error:
+                if error.status == 404:
+                    return False
+                raise
+        return self.cached_read(("role", role_name), read)
 
     def has_role(self, name):
         """Return whether amazon has info about this role"""
@@ -86,14 +94,16 @@ class AmazonRoles(AmazonMixin, object):
         if not existing_roles_in_profile or not any(rl == role_name for rl in existing_roles_in_profile):
             with self.catch_boto_400("Couldn't add role to an instance profile", role=role_name, instance_profile=role_name):
                 for _ in self.change("+", "instance_profile_role", profile=role_name, role=role_name):
-                    self.connection.add_role_to_instance_profile(role_name, role_name)
+                    self.after_propagation("iam", "global", "add_role_to_instance_profile", lambda: self.connection.add_role_to_instance_profile(role_name, role_name), arns=[self.arn_for(name)])
 
     def create_role(self, name, trust_document, policies=None):
         """Create a role"""
         role_name, role_path = self.split_role_name(name)
         with self.catch_boto_400("Couldn't create role", "{0} trust document".format(name), trust_document, role=name):
             for _ in self.change("+", "role", role=role_name, document=trust_document):
-                self.connection.create_role(role_name, assume_role_policy_document=trust_document, path=role_path)
+                self.after_propagation("iam", "global", "create_role", lambda: self.connection.create_role(role_name, assume_role_policy_document=trust_document, path=role_path), document=trust_document)
+                self.forget(("role", role_name))
+                self.made_role(self.arn_for(name))
 
         # And add our permissions
         if policies:
@@ -101,17 +111,18 @@ class AmazonRoles(AmazonMixin, object):
                 if document:
                     with self.catch_boto_400("Couldn't add policy", "{0} - {1} Permission document".format(role_name, policy_name), document, role=role_name, policy_name=policy_name):
                         for _ in self.change("+", "role_policy", role=role_name, policy=policy_name, document=document):
-                            self.connection.put_role_policy(role_name, policy_name, document)
+                            self.after_propagation("iam", "global", "put_role_policy", lambda: self.connection.put_role_policy(role_name, policy_name, document), arns=[self.arn_for(name)])
 
-    def modify_role(self, role_info, name, trust_document, policies=LeaveAlone):
-        """Modify a role"""
+    def modify_role(self, role_info, name, trust_document, policies=LeaveAlone, current_policies=None):
+        """Modify a role, current_policies is what current_role_policies gave back if we already asked"""
         role_name, _ = self.split_role_name(name)
         if trust_document:
-            changes = list(self.documents.compare_trust_document(role_info, trust_document))
+            changes = self.documents.trust_document_change(role_info, trust_document)
             if changes:
                 with self.catch_boto_400("Couldn't modify trust document", "{0} assume document".format(role_name), trust_document, role=role_name):
                     for _ in self.change("M", "trust_document", role=role_name, changes=changes):
-                        self.connection.update_assume_role_policy(role_name, trust_document)
+                        self.after_propagation("iam", "global", "update_assume_role_policy", lambda: self.connection.update_assume_role_policy(role_name, trust_document), document=trust_document)
+                        self.forget(("role", role_name))
 
         if policies is LeaveAlone:
             return
@@ -119,8 +130,9 @@ class AmazonRoles(AmazonMixin, object):
             policies = {}
 
         unknown = []
-        with self.catch_boto_400("Couldn't get policies for a role", role=role_name):
-            current_policies = self.current_role_policies(role_name, comparing=[pn for pn in policies])
+        if current_policies is None:
+            with self.catch_boto_400("Couldn't get policies for a role", role=role_name):
+                current_policies = self.current_role_policies(role_name, comparing=[pn for pn in policies])
         unknown = [key for key in current_policies if key not in policies]
 
         if unknown:
@@ -141,7 +153,7 @@ class AmazonRoles(AmazonMixin, object):
                 changes = None
 
                 if policy in current_policies:
-                    changes = list(self.documents.compare_two_documents(current_policies.get(policy), document))
+                    changes = self.documents.document_change(current_policies.get(policy), document)
                     if changes:
                         log.info("Overriding existing policy\trole=%s\tpolicy=%s", role_name, policy)
                         needed = True
@@ -159,7 +171,7 @@ class AmazonRoles(AmazonMixin, object):
         """Get the current policies for some role"""
         role_name, _ = self.split_role_name(name)
         with self.catch_boto_400("Couldn't get policies for a role", role=name):
-            policies = self.connection.list_role_policies(role_name)["list_role_policies_response"]["list_role_policies_result"]["policy_names"]
+            policies = all_pages(self.connection.list_role_policies, "list_role_policies_response", "list_role_policies_result", "policy_names", role_name)
 
         found = {}
         for policy in policies:
@@ -167,7 +179,7 @@ class AmazonRoles(AmazonMixin, object):
             if policy in comparing:
                 with self.catch_boto_400("Couldn't get policy document for some policy", policy=policy, role=name):
                     doc = self.connection.get_role_policy(role_name, policy)["get_role_policy_response"]["get_role_policy_result"]["policy_document"]
-                document = json.dumps(json.loads(parse.unquote(doc)), indent=2).strip()
+                document = Document.loads(parse.unquote(doc)).dumps()
             found[policy] = document
 
         return found
@@ -187,6 +199,7 @@ class AmazonRoles(AmazonMixin, object):
             with self.catch_boto_400("Couldn't delete a role", role=role_name):
                 for _ in self.change("-", "role", role=role_name):
                     self.connection.delete_role(role_name)
+                    self.forget(("role", role_name))
         else:
             log.info("Role already deleted\trole=%s", role_name)
 
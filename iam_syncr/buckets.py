@@ -31,15 +31,31 @@ class Bucket(object):
                 for statement in self.statements.make_permission_statements(policy, allow=default_allow):
                     self.permission.append(statement)
 
-    def resolve(self):
-        """Make sure this user exists and has only what policies we want it to have"""
+    def requires(self):
+        """Roles in this account that need to exist before they can be in our policy"""
+        return [("role", name) for name in self.statements.roles_referenced(self.permission)]
+
+    def prefetch(self):
+        """Read what amazon has for this bucket, so resolve doesn't have to wait for it"""
+        return self.amazon_buckets.remote_state(self.name)
+
+    def resolve(self, remote=None):
+        """
+        Make sure this user exists and has only what policies we want it to have
+
+        remote is what prefetch gave back, if it was already called
+        """
         permission_document = self.make_permission_document(self.permission)
 
-        bucket_info = self.amazon_buckets.bucket_info(self.name)
+        bucket_info = remote["bucket"] if remote is not None else self.amazon_buckets.bucket_info(self.name)
         if not bucket_info:
             self.amazon_buckets.create_bucket(self.name, self.location, permission_document=permission_document, tags=self.tags)
         else:
-            self.amazon_buckets.modify_bucket(self.name, self.location, permission_document=permission_document, tags=self.tags)
+            self.amazon_buckets.modify_bucket(self.name, self.location, permission_document=permission_document, tags=self.tags, remote=remote)
+
+    def compiled(self):
+        """Return the documents this bucket would be synced with"""
+        return {"permission_document": self.make_permission_document(self.permission)}
 
     def make_permission_document(self, permissions):
         """Return a document for these permissions, or None if no permissiosn"""
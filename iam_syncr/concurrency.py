@@ -0,0 +1,64 @@
+from six.moves import queue
+import threading
+import logging
+import sys
+
+log = logging.getLogger("iam_syncr.concurrency")
+
+class Outcome(object):
+    """The result of running one job"""
+    def __init__(self, key, result=None, error=None, exc_info=None):
+        self.key = key
+        self.error = error
+        self.result = result
+        self.exc_info = exc_info
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+def run_concurrently(jobs, workers):
+    """
+    Run jobs of [(key, func), ...] using at most ``workers`` threads
+
+    Return a list of Outcome in the same order as the jobs.
+
+    Exceptions are caught and recorded on the outcome rather than raised
+    """
+    jobs = list(jobs)
+    outcomes = [None] * len(jobs)
+
+    if workers <= 1 or len(jobs) <= 1:
+        for index, (key, func) in enumerate(jobs):
+            outcomes[index] = run_one(key, func)
+        return outcomes
+
+    todo = queue.Queue()
+    for index, job in enumerate(jobs):
+        todo.put((index, job))
+
+    def worker():
+        while True:
+            try:
+                index, (key, func) = todo.get_nowait()
+            except queue.Empty:
+                return
+            outcomes[index] = run_one(key, func)
+
+    threads = [threading.Thread(target=worker, name="iam_syncr-worker-{0}".format(num)) for num in range(min(workers, len(jobs)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return outcomes
+
+def run_one(key, func):
+    """Run one job and return an Outcome"""
+    try:
+        return Outcome(key, result=func())
+    except Exception as error:
+        log.debug("Job failed\tkey=%s\terror=%s", key, error)
+        return Outcome(key, error=error, exc_info=sys.exc_info())
@@ -41,3 +41,14 @@ class NoTemplates(SyncrError):
 class BadAlias(SyncrError):
     desc = "Bad kms alias"
 
+class BadCassette(SyncrError):
+    desc = "Couldn't replay from the recording"
+
+class ReplayedError(SyncrError):
+    desc = "The recorded call failed"
+
+class CircuitOpen(SyncrError):
+    desc = "Stopped talking to amazon"
+
+class DeadlineExceeded(SyncrError):
+    desc = "Took too long"
@@ -1,13 +1,33 @@
+from __future__ import print_function
+
 from iam_syncr.errors import SyncrError, BadConfiguration, InvalidConfiguration, NoConfiguration
+from iam_syncr.amazon.cassette import Cassette, ReplayBackend
+from iam_syncr.amazon.changes import JsonlWriter, jsonl_sink, ignore_changes
+from iam_syncr.amazon.breakers import Breakers, Deadline
+from iam_syncr.concurrency import run_concurrently, run_one
+from iam_syncr.amazon.limits import Limits, parse_cap
 from iam_syncr.amazon.base import Amazon
+from iam_syncr.journal import Journal
+from iam_syncr.profiling import profiled, profiler
+from iam_syncr.tracing import span, tracer
+from iam_syncr.scheduler import HAS_ASYNCIO
+from iam_syncr.metrics import Metrics
+from iam_syncr.shards import Shard
 from iam_syncr.syncer import Sync
 from iam_syncr import VERSION
+from iam_syncr import shards
+from iam_syncr import policy
+from iam_syncr import lock
 
 from rainbow_logging_handler import RainbowLoggingHandler
+import threading
 import argparse
 import logging
 import fnmatch
+import copy
+import json
 import yaml
+import six
 import sys
 import os
 
@@ -35,6 +55,20 @@ def argparse_readable_folder(value):
         raise argparse.ArgumentTypeError("{0} exists and is a folder but isn't readable".format(value))
     return os.path.abspath(value)
 
+def argparse_shard(value):
+    """Argparse type for a shard like 0/4"""
+    try:
+        return Shard.from_string(value)
+    except SyncrError as error:
+        raise argparse.ArgumentTypeError("{0} ({1})".format(error.message, value))
+
+def argparse_limit(value):
+    """Argparse type for a limit like iam=2"""
+    try:
+        return parse_cap(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
 def make_parser():
     """Make us a parser"""
     parser = argparse.ArgumentParser(description="Sync script, supply your own creds!")
@@ -43,9 +77,11 @@ def make_parser():
         , action = "store_true"
         )
 
-    parser.add_argument("folder"
-        , help = "The folder containing the roles we want to sync"
+    parser.add_argument("folders"
+        , help = "The folders containing the roles we want to sync, or one folder containing an accounts.yaml and a folder per account"
         , type = argparse_readable_folder
+        , nargs = "+"
+        , metavar = "folder"
         )
 
     parser.add_argument("--accounts-location"
@@ -67,9 +103,215 @@ def make_parser():
         , action = "store_true"
         )
 
+    parser.add_argument("--output"
+        , help = "How to show changes: text for people, summary for only a table of how many changes there were, or jsonl for one json object per change (and one per account at the end) on stdout, with everything else on stderr"
+        , choices = ["text", "summary", "jsonl"]
+        , default = "text"
+        )
+
+    parser.add_argument("--workers"
+        , help = "How many accounts to sync at the same time"
+        , type = int
+        , default = 4
+        )
+
+    parser.add_argument("--item-workers"
+        , help = "How many roles, keys and buckets to resolve at the same time in each account"
+        , type = int
+        , default = 1
+        )
+
+    parser.add_argument("--prefetch"
+        , help = "How many roles, keys and buckets to read from amazon ahead of resolving them, 0 to not read ahead"
+        , type = int
+        , default = 4
+        )
+
+    parser.add_argument("--engine"
+        , help = "Resolve things with a pool of threads, or with asyncio (python 3.5 or newer)"
+        , choices = ["threads", "asyncio"]
+        , default = "threads"
+        )
+
+    parser.add_argument("--limit"
+        , help = "How many calls to make to a service at once, as <service>[:<region>]=<count> (i.e. iam=2 or kms:us-east-1=8). 0 is no limit"
+        , type = argparse_limit
+        , action = "append"
+        , dest = "limits"
+        )
+
+    parser.add_argument("--deadline"
+        , help = "How many seconds the whole run may take, nothing more is asked of amazon after that"
+        , type = float
+        )
+
+    parser.add_argument("--socket-timeout"
+        , help = "How many seconds to wait for amazon to connect or say something before giving up on a call"
+        , type = float
+        )
+
+    parser.add_argument("--breaker-threshold"
+        , help = "How many calls in a row to a service and region can fail because of amazon before we stop calling it for a while. 0 never stops"
+        , type = int
+        , default = 5
+        )
+
+    parser.add_argument("--breaker-cooldown"
+        , help = "How many seconds to stop calling a service and region for when it keeps failing"
+        , type = float
+        , default = 30
+        )
+
+    parser.add_argument("--profile-per-account"
+        , help = "Use the boto profile named after each account for that account's credentials"
+        , action = "store_true"
+        )
+
+    parser.add_argument("--shard"
+        , help = "Only sync the roles, buckets and keys that belong to this shard of the account (i.e. 0/4)"
+        , type = argparse_shard
+        )
+
+    parser.add_argument("--shard-result"
+        , help = "Where to write the json result of this shard for merging later"
+        )
+
+    parser.add_argument("--journal"
+        , help = "Record everything that gets synced in this file"
+        )
+
+    parser.add_argument("--resume"
+        , help = "Skip things the journal says were already synced, unless they have changed since"
+        , action = "store_true"
+        )
+
+    parser.add_argument("--metrics-json"
+        , help = "Write counts and latencies of the calls made to amazon to this file as json"
+        )
+
+    parser.add_argument("--metrics-prometheus"
+        , help = "Write counts and latencies of the calls made to amazon to this file for the prometheus node exporter"
+        )
+
+    parser.add_argument("--trace"
+        , help = "Write a chrome trace of where the time went to this file"
+        )
+
+    parser.add_argument("--profile"
+        , help = "Run each phase of the sync under cProfile, one account and one item at a time"
+        , action = "store_true"
+        )
+
+    parser.add_argument("--profile-memory"
+        , help = "Run each phase of the sync under tracemalloc"
+        , action = "store_true"
+        )
+
+    parser.add_argument("--profile-dir"
+        , help = "Where to write the profiles"
+        , default = "iam_syncr_profile"
+        )
+
+    parser.add_argument("--record"
+        , help = "Record every call made to amazon into this folder"
+        )
+
+    parser.add_argument("--replay"
+        , help = "Replay calls recorded with --record from this folder instead of talking to amazon"
+        )
+
+    parser.add_argument("--replay-latency"
+        , help = "Make replayed calls take as long as they did when they were recorded"
+        , action = "store_true"
+        )
+
     return parser
 
-def accounts_from(location):
+def make_merge_shards_parser():
+    """Make us a parser for merging shard results"""
+    parser = argparse.ArgumentParser(prog="iam_syncr merge-shards", description="Combine the results of a sharded sync")
+    parser.add_argument("results"
+        , help = "The json files written by --shard-result"
+        , nargs = "+"
+        )
+
+    parser.add_argument("--output"
+        , help = "Where to write the merged report"
+        )
+
+    return parser
+
+def make_compile_parser():
+    """Make us a parser for compiling a lock file"""
+    parser = argparse.ArgumentParser(prog="iam_syncr compile", description="Compile the documents for an account into a lock file, no creds required")
+    parser.add_argument("-v", "--verbose"
+        , help = "Show debug logging"
+        , action = "store_true"
+        )
+
+    parser.add_argument("folder"
+        , help = "The folder containing the roles we want to compile"
+        , type = argparse_readable_folder
+        )
+
+    parser.add_argument("--accounts-location"
+        , help = "Path to accounts.yaml holding the map of human names to accounts ids"
+        )
+
+    parser.add_argument("--filename-match"
+        , help = "A glob to match the path of the configuration against (relative to the specified folder)"
+        , default = "*.yaml"
+        )
+
+    parser.add_argument("--output"
+        , help = "Where to write the lock file, defaults to <folder>.lock.json"
+        )
+
+    parser.add_argument("--force"
+        , help = "Compile even if the lock file was made from the same configuration"
+        , action = "store_true"
+        )
+
+    return parser
+
+class ParseCache(object):
+    """
+    Thread safe cache of parsed yaml files shared between the accounts in one run
+
+    Files are keyed by their real path, modified time and size and a copy of
+    the parsed yaml is returned because the syncing may modify what it's given
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.parsed = {}
+
+    def load(self, location):
+        """Return the parsed yaml at this location"""
+        stat = os.stat(location)
+        key = (os.path.realpath(location), stat.st_mtime, stat.st_size)
+
+        with self.lock:
+            found = key in self.parsed
+            if found:
+                parsed = self.parsed[key]
+
+        if not found:
+            with open(location) as fle:
+                parsed = yaml.load(fle)
+            with self.lock:
+                self.parsed[key] = parsed
+
+        return copy.deepcopy(parsed)
+
+def load_yaml(location, cache=None):
+    """Load yaml from this location, using the cache if we have one"""
+    if cache is not None:
+        return cache.load(location)
+
+    with open(location) as fle:
+        return yaml.load(fle)
+
+def accounts_from(location, cache=None):
     """Get the accounts dictionary"""
     if not os.path.exists(location):
         raise SyncrError("Could not find an accounts.yaml", location=location)
@@ -78,7 +320,7 @@ def accounts_from(location):
         raise SyncrError("Could not read the accounts.yaml", location=location)
 
     try:
-        accounts = yaml.load(open(location))
+        accounts = load_yaml(location, cache)
     except yaml.parser.ParserError as error:
         raise SyncrError("Failed to parse the accounts yaml file", location=location, error_typ=error.__class__.__name__, error=error)
 
@@ -88,34 +330,185 @@ def accounts_from(location):
 
     return accounts
 
-def make_amazon(folder, accounts_location=None, dry_run=False):
-    """Find the account we're using and return a setup Amazon object"""
+def make_amazon(folder, accounts_location=None, dry_run=False, setup=True, profile_per_account=False, cache=None, **amazon_options):
+    """
+    Find the account we're using and return a setup Amazon object
+
+    Any amazon_options are passed into the Amazon object
+    """
     if not accounts_location:
         accounts_location = os.path.join(folder, '..', 'accounts.yaml')
 
-    accounts = accounts_from(accounts_location)
+    accounts = accounts_from(accounts_location, cache=cache)
     account_name = os.path.basename(folder)
 
     if account_name not in accounts:
         raise SyncrError("Please add this account to accounts.yaml", accounts_yaml_location=accounts_location, account_name=account_name)
     account_id = accounts[account_name]
 
-    amazon = Amazon(account_id, account_name, accounts, dry_run=dry_run)
-    amazon.setup()
+    profile_name = account_name if profile_per_account else None
+    amazon = Amazon(account_id, account_name, accounts, dry_run=dry_run, profile_name=profile_name, **amazon_options)
+    if setup:
+        amazon.setup()
 
     return amazon
 
-def do_sync(amazon, found, only_consider=None):
-    """Sync the configuration from this folder"""
+def account_folders(folders, accounts_location=None):
+    """
+    Return the account folders to sync
+
+    A single folder that has an accounts.yaml in it is treated as a root folder
+    and we return every folder in it named after an account.
+    """
+    if len(folders) != 1:
+        return list(folders)
+
+    root = folders[0]
+    root_accounts = accounts_location or os.path.join(root, "accounts.yaml")
+    if os.path.dirname(os.path.abspath(root_accounts)) != os.path.abspath(root) or not os.path.exists(root_accounts):
+        return list(folders)
+
+    accounts = accounts_from(root_accounts)
+    found = []
+    for name in sorted(os.listdir(root)):
+        location = os.path.join(root, name)
+        if name in accounts and os.path.isdir(location):
+            found.append(location)
+
+    if not found:
+        raise NoConfiguration("Didn't find any folders named after the accounts in accounts.yaml", folder=root)
+
+    return found
+
+def sync_account(folder, args, cache=None, journal=None, writer=None, **amazon_options):
+    """
+    Sync one account folder and return the Sync object that was used
+
+    If we have a writer, then changes are written to it as json lines instead
+    of being printed, followed by a summary of the account.
+    """
+    account = os.path.basename(folder)
+    if writer is not None:
+        amazon_options["change_sink"] = jsonl_sink(writer, account, dry_run=args.dry_run)
+    elif args.output == "summary":
+        amazon_options["change_sink"] = ignore_changes
+
+    # Amazon rate limits each account separately, so each account gets its own limits
+    amazon_options["limits"] = Limits(dict(args.limits or []))
+    amazon_options["breakers"] = Breakers(args.breaker_threshold, args.breaker_cooldown)
+    amazon_options["socket_timeout"] = args.socket_timeout
+
+    cassette = cassette_for(account, args)
+    if cassette is not None:
+        amazon_options["cassette"] = cassette
+        if cassette.replaying:
+            amazon_options["backend"] = ReplayBackend()
+
     try:
-        parsed = parse_configurations(found)
+        log.info("Making a connection to amazon")
+        with span("make_amazon", account=account):
+            amazon = make_amazon(folder=folder, accounts_location=args.accounts_location, dry_run=args.dry_run, profile_per_account=args.profile_per_account, cache=cache, **amazon_options)
+
+        log.info("Finding the configuration")
+        with span("find_configurations", account=account):
+            found = find_configurations(folder, args.filename_match)
+
+        log.info("Syncing for account %s from %s", amazon.account_id, folder)
+        if args.shard:
+            log.info("Only syncing shard %s", args.shard)
+        sync = do_sync(amazon, found, args.only_consider, cache=cache, shard=args.shard, journal=journal, workers=args.item_workers, engine=args.engine, prefetch=args.prefetch)
+        if writer is not None:
+            writer.write([{"account": account, "dry_run": args.dry_run, "changed": amazon.changes, "summary": amazon.recorder.as_dict(), "skipped": dict(sync.skipped)}])
+        return sync
+    finally:
+        if cassette is not None:
+            cassette.close()
+
+def cassette_for(account, args):
+    """Return a Cassette for this account if we're recording or replaying"""
+    if args.replay:
+        return Cassette(args.replay, account, replaying=True, latency=args.replay_latency)
+    elif args.record:
+        return Cassette(args.record, account)
+
+def write_metrics(metrics, args):
+    """Write out our metrics if we were asked to"""
+    log.info("Made %s calls to amazon", metrics.total_calls)
+    for name, stats in sorted(policy.interning_stats().items()):
+        log.info("Kept %s of %s %s (deduplication ratio %.2f)", stats["unique"], stats["seen"], name, stats["ratio"])
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+    if args.metrics_prometheus:
+        metrics.write_prometheus(args.metrics_prometheus)
+
+def print_error(err, out=None):
+    """Print out an error that stopped us"""
+    out = out or sys.stdout
+    print("!" * 80, file=out)
+    print("Something went wrong => {0} |:| {1}".format(err.__class__.__name__, err), file=out)
+
+def report(outcomes):
+    """Print a summary of syncing multiple accounts"""
+    print("=" * 80)
+    print("Account summary")
+    for outcome in outcomes:
+        name = os.path.basename(outcome.key)
+        if outcome.failed:
+            print("  {0}: failed => {1} |:| {2}".format(name, outcome.error.__class__.__name__, outcome.error))
+        elif outcome.result.amazon.changes:
+            print("  {0}: changed".format(name))
+        else:
+            print("  {0}: no changes".format(name))
+
+        if not outcome.failed:
+            print_summary(outcome.result, indent="    ")
+            if outcome.result.skipped:
+                print_skipped(outcome.result.skipped, indent="    ")
+
+def print_summary(sync, indent=""):
+    """Print a table of how many of each type of thing were created, modified and deleted"""
+    recorder = sync.amazon.recorder
+    if recorder.total:
+        print("\n".join("{0}{1}".format(indent, line) for line in recorder.summary()))
+
+def print_skipped(skipped, indent="", out=None):
+    """Print out the things we skipped because amazon kept failing"""
+    out = out or sys.stdout
+    print("{0}Skipped because amazon kept failing: {1}".format(indent, ", ".join("{0}:{1}".format(typ, name) for typ in sorted(skipped) for name in skipped[typ])), file=out)
+
+def do_sync(amazon, found, only_consider=None, cache=None, shard=None, journal=None, workers=1, engine="threads", prefetch=0):
+    """Sync the configuration from this folder and return the Sync object"""
+    sync, combined = prepare_sync(amazon, found, only_consider, cache=cache, shard=shard)
+    sync.engine = engine
+    sync.prefetch = prefetch
+    sync.journal = journal
+    sync.workers = workers
+
+    log.info("Starting sync")
+    with span("sync", account=amazon.account_name):
+        sync.sync(combined)
+    return sync
+
+def do_compile(amazon, found):
+    """Return the compiled documents for the configuration from this folder"""
+    sync, combined = prepare_sync(amazon, found)
+
+    log.info("Compiling documents")
+    return sync.compile(combined)
+
+def prepare_sync(amazon, found, only_consider=None, cache=None, shard=None):
+    """Parse and combine the configuration and return (sync, combined)"""
+    try:
+        with span("parse_configurations", account=amazon.account_name):
+            with profiled("parse_configurations", account=amazon.account_name):
+                parsed = parse_configurations(found, cache=cache)
     except BadConfiguration as err:
         log.error("Failed to parse all the yaml specifications")
         for _, error in sorted(err.kwargs["parse_errors"].items()):
             log.error(error)
         raise BadConfiguration()
 
-    sync = Sync(amazon)
+    sync = Sync(amazon, shard=shard)
     sync.register_default_types()
 
     if only_consider:
@@ -128,17 +521,18 @@ def do_sync(amazon, found, only_consider=None):
 
     try:
         log.info("Combining configuration")
-        combined = sync.combine_configurations()
+        with span("combine_configurations", account=amazon.account_name):
+            with profiled("combine_configurations", account=amazon.account_name):
+                combined = sync.combine_configurations()
     except BadConfiguration as err:
         log.error("Your configuration didn't make sense")
         for error in err.kwargs["errors"]:
             log.error(error)
         raise BadConfiguration()
 
-    log.info("Starting sync")
-    sync.sync(combined)
+    return sync, combined
 
-def parse_configurations(locations):
+def parse_configurations(locations, cache=None):
     """
     Return a dictionary of {location: <parsed_yaml>} for .yaml files in this folder
 
@@ -149,7 +543,7 @@ def parse_configurations(locations):
     parse_errors = {}
     for location in locations:
         try:
-            config = yaml.load(open(location))
+            config = load_yaml(location, cache)
             if not isinstance(config, dict):
                 parse_errors[location] = InvalidConfiguration("Configuration is not a dictionary", location=location, found=type(config))
             else:
@@ -177,28 +571,162 @@ def find_configurations(folder, filename_match):
 
     return found
 
-def main(argv=None):
-    parser = make_parser()
+def compile_main(argv=None):
+    parser = make_compile_parser()
     args = parser.parse_args(argv)
     setup_logging(verbose=args.verbose)
 
-    Amazon.set_boto_useragent("iam_syncr", VERSION)
+    output = args.output or "{0}.lock.json".format(args.folder.rstrip(os.sep))
 
     try:
-        log.info("Making a connection to amazon")
-        amazon = make_amazon(folder=args.folder, accounts_location=args.accounts_location, dry_run=args.dry_run)
+        amazon = make_amazon(folder=args.folder, accounts_location=args.accounts_location, dry_run=True, setup=False)
 
         log.info("Finding the configuration")
         found = find_configurations(args.folder, args.filename_match)
 
-        log.info("Syncing for account %s from %s", amazon.account_id, args.folder)
-        do_sync(amazon, found, args.only_consider)
+        digest = lock.sources_digest(found, amazon.accounts, folder=args.folder)
+        if not args.force and lock.lock_is_current(output, digest):
+            log.info("Lock file is already up to date\tlocation=%s\tdigest=%s", output, digest)
+            return
 
-        if not amazon.changes:
-            log.info("No changes were made!")
+        log.info("Compiling account %s from %s", amazon.account_id, args.folder)
+        compiled = do_compile(amazon, found)
+
+        lock.write_lock(output, lock.make_lock(amazon, compiled, digest))
+        log.info("Wrote lock file\tlocation=%s\tdigest=%s", output, digest)
+    except SyncrError as err:
+        print_error(err)
+        sys.exit(1)
+
+def merge_shards_main(argv=None):
+    parser = make_merge_shards_parser()
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    try:
+        merged = shards.merge_results(shards.read_results(args.results))
+    except SyncrError as err:
+        print_error(err)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "w") as fle:
+            json.dump(merged, fle, sort_keys=True, indent=2, separators=(",", ": "))
+
+    print("=" * 80)
+    print("Merged {0} shard results".format(len(args.results)))
+    for name, account in sorted(merged["accounts"].items()):
+        synced = sum(len(names) for names in account["items"].values())
+        state = "changed" if account["changes"] else "no changes"
+        if not account["ok"]:
+            state = "failed => {0}".format("; ".join(error["error"] for error in account["errors"]))
+        print("  {0}: {1} items, {2}".format(name, synced, state))
+
+    if not merged["complete"]:
+        print("Missing shards: {0}".format(", ".join(str(index) for index in merged["missing"])))
+
+    if not merged["complete"] or not all(account["ok"] for account in merged["accounts"].values()):
+        sys.exit(1)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv and argv[0] == "compile":
+        return compile_main(argv[1:])
+
+    if argv and argv[0] == "merge-shards":
+        return merge_shards_main(argv[1:])
+
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    setup_logging(verbose=args.verbose)
+
+    # Keep stdout for the json lines when that's what we output
+    out = sys.stderr if args.output == "jsonl" else sys.stdout
+
+    Amazon.set_boto_useragent("iam_syncr", VERSION)
+
+    if args.resume and not args.journal:
+        parser.error("--resume needs a --journal to resume from")
+
+    if args.record and args.replay:
+        parser.error("Can't --record and --replay at the same time")
+
+    if args.engine == "asyncio" and not HAS_ASYNCIO:
+        parser.error("The asyncio engine needs python 3.5 or newer")
+
+    if args.profile and (args.workers != 1 or args.item_workers != 1 or args.prefetch or args.engine != "threads"):
+        log.info("cProfile only sees one thread, so profiling one account and one item at a time")
+        args.workers, args.item_workers, args.prefetch, args.engine = 1, 1, 0, "threads"
+
+    journal = None
+    try:
+        folders = account_folders(args.folders, args.accounts_location)
+        if args.journal and not args.dry_run:
+            journal = Journal(args.journal, resume=args.resume)
     except SyncrError as err:
-        print("!" * 80)
-        print("Something went wrong => {0} |:| {1}".format(err.__class__.__name__, err))
+        print_error(err, out=out)
+        sys.exit(1)
+
+    if args.trace:
+        tracer.start()
+
+    if args.profile or args.profile_memory:
+        try:
+            profiler.start(args.profile_dir, cpu=args.profile, memory=args.profile_memory)
+        except SyncrError as err:
+            print_error(err, out=out)
+            sys.exit(1)
+
+    metrics = Metrics()
+    deadline = Deadline(args.deadline) if args.deadline else None
+    writer = JsonlWriter(sys.stdout).start() if args.output == "jsonl" else None
+    try:
+        if len(folders) == 1:
+            outcomes = [run_one(folders[0], lambda: sync_account(folders[0], args, journal=journal, writer=writer, metrics=metrics, deadline=deadline))]
+        else:
+            cache = ParseCache()
+            jobs = [(folder, lambda folder=folder: sync_account(folder, args, cache=cache, journal=journal, writer=writer, metrics=metrics, deadline=deadline)) for folder in folders]
+            outcomes = run_concurrently(jobs, args.workers)
+            if writer is None:
+                report(outcomes)
+    finally:
+        if writer is not None:
+            writer.close()
+        if journal:
+            journal.close()
+        write_metrics(metrics, args)
+        if args.trace:
+            tracer.write(args.trace)
+        if profiler.enabled:
+            profiler.stop()
+            print("=" * 80, file=out)
+            print("Profile", file=out)
+            print(profiler.summary(), file=out)
+
+    if args.shard_result:
+        shards.write_result(args.shard_result, args.shard or Shard(0, 1), outcomes)
+
+    unexpected = [outcome for outcome in outcomes if outcome.failed and not isinstance(outcome.error, SyncrError)]
+    if unexpected:
+        six.reraise(*unexpected[0].exc_info)
+
+    if len(folders) == 1:
+        if outcomes[0].failed:
+            print_error(outcomes[0].error, out=out)
+            sys.exit(1)
+
+        if writer is None and outcomes[0].result.amazon.recorder.total:
+            print("=" * 80)
+            print_summary(outcomes[0].result)
+
+        if outcomes[0].result.skipped:
+            print_skipped(outcomes[0].result.skipped, out=out)
+            sys.exit(1)
+        elif not outcomes[0].result.amazon.changes:
+            log.info("No changes were made!")
+    elif any(outcome.failed or outcome.result.skipped for outcome in outcomes):
         sys.exit(1)
 
 if __name__ == '__main__':
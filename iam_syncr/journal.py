@@ -0,0 +1,118 @@
+from iam_syncr.errors import SyncrError
+
+import threading
+import hashlib
+import logging
+import json
+import time
+import os
+
+log = logging.getLogger("iam_syncr.journal")
+
+def definition_digest(thing):
+    """
+    Return a digest of what this thing was defined as
+
+    This must be called before setup, because setup is allowed to change the definition
+    """
+    definition = getattr(thing, "definition", None)
+    template = None
+    if isinstance(definition, dict) and "use" in definition and getattr(thing, "templates", None):
+        template = thing.templates.get(definition["use"])
+
+    return digest_of({"definition": definition, "template": template})
+
+def item_digest(typ, thing, definition):
+    """Return a digest of everything we would resolve this (already setup) thing with"""
+    compiled = thing.compiled() if hasattr(thing, "compiled") else None
+    return digest_of({"type": typ, "name": thing.name, "definition": definition, "compiled": compiled})
+
+def digest_of(obj):
+    """Return a sha256 of this object as json"""
+    try:
+        dumped = json.dumps(obj, sort_keys=True, default=repr)
+    except TypeError:
+        # Keys that can't be sorted against each other
+        dumped = repr(obj)
+    return hashlib.sha256(dumped.encode("utf-8")).hexdigest()
+
+class Journal(object):
+    """
+    An append only record of the things we have finished syncing
+
+    Each line is a json object of {account, type, name, digest, outcome}.
+
+    Entries are flushed as they are written, but only fsync'd every ``batch_size``
+    entries or every ``interval`` seconds, and when the journal is closed.
+    """
+    def __init__(self, location, resume=False, batch_size=50, interval=2.0):
+        self.location = location
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self.lock = threading.Lock()
+        self.completed = {}
+        self.pending = 0
+        self.last_sync = time.time()
+
+        if resume:
+            self.completed = self.read(location)
+
+        try:
+            self.fle = open(location, "a" if resume else "w")
+        except (IOError, OSError) as error:
+            raise SyncrError("Couldn't open the journal", location=location, error=error)
+
+    def read(self, location):
+        """Return {(account, type, name): digest} for everything that completed successfully"""
+        completed = {}
+        if not os.path.exists(location):
+            return completed
+
+        with open(location) as fle:
+            for number, line in enumerate(fle):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Most likely the last line from a run that died half way through a write
+                    log.warning("Ignoring line in journal that isn't json\tlocation=%s\tline=%s", location, number + 1)
+                    continue
+
+                key = (entry.get("account"), entry.get("type"), entry.get("name"))
+                if entry.get("outcome") == "ok":
+                    completed[key] = entry.get("digest")
+                elif key in completed:
+                    del completed[key]
+
+        log.info("Read journal\tlocation=%s\tcompleted=%s", location, len(completed))
+        return completed
+
+    def is_complete(self, account, typ, name, digest):
+        """Say whether this thing was already synced with this digest"""
+        return self.completed.get((str(account), typ, name)) == digest
+
+    def record(self, account, typ, name, digest, outcome):
+        """Record that we've finished with this thing"""
+        entry = {"account": str(account), "type": typ, "name": name, "digest": digest, "outcome": outcome}
+        with self.lock:
+            self.fle.write(json.dumps(entry, sort_keys=True))
+            self.fle.write("\n")
+            self.fle.flush()
+
+            self.pending += 1
+            if self.pending >= self.batch_size or time.time() - self.last_sync >= self.interval:
+                self.sync_to_disk()
+
+    def sync_to_disk(self):
+        """fsync what we have written so far, must be called with the lock held"""
+        os.fsync(self.fle.fileno())
+        self.pending = 0
+        self.last_sync = time.time()
+
+    def close(self):
+        """Make sure everything is on disk"""
+        with self.lock:
+            if not self.fle.closed:
+                self.fle.flush()
+                self.sync_to_disk()
+                self.fle.close()
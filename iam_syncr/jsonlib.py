@@ -0,0 +1,133 @@
+"""
+The json we send to amazon and compare with what amazon has
+
+Uses orjson or ujson when one of them is installed and the standard library
+otherwise. Whichever is used, ``dumps`` gives back exactly the same text: sorted
+keys, no whitespace and no escaping of anything that isn't a control character
+or a quote. Only ``pretty`` adds whitespace, and that is only for people.
+
+The fast ones write some floats differently to the standard library (``1e16``
+for ``1e+16``, ``0.00001`` for ``1e-05`` and ``null`` for ``inf``), and ujson
+turns keys that aren't strings into strings before sorting them. So when what
+they write might have such a float, or the document has keys that aren't
+strings, the standard library writes it instead. Policies almost never have
+either, so they still get the fast path.
+
+Set IAM_SYNCR_JSON to json, ujson or orjson to choose a backend.
+"""
+import logging
+import json
+import six
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+log = logging.getLogger("iam_syncr.jsonlib")
+
+# The exponent of a float, looking for the e first because that is much quicker
+EXPONENT = re.compile(r'e(?<=\de)')
+
+def floats_like_stdlib(text):
+    """
+    Say whether the output of a fast backend has no floats the standard library
+    writes differently
+
+    Finding one of these in a string only costs us a trip to the standard library
+    """
+    return "null" not in text and "0.0000" not in text and not EXPONENT.search(text)
+
+def only_string_keys(obj):
+    """Say whether every key of every dictionary in obj is a string"""
+    stack = [obj]
+    while stack:
+        nxt = stack.pop()
+        if isinstance(nxt, dict):
+            if not all(isinstance(key, six.string_types) for key in nxt):
+                return False
+            stack.extend(nxt.values())
+        elif isinstance(nxt, (list, tuple)):
+            stack.extend(nxt)
+    return True
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def orjson_dumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+
+def ujson_dumps(obj):
+    if not only_string_keys(obj):
+        raise TypeError("ujson doesn't sort keys that aren't strings like the standard library")
+    return ujson.dumps(obj, sort_keys=True, ensure_ascii=False, escape_forward_slashes=False)
+
+BACKENDS = {
+      "json": (stdlib_dumps, json.loads)
+    , "orjson": (orjson_dumps, orjson.loads) if orjson else None
+    , "ujson": (ujson_dumps, ujson.loads) if ujson else None
+    }
+
+class Backend(object):
+    """The dumps and loads we are using"""
+    def __init__(self):
+        self.use(os.environ.get("IAM_SYNCR_JSON"))
+
+    def use(self, name=None):
+        """Use this backend, or the fastest one we have"""
+        if name and not BACKENDS.get(name):
+            log.warning("Json backend %s isn't available, using the fastest one we have", name)
+            name = None
+
+        if not name:
+            name = [found for found in ("orjson", "ujson", "json") if BACKENDS[found]][0]
+
+        self.name = name
+        self.fast_dumps, self.fast_loads = BACKENDS[name]
+
+backend = Backend()
+
+def dumps(obj):
+    """Return obj as canonical json"""
+    if backend.fast_dumps is stdlib_dumps:
+        return stdlib_dumps(obj)
+
+    try:
+        text = backend.fast_dumps(obj)
+    except (TypeError, ValueError, OverflowError):
+        # The fast ones don't like everything the stdlib does, so let it decide
+        return stdlib_dumps(obj)
+
+    if not floats_like_stdlib(text):
+        return stdlib_dumps(obj)
+    return text
+
+def loads(text):
+    """Return what this json is"""
+    try:
+        return backend.fast_loads(text)
+    except ValueError:
+        # Get the same error the stdlib would give us
+        return json.loads(text)
+
+def pretty(document):
+    """Return a json string or object indented for people to read"""
+    if not document:
+        return document
+
+    if isinstance(document, (dict, list)):
+        obj = document
+    else:
+        try:
+            obj = loads(document)
+        except (TypeError, ValueError):
+            return document
+
+    return json.dumps(obj, sort_keys=True, indent=2, separators=(",", ": "))
@@ -21,7 +21,6 @@ class Kms(object):
         self.location = self.definition.get("location")
         self.description = self.definition.get("description")
 
-        self.connection = self.amazon.kms_connection_for(self.location)
         if not self.description:
             raise BadPolicy("Please define a description", key=self.name)
 
@@ -54,18 +53,37 @@ class Kms(object):
 
             self.grant.append(policy)
 
-    def resolve(self):
-        """Make sure this key exists and has only what policies we want it to have"""
+    def requires(self):
+        """Roles in this account that need to exist before they can be in our policy or grants"""
+        arns = [policy.get(thing) for policy in self.grant for thing in ("grantee", "retiree")]
+        return [("role", name) for name in self.statements.roles_referenced(self.permission, arns)]
+
+    def prefetch(self):
+        """Read what amazon has for this key, so resolve doesn't have to wait for it"""
+        return AmazonKms(self.amazon, self.amazon.kms_connection_for(self.location)).remote_state(self.name)
+
+    def resolve(self, remote=None):
+        """
+        Make sure this key exists and has only what policies we want it to have
+
+        remote is what prefetch gave back, if it was already called
+        """
         permission_document = self.make_permission_document(self.permission)
 
-        amazon_keys = AmazonKms(self.amazon, self.connection)
-        key_info = amazon_keys.key_info(self.name)
+        amazon_keys = AmazonKms(self.amazon, self.amazon.kms_connection_for(self.location))
+        key_info = remote["key"] if remote is not None else amazon_keys.key_info(self.name)
         if not key_info:
             amazon_keys.create_key(self.name, self.description, permission_document=permission_document)
+            # What we read is from before the key existed
+            remote = None
         else:
-            amazon_keys.modify_key(self.name, self.description, permission_document=permission_document)
+            amazon_keys.modify_key(self.name, self.description, permission_document=permission_document, remote=remote)
+
+        amazon_keys.modify_grant(self.name, self.description, grant=self.grant, remote=remote)
 
-        amazon_keys.modify_grant(self.name, self.description, grant=self.grant)
+    def compiled(self):
+        """Return the documents this key would be synced with"""
+        return {"permission_document": self.make_permission_document(self.permission)}
 
     def make_permission_document(self, permissions):
         """Return a document for these permissions, or None if no permissiosn"""
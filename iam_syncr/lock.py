@@ -0,0 +1,102 @@
+from iam_syncr.errors import SyncrError, InvalidDocument
+from iam_syncr import VERSION
+
+import hashlib
+import logging
+import json
+import os
+
+log = logging.getLogger("iam_syncr.lock")
+
+LOCK_FORMAT = 1
+
+def sources_digest(locations, accounts, folder=None):
+    """
+    Return a digest of everything that goes into compiling this account
+
+    That is the contents of the configuration, the accounts dictionary and the version of iam_syncr
+    """
+    digest = hashlib.sha256()
+    digest.update("iam_syncr {0}\n".format(VERSION).encode("utf-8"))
+
+    for name, account_id in sorted((str(name), str(account_id)) for name, account_id in accounts.items()):
+        digest.update("account {0}={1}\n".format(name, account_id).encode("utf-8"))
+
+    for location in sorted(locations):
+        relative = location if folder is None else os.path.relpath(location, start=folder)
+        digest.update("file {0}\n".format(relative).encode("utf-8"))
+        with open(location, "rb") as fle:
+            digest.update(fle.read())
+        digest.update(b"\n")
+
+    return digest.hexdigest()
+
+def as_object(document):
+    """Turn a json document into an object so the lock shows structure rather than strings"""
+    if document is None:
+        return None
+
+    if isinstance(document, dict):
+        return dict((key, as_object(val)) for key, val in document.items())
+
+    try:
+        return json.loads(document)
+    except (TypeError, ValueError) as error:
+        raise InvalidDocument("Compiled document wasn't valid json", error=error)
+
+def make_lock(amazon, compiled, digest):
+    """Return the dictionary we write as a lock file"""
+    things = {}
+    for typ, items in compiled.items():
+        things[typ] = dict((name, as_object(documents)) for name, documents in items.items())
+
+    return {
+          "format": LOCK_FORMAT
+        , "iam_syncr": VERSION
+        , "account_id": str(amazon.account_id)
+        , "account_name": amazon.account_name
+        , "sources_digest": digest
+        , "compiled": things
+        }
+
+def dump_lock(lock):
+    """Deterministically serialize a lock"""
+    return json.dumps(lock, sort_keys=True, indent=2, separators=(",", ": "))
+
+def read_lock(location):
+    """Return the lock at this location or None if there isn't a usable one"""
+    if not os.path.exists(location):
+        return None
+
+    try:
+        with open(location) as fle:
+            lock = json.load(fle)
+    except (TypeError, ValueError) as error:
+        log.warning("Ignoring lock file that isn't valid json\tlocation=%s\terror=%s", location, error)
+        return None
+
+    if not isinstance(lock, dict) or lock.get("format") != LOCK_FORMAT:
+        log.warning("Ignoring lock file with an unknown format\tlocation=%s", location)
+        return None
+
+    return lock
+
+def write_lock(location, lock):
+    """Write our lock to this location"""
+    dumped = dump_lock(lock)
+    try:
+        with open(location, "w") as fle:
+            fle.write(dumped)
+            fle.write("\n")
+    except (IOError, OSError) as error:
+        raise SyncrError("Couldn't write the lock file", location=location, error=error)
+
+def lock_is_current(location, digest):
+    """
+    Say whether the lock at this location was compiled from sources with this digest
+
+    Only ``iam_syncr compile`` uses this to skip compiling again, a sync always
+    expands the configuration itself.
+    """
+    lock = read_lock(location)
+    return lock is not None and lock.get("sources_digest") == digest and lock.get("iam_syncr") == VERSION
@@ -0,0 +1,203 @@
+from collections import defaultdict
+import threading
+import logging
+import json
+import os
+
+log = logging.getLogger("iam_syncr.metrics")
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram(object):
+    """Counts of observations that were less than or equal to each bucket"""
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for index, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def cumulative(self):
+        """Return [(upper, count), ...] including +Inf like prometheus wants"""
+        result = []
+        running = 0
+        for upper, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += count
+            result.append((upper, running))
+        return result
+
+    def as_dict(self):
+        return {
+              "count": self.count
+            , "sum": self.total
+            , "buckets": [{"le": upper, "count": count} for upper, count in self.cumulative()]
+            }
+
+class Metrics(object):
+    """
+    Thread safe counts and latencies of the calls we make to amazon
+
+    Calls are keyed by (account, service, region, operation) and the time
+    spent waiting for a slot to make them in by (account, service, region)
+
+    Propagation is how long calls that needed a role we just made had to wait
+    for amazon to know about it, keyed like calls.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.retries = defaultdict(int)
+        self.latency = defaultdict(Histogram)
+        self.waits = defaultdict(Histogram)
+        self.queue_depth = defaultdict(int)
+        self.propagation = defaultdict(Histogram)
+
+    def record_call(self, account, service, region, operation, duration, error_code=None):
+        """Record that we made a call and how long it took"""
+        key = (str(account), service, region, operation)
+        with self.lock:
+            self.calls[key] += 1
+            self.latency[key].observe(duration)
+            if error_code is not None:
+                self.errors[key][error_code] += 1
+
+    def record_retry(self, account, service, region, operation):
+        """Record that we are about to try a call again"""
+        with self.lock:
+            self.retries[(str(account), service, region, operation)] += 1
+
+    def record_propagation(self, account, service, region, operation, duration):
+        """Record how long after we made a role a call that needed it worked"""
+        with self.lock:
+            self.propagation[(str(account), service, region, operation)].observe(duration)
+
+    def record_wait(self, account, service, region, duration, depth):
+        """Record how long a call waited for a slot and how many were waiting before it"""
+        key = (str(account), service, region)
+        with self.lock:
+            self.waits[key].observe(duration)
+            self.queue_depth[key] = max(self.queue_depth[key], depth)
+
+    @property
+    def total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    def as_dict(self):
+        """Return a json friendly dictionary of everything we know"""
+        with self.lock:
+            operations = []
+            for key in sorted(self.calls):
+                account, service, region, operation = key
+                operations.append({
+                      "account": account
+                    , "service": service
+                    , "region": region
+                    , "operation": operation
+                    , "calls": self.calls[key]
+                    , "errors": dict(self.errors.get(key, {}))
+                    , "retries": self.retries.get(key, 0)
+                    , "latency_seconds": self.latency[key].as_dict()
+                    })
+
+            queues = []
+            for key in sorted(self.waits):
+                account, service, region = key
+                queues.append({
+                      "account": account
+                    , "service": service
+                    , "region": region
+                    , "max_queue_depth": self.queue_depth[key]
+                    , "wait_seconds": self.waits[key].as_dict()
+                    })
+
+            propagation = []
+            for key in sorted(self.propagation):
+                account, service, region, operation = key
+                propagation.append({
+                      "account": account
+                    , "service": service
+                    , "region": region
+                    , "operation": operation
+                    , "seconds": self.propagation[key].as_dict()
+                    })
+            return {"operations": operations, "queues": queues, "propagation": propagation}
+
+    def as_prometheus(self):
+        """Return our metrics in the prometheus text format"""
+        lines = []
+        def labels(key, **extra):
+            found = list(zip(("account", "service", "region", "operation"), key)) + sorted(extra.items())
+            return ",".join('{0}="{1}"'.format(name, str(val).replace("\\", "\\\\").replace('"', '\\"')) for name, val in found)
+
+        with self.lock:
+            lines.append("# HELP iam_syncr_api_calls_total Calls made to amazon")
+            lines.append("# TYPE iam_syncr_api_calls_total counter")
+            for key in sorted(self.calls):
+                lines.append("iam_syncr_api_calls_total{{{0}}} {1}".format(labels(key), self.calls[key]))
+
+            lines.append("# HELP iam_syncr_api_errors_total Calls to amazon that raised an error")
+            lines.append("# TYPE iam_syncr_api_errors_total counter")
+            for key in sorted(self.errors):
+                for code, count in sorted(self.errors[key].items()):
+                    lines.append("iam_syncr_api_errors_total{{{0}}} {1}".format(labels(key, code=code), count))
+
+            lines.append("# HELP iam_syncr_api_retries_total Calls to amazon that iam_syncr tried again")
+            lines.append("# TYPE iam_syncr_api_retries_total counter")
+            for key in sorted(self.retries):
+                lines.append("iam_syncr_api_retries_total{{{0}}} {1}".format(labels(key), self.retries[key]))
+
+            lines.append("# HELP iam_syncr_api_call_duration_seconds How long calls to amazon took")
+            lines.append("# TYPE iam_syncr_api_call_duration_seconds histogram")
+            for key in sorted(self.latency):
+                histogram = self.latency[key]
+                for upper, count in histogram.cumulative():
+                    lines.append("iam_syncr_api_call_duration_seconds_bucket{{{0}}} {1}".format(labels(key, le=upper), count))
+                lines.append("iam_syncr_api_call_duration_seconds_sum{{{0}}} {1}".format(labels(key), repr(histogram.total)))
+                lines.append("iam_syncr_api_call_duration_seconds_count{{{0}}} {1}".format(labels(key), histogram.count))
+
+            lines.append("# HELP iam_syncr_api_queue_depth_max Most calls waiting for a slot at once")
+            lines.append("# TYPE iam_syncr_api_queue_depth_max gauge")
+            for key in sorted(self.queue_depth):
+                lines.append("iam_syncr_api_queue_depth_max{{{0}}} {1}".format(labels(key), self.queue_depth[key]))
+
+            lines.append("# HELP iam_syncr_api_queue_wait_seconds How long calls waited for a slot")
+            lines.append("# TYPE iam_syncr_api_queue_wait_seconds histogram")
+            for key in sorted(self.waits):
+                histogram = self.waits[key]
+                for upper, count in histogram.cumulative():
+                    lines.append("iam_syncr_api_queue_wait_seconds_bucket{{{0}}} {1}".format(labels(key, le=upper), count))
+                lines.append("iam_syncr_api_queue_wait_seconds_sum{{{0}}} {1}".format(labels(key), repr(histogram.total)))
+                lines.append("iam_syncr_api_queue_wait_seconds_count{{{0}}} {1}".format(labels(key), histogram.count))
+
+            lines.append("# HELP iam_syncr_propagation_seconds How long after making a role a call that needed it worked")
+            lines.append("# TYPE iam_syncr_propagation_seconds histogram")
+            for key in sorted(self.propagation):
+                histogram = self.propagation[key]
+                for upper, count in histogram.cumulative():
+                    lines.append("iam_syncr_propagation_seconds_bucket{{{0}}} {1}".format(labels(key, le=upper), count))
+                lines.append("iam_syncr_propagation_seconds_sum{{{0}}} {1}".format(labels(key), repr(histogram.total)))
+                lines.append("iam_syncr_propagation_seconds_count{{{0}}} {1}".format(labels(key), histogram.count))
+
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, location):
+        with open(location, "w") as fle:
+            json.dump(self.as_dict(), fle, sort_keys=True, indent=2, separators=(",", ": "))
+
+    def write_prometheus(self, location):
+        """Write a textfile for the node exporter, via a rename so it never sees half a file"""
+        tmp = "{0}.{1}.tmp".format(location, os.getpid())
+        with open(tmp, "w") as fle:
+            fle.write(self.as_prometheus())
+        os.rename(tmp, location)
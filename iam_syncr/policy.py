@@ -0,0 +1,311 @@
+"""
+Immutable policy statements and documents in canonical form
+
+Canonical form sorts the lists amazon doesn't care about the order of and
+turns lists of one item into that item, like amazon does. Two statements that
+mean the same thing are equal and have the same hash.
+
+Documents remember the json they were made from or turned into, so each
+document is only parsed or dumped once per run. The json we make is canonical
+as well, see ``iam_syncr.jsonlib``.
+
+Statements and json are interned, so a statement that many roles share, or
+the same document on many roles, is only kept once per run.
+"""
+from iam_syncr import jsonlib
+
+import threading
+import six
+
+LIST_KEYS = ("Action", "NotAction", "Resource", "NotResource")
+PRINCIPAL_KEYS = ("Principal", "NotPrincipal")
+
+class FrozenDict(tuple):
+    """Sorted (key, value) pairs standing in for a dictionary"""
+    __slots__ = ()
+
+def freeze(value):
+    """Return a hashable copy of this value"""
+    if isinstance(value, six.string_types):
+        return value
+
+    # Most values are strings or lists of strings, which are hashable as they are
+    if isinstance(value, list) or (isinstance(value, tuple) and not isinstance(value, FrozenDict)):
+        frozen = tuple(value)
+        try:
+            hash(frozen)
+            return frozen
+        except TypeError:
+            return tuple([freeze(item) for item in value])
+
+    if isinstance(value, dict):
+        frozen = FrozenDict(sorted(value.items()))
+        try:
+            hash(frozen)
+            return frozen
+        except TypeError:
+            return FrozenDict(sorted([(key, freeze(val)) for key, val in value.items()]))
+    if isinstance(value, Statement):
+        return FrozenDict(value._fields)
+    return value
+
+def thaw(value):
+    """Return a json friendly copy of a frozen value"""
+    if isinstance(value, FrozenDict):
+        return dict((key, thaw(val)) for key, val in value)
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+def canonical_list(value):
+    """Return a frozen, sorted copy of a list, or the one thing in a list of one thing"""
+    if isinstance(value, six.string_types) or not isinstance(value, (list, tuple)) or isinstance(value, FrozenDict):
+        return freeze(value)
+    if len(value) == 1:
+        return freeze(value[0])
+
+    try:
+        found = tuple(sorted(value))
+        hash(found)
+        return found
+    except TypeError:
+        frozen = [freeze(item) for item in value]
+        try:
+            return tuple(sorted(frozen))
+        except TypeError:
+            return tuple(sorted(frozen, key=lambda item: (type(item).__name__, repr(item))))
+
+def canonical_fields(fields):
+    """Return sorted (key, value) pairs of these fields in canonical form"""
+    result = []
+    for key in sorted(fields):
+        val = fields[key]
+        if key in LIST_KEYS:
+            val = canonical_list(val)
+        elif key in PRINCIPAL_KEYS and isinstance(val, dict):
+            val = FrozenDict(sorted([(principal_type, canonical_list(principals)) for principal_type, principals in val.items()]))
+        else:
+            val = freeze(val)
+        result.append((key, val))
+    return tuple(result)
+
+class Statement(object):
+    """
+    A read only statement in canonical form
+
+    It acts like a dictionary that can't be changed.
+    """
+    __slots__ = ("_fields", "_lookup", "_hash", "_text")
+
+    def __init__(self, fields):
+        fields = canonical_fields(fields)
+        object.__setattr__(self, "_fields", fields)
+        object.__setattr__(self, "_lookup", dict(fields))
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_text", None)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Statements can't be changed")
+
+    def __getitem__(self, key):
+        return thaw(self._lookup[key])
+
+    def __iter__(self):
+        return iter([key for key, _ in self._fields])
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __contains__(self, key):
+        return key in self._lookup
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(self._fields))
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, Statement):
+            return self is other or (hash(self) == hash(other) and self._fields == other._fields)
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __repr__(self):
+        return "Statement({0!r})".format(self.as_dict())
+
+    def get(self, key, default=None):
+        if key in self._lookup:
+            return thaw(self._lookup[key])
+        return default
+
+    def keys(self):
+        return [key for key, _ in self._fields]
+
+    def items(self):
+        return [(key, thaw(val)) for key, val in self._fields]
+
+    def values(self):
+        return [thaw(val) for _, val in self._fields]
+
+    def frozen(self, key):
+        """Return the frozen value of this key, or None"""
+        return self._lookup.get(key)
+
+    def as_dict(self):
+        return dict((key, thaw(val)) for key, val in self._fields)
+
+    def dumps(self):
+        """Return this statement as canonical json"""
+        if self._text is None:
+            object.__setattr__(self, "_text", interned_texts.intern(jsonlib.dumps(self.as_dict())))
+        return self._text
+
+class Document(object):
+    """A read only policy document"""
+    __slots__ = ("version", "statements", "extra", "_hash", "_text")
+
+    def __init__(self, statements, version="2012-10-17", extra=None):
+        statements = tuple([interned_statements.intern(Statement(statement) if isinstance(statement, dict) else statement) for statement in statements])
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "statements", statements)
+        object.__setattr__(self, "extra", freeze(extra or {}))
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_text", None)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Documents can't be changed")
+
+    @classmethod
+    def from_dict(kls, loaded):
+        """Make a document from what json.loads gave us"""
+        if not isinstance(loaded, dict):
+            return kls([], version=None, extra={"Document": loaded})
+
+        statements = loaded.get("Statement", [])
+        if isinstance(statements, dict):
+            statements = [statements]
+        extra = dict((key, val) for key, val in loaded.items() if key not in ("Version", "Statement"))
+        return kls(statements, version=loaded.get("Version"), extra=extra)
+
+    @classmethod
+    def loads(kls, text):
+        """Return the document for this json, only parsing it the first time we see it"""
+        document = documents.get(text)
+        if document is None:
+            document = kls.from_dict(jsonlib.loads(text))
+            object.__setattr__(document, "_text", text)
+            documents.remember(text, document)
+        return document
+
+    def dumps(self):
+        """Return this document as canonical json, remembering it so loads doesn't parse it again"""
+        if self._text is None:
+            object.__setattr__(self, "_text", interned_texts.intern(jsonlib.dumps(self.as_dict())))
+            documents.remember(self._text, self)
+        return self._text
+
+    def as_dict(self):
+        result = thaw(self.extra)
+        if self.version is not None:
+            result["Version"] = self.version
+        result["Statement"] = [statement.as_dict() if isinstance(statement, Statement) else statement for statement in self.statements]
+        return result
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash((self.version, self.statements, self.extra)))
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Document):
+            return NotImplemented
+        return self is other or (self.version == other.version and self.extra == other.extra and self.statements == other.statements)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+class DocumentCache(object):
+    """Thread safe map of json to the document it is, forgets everything when it gets too big"""
+    def __init__(self, limit=100000):
+        self.lock = threading.Lock()
+        self.limit = limit
+        self.found = {}
+
+    def get(self, text):
+        if not isinstance(text, six.string_types):
+            return None
+        with self.lock:
+            return self.found.get(text)
+
+    def remember(self, text, document):
+        if not isinstance(text, six.string_types):
+            return
+        with self.lock:
+            if len(self.found) >= self.limit:
+                self.found.clear()
+            self.found[text] = document
+
+    def clear(self):
+        with self.lock:
+            self.found.clear()
+
+class InternPool(object):
+    """
+    Thread safe pool of one copy of each distinct thing
+
+    Counts how many things it was given so we can say how much it saved.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.found = {}
+        self.seen = 0
+
+    def intern(self, thing):
+        """Return the copy of this thing we already have, or remember this one"""
+        try:
+            hash(thing)
+        except TypeError:
+            return thing
+
+        with self.lock:
+            self.seen += 1
+            return self.found.setdefault(thing, thing)
+
+    @property
+    def unique(self):
+        with self.lock:
+            return len(self.found)
+
+    @property
+    def ratio(self):
+        """How many things we were given for each one we kept"""
+        with self.lock:
+            if not self.found:
+                return 1.0
+            return float(self.seen) / len(self.found)
+
+    def clear(self):
+        with self.lock:
+            self.found.clear()
+            self.seen = 0
+
+documents = DocumentCache()
+interned_statements = InternPool()
+interned_texts = InternPool()
+
+def interning_stats():
+    """Return how many statements and json strings we were given, kept, and the ratio between them"""
+    return dict(
+          (name, {"seen": pool.seen, "unique": pool.unique, "ratio": round(pool.ratio, 2)})
+          for name, pool in (("statements", interned_statements), ("json", interned_texts))
+        )
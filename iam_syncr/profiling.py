@@ -0,0 +1,145 @@
+from iam_syncr.errors import SyncrError
+
+from contextlib import contextmanager
+import threading
+import logging
+import cProfile
+import pstats
+import six
+import os
+
+if six.PY2:
+    tracemalloc = None
+else:
+    import tracemalloc
+
+log = logging.getLogger("iam_syncr.profiling")
+
+class Profiler(object):
+    """
+    Run phases of a sync under cProfile and tracemalloc
+
+    Profiling does nothing until ``start()`` is called. After that every ``phase``
+    writes <account>.<phase>.pstats and <account>.<phase>.memory.txt to the folder
+    we were started with.
+
+    Note that tracemalloc sees the whole process, so when accounts are synced
+    at the same time the memory of a phase includes what the others allocated.
+
+    cProfile only sees the thread that enabled it, and python 3.12 only lets
+    one be enabled at a time, so phases profiled for cpu run one at a time.
+    Anything they hand to other threads isn't in their profile, which is why
+    ``--profile`` syncs one account and one item at a time without prefetch.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.one_at_a_time = threading.Lock()
+        self.folder = None
+        self.cpu = False
+        self.memory = False
+        self.top = 10
+        self.phases = []
+
+    @property
+    def enabled(self):
+        return self.cpu or self.memory
+
+    def start(self, folder, cpu=True, memory=False, top=10):
+        """Start profiling phases into this folder"""
+        if memory and tracemalloc is None:
+            raise SyncrError("Sorry, need python3 to profile memory")
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.top = top
+        self.cpu = cpu
+        self.memory = memory
+        self.folder = folder
+        self.phases = []
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+
+    def stop(self):
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.cpu = False
+        self.memory = False
+
+    @contextmanager
+    def phase(self, name, account=None):
+        """Profile the body of this context manager"""
+        if not self.enabled:
+            yield
+            return
+
+        label = name if account is None else "{0}.{1}".format(account, name)
+        cpu = self.cpu
+        if cpu:
+            self.one_at_a_time.acquire()
+
+        try:
+            profile = cProfile.Profile() if cpu else None
+            before = tracemalloc.take_snapshot() if self.memory else None
+
+            if profile:
+                profile.enable()
+            try:
+                yield
+            finally:
+                if profile:
+                    profile.disable()
+                self.finished(label, profile, before)
+        finally:
+            if cpu:
+                self.one_at_a_time.release()
+
+    def finished(self, label, profile, before):
+        """Write out what we found for this phase"""
+        found = {"label": label, "functions": [], "allocations": []}
+
+        if profile:
+            location = os.path.join(self.folder, "{0}.pstats".format(label))
+            profile.dump_stats(location)
+            stats = pstats.Stats(profile)
+            ordered = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+            for (filename, line, function), (_, calls, _, cumulative, _) in ordered[:self.top]:
+                found["functions"].append((cumulative, calls, "{0}:{1}({2})".format(os.path.basename(filename), line, function)))
+
+        if before is not None:
+            after = tracemalloc.take_snapshot()
+            differences = after.compare_to(before, "lineno")
+            location = os.path.join(self.folder, "{0}.memory.txt".format(label))
+            with open(location, "w") as fle:
+                for difference in differences[:self.top * 5]:
+                    fle.write("{0}\n".format(difference))
+            for difference in differences[:self.top]:
+                frame = difference.traceback[0]
+                found["allocations"].append((difference.size_diff, difference.count_diff, "{0}:{1}".format(frame.filename, frame.lineno)))
+
+        with self.lock:
+            self.phases.append(found)
+
+    def summary(self, limit=5):
+        """Return a short summary of the worst offenders in each phase"""
+        lines = []
+        with self.lock:
+            phases = list(self.phases)
+
+        for phase in phases:
+            lines.append(phase["label"])
+            for cumulative, calls, where in phase["functions"][:limit]:
+                lines.append("    {0:9.3f}s {1:>8} calls  {2}".format(cumulative, calls, where))
+            for size, count, where in phase["allocations"][:limit]:
+                lines.append("    {0:>10} bytes {1:>8} blocks {2}".format(size, count, where))
+
+        if phases:
+            lines.append("Full reports are in {0}".format(self.folder))
+        return "\n".join(lines)
+
+profiler = Profiler()
+
+def profiled(name, account=None):
+    """Profile a phase with our global profiler"""
+    return profiler.phase(name, account=account)
@@ -20,6 +20,9 @@ class RoleRemoval(object):
         if not isinstance(self.name, six.string_types):
             raise BadRole("Told to remove a role, but not specified as a string", name=self.name, found_type=type(self.name))
 
+    def removes(self):
+        return [("role", self.name)]
+
     def resolve(self):
         """Remove the role"""
         AmazonRoles(self.amazon).remove_role(self.name)
@@ -64,22 +67,54 @@ class Role(object):
                 for statement in self.statements.make_permission_statements(policy, allow=default_allow):
                     self.permission.append(statement)
 
-    def resolve(self):
-        """Make sure this user exists and has only what policies we want it to have"""
+    def provides(self):
+        return [("role", self.name)]
+
+    def requires(self):
+        """Other roles in this account that need to exist before we can trust them"""
+        return [("role", name) for name in self.statements.roles_referenced(self.trust + self.distrust)]
+
+    def prefetch(self):
+        """Read what amazon has for this role, so resolve doesn't have to wait for it"""
+        role_info = self.amazon_roles.role_info(self.name)
+        remote = {"role_info": role_info}
+        if role_info:
+            remote["policies"] = self.amazon_roles.current_role_policies(self.name, comparing=[self.policy_name])
+        return remote
+
+    def resolve(self, remote=None):
+        """
+        Make sure this user exists and has only what policies we want it to have
+
+        remote is what prefetch gave back, if it was already called
+        """
         # Get the permission and trust document
         # Make sure they're both valid before continuing
         trust_document = self.make_trust_document(self.trust, self.distrust)
         permission_document = self.make_permission_document(self.permission)
 
-        role_info = self.amazon_roles.role_info(self.name)
+        if remote is None:
+            remote = {"role_info": self.amazon_roles.role_info(self.name)}
+
+        role_info = remote["role_info"]
         if not role_info:
             self.amazon_roles.create_role(self.name, trust_document, policies={self.policy_name: permission_document})
         else:
-            self.amazon_roles.modify_role(role_info, self.name, trust_document, policies={self.policy_name: permission_document})
+            kwargs = {}
+            if "policies" in remote:
+                kwargs["current_policies"] = remote["policies"]
+            self.amazon_roles.modify_role(role_info, self.name, trust_document, policies={self.policy_name: permission_document}, **kwargs)
 
         if self.definition.get("make_instance_profile"):
             self.amazon_roles.make_instance_profile(self.name)
 
+    def compiled(self):
+        """Return the documents this role would be synced with"""
+        return {
+              "trust_document": self.make_trust_document(self.trust, self.distrust)
+            , "policies": {self.policy_name: self.make_permission_document(self.permission)}
+            }
+
     def make_trust_document(self, trust, distrust):
         """Make a document for trust or None if no trust or distrust"""
         if not trust and not distrust:
@@ -0,0 +1,324 @@
+"""
+Resolve things in the order their dependencies need rather than by type
+
+Things may say what they ``provides()``, ``removes()`` and ``requires()`` as
+sets of (kind, name). A thing runs after everything that provides what it
+requires, and things that provide something run after the things that remove
+it. Everything else may run at the same time, and ties are broken by the
+priority of the type and then the order things were added.
+
+A cycle can't be done in order, so we warn about it and go ahead with the
+things in it in priority order.
+
+Nodes are run by threads, or with ``iam_syncr.aio`` by an asyncio event loop.
+That module uses async and await, so it is only there from python 3.5.
+
+Nodes that can prefetch have what they need from amazon read in the
+background by a Prefetcher while other nodes are resolved.
+"""
+from iam_syncr.errors import SyncrError
+
+from six.moves import queue
+from collections import defaultdict
+import threading
+import logging
+import heapq
+import six
+import sys
+
+log = logging.getLogger("iam_syncr.scheduler")
+
+# Whether this python can compile iam_syncr.aio
+HAS_ASYNCIO = sys.version_info >= (3, 5)
+
+def identities(thing, method):
+    """Return the set of identities this thing gives back from method, if it has that method"""
+    func = getattr(thing, method, None)
+    if func is None:
+        return set()
+    return set(func() or [])
+
+class Node(object):
+    """
+    One thing to resolve and what it is waiting on
+
+    If the node has a prefetch, then func is called with what it gave back, or
+    None if it didn't get to this node in time.
+    """
+    def __init__(self, typ, thing, func, order, prefetch=None):
+        self.typ = typ
+        self.func = func
+        self.thing = thing
+        self.order = order
+        self.prefetch = prefetch
+        self.requires = set()
+        self.required_by = set()
+        self.done = threading.Event()
+
+    def run(self, prefetcher=None):
+        try:
+            if self.prefetch is None:
+                self.func()
+            else:
+                self.func(prefetcher.take(self) if prefetcher is not None else None)
+        finally:
+            self.done.set()
+
+    @property
+    def name(self):
+        return getattr(self.thing, "name", None)
+
+    def __repr__(self):
+        return "<Node {0}:{1}>".format(self.typ, self.name)
+
+class Graph(object):
+    """Nodes and the dependencies between them"""
+    def __init__(self):
+        self.nodes = []
+
+    def add(self, typ, thing, func, priority=0, prefetch=None):
+        """Add a thing that resolves by calling func"""
+        node = Node(typ, thing, func, (priority, len(self.nodes)), prefetch=prefetch)
+        self.nodes.append(node)
+        return node
+
+    def depend(self, node, on):
+        """Say node can't start until on is done"""
+        if node is not on:
+            node.requires.add(on)
+            on.required_by.add(node)
+
+    def link(self):
+        """Work out the dependencies from what the nodes provide, remove and require"""
+        providers = defaultdict(list)
+        removers = defaultdict(list)
+        for node in self.nodes:
+            for identity in identities(node.thing, "provides"):
+                providers[identity].append(node)
+            for identity in identities(node.thing, "removes"):
+                removers[identity].append(node)
+
+        for node in self.nodes:
+            for identity in identities(node.thing, "requires"):
+                for provider in providers.get(identity, []):
+                    self.depend(node, provider)
+
+        for identity, nodes in removers.items():
+            for provider in providers.get(identity, []):
+                for remover in nodes:
+                    self.depend(provider, remover)
+
+        self.break_cycles()
+        return self
+
+    def break_cycles(self):
+        """Forget the dependencies that make cycles, starting with the first node in a cycle"""
+        waiting = dict((node, len(node.requires)) for node in self.nodes)
+        ready = [node for node in self.nodes if not node.requires]
+        while waiting:
+            while ready:
+                node = ready.pop()
+                del waiting[node]
+                for dependent in node.required_by:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        ready.append(dependent)
+
+            if waiting:
+                order, node = min((node.order, node) for node in waiting)
+                log.warning("Found a cycle in the dependencies, going ahead with %s anyway", node)
+                for dependency in list(node.requires):
+                    if dependency in waiting:
+                        node.requires.discard(dependency)
+                        dependency.required_by.discard(node)
+                        waiting[node] -= 1
+                ready.append(node)
+
+    def run(self, workers=1, engine="threads", prefetch=0):
+        """
+        Call the func of every node, at most ``workers`` at a time
+
+        If a func raises an exception, nothing new is started, and the first
+        exception is raised once the running ones finish.
+
+        Up to ``prefetch`` nodes have their prefetch done ahead of time.
+        """
+        if engine == "asyncio" and not HAS_ASYNCIO:
+            raise SyncrError("The asyncio engine needs python 3.5 or newer", found=sys.version.split()[0])
+
+        prefetcher = None
+        if prefetch > 0:
+            prefetcher = Prefetcher(self.nodes, prefetch)
+            prefetcher.start()
+
+        try:
+            if engine == "asyncio":
+                from iam_syncr.aio import AsyncRunner
+                AsyncRunner(self.nodes, workers, prefetcher=prefetcher).run()
+            else:
+                Runner(self.nodes, workers, prefetcher=prefetcher).run()
+        finally:
+            if prefetcher is not None:
+                prefetcher.stop()
+
+class Prefetcher(object):
+    """
+    Does the prefetch of nodes in the background
+
+    Nodes are prefetched in priority order once everything they depend on is
+    done, and at most ``ahead`` results wait to be taken at any time. If a
+    node is resolved before we got to it, it reads what it needs itself.
+    """
+    def __init__(self, nodes, ahead):
+        self.ahead = ahead
+        self.slots = threading.Semaphore(ahead)
+        self.stopped = threading.Event()
+        self.condition = threading.Condition()
+
+        self.taken = set()
+        self.reading = set()
+        self.results = {}
+        self.threads = []
+
+        self.todo = queue.Queue()
+        for node in sorted(nodes, key=lambda node: node.order):
+            if node.prefetch is not None:
+                self.todo.put(node)
+
+    def start(self):
+        self.threads = [threading.Thread(target=self.work, name="iam_syncr-prefetch-{0}".format(num)) for num in range(min(self.ahead, self.todo.qsize()))]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def wait(self, event):
+        """Wait for this event unless we get stopped first, and say whether it happened"""
+        while not event.is_set():
+            if self.stopped.wait(0.05):
+                return False
+        return True
+
+    def work(self):
+        while not self.stopped.is_set():
+            try:
+                node = self.todo.get_nowait()
+            except queue.Empty:
+                return
+
+            if not all(self.wait(dependency.done) for dependency in node.requires):
+                return
+
+            while not self.slots.acquire(False):
+                if self.stopped.wait(0.05):
+                    return
+
+            with self.condition:
+                if node in self.taken:
+                    self.slots.release()
+                    continue
+                self.reading.add(node)
+
+            try:
+                remote = node.prefetch()
+            except Exception as error:
+                # Resolve can read it again and complain properly
+                log.debug("Failed to prefetch\tnode=%s\terror=%s", node, error)
+                remote = None
+
+            with self.condition:
+                self.reading.discard(node)
+                self.results[node] = remote
+                self.condition.notify_all()
+
+    def take(self, node):
+        """Return what we read for this node, or None if we didn't get to it"""
+        with self.condition:
+            self.taken.add(node)
+            if node not in self.reading and node not in self.results:
+                return None
+
+            while node not in self.results:
+                self.condition.wait()
+
+            self.slots.release()
+            return self.results.pop(node)
+
+class Runner(object):
+    """Runs the nodes of a graph with a pool of threads"""
+    def __init__(self, nodes, workers, prefetcher=None):
+        self.nodes = nodes
+        self.prefetcher = prefetcher
+        self.workers = max(1, workers)
+        self.condition = threading.Condition()
+
+        self.ready = []
+        self.running = 0
+        self.failure = None
+        self.waiting = dict((node, len(node.requires)) for node in nodes)
+        for node in nodes:
+            if not node.requires:
+                heapq.heappush(self.ready, (node.order, node))
+                del self.waiting[node]
+
+    def run(self):
+        if self.workers == 1:
+            self.work()
+        else:
+            threads = [threading.Thread(target=self.work, name="iam_syncr-resolve-{0}".format(num)) for num in range(min(self.workers, len(self.nodes)))]
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        if self.failure is not None:
+            six.reraise(*self.failure)
+
+    def next_node(self):
+        """Wait for a node that is ready, or return None when there is nothing left to do"""
+        with self.condition:
+            while True:
+                if self.failure is not None:
+                    return None
+
+                if self.ready:
+                    self.running += 1
+                    return heapq.heappop(self.ready)[1]
+
+                if not self.waiting:
+                    return None
+
+                self.condition.wait()
+
+    def finished(self, node, failure=None):
+        with self.condition:
+            self.running -= 1
+            if failure is not None and self.failure is None:
+                self.failure = failure
+
+            for dependent in node.required_by:
+                if dependent in self.waiting:
+                    self.waiting[dependent] -= 1
+                    if self.waiting[dependent] == 0:
+                        del self.waiting[dependent]
+                        heapq.heappush(self.ready, (dependent.order, dependent))
+
+            self.condition.notify_all()
+
+    def work(self):
+        while True:
+            node = self.next_node()
+            if node is None:
+                return
+
+            try:
+                node.run(self.prefetcher)
+            except Exception:
+                self.finished(node, failure=sys.exc_info())
+            else:
+                self.finished(node)
@@ -0,0 +1,140 @@
+from iam_syncr.errors import SyncrError
+
+import hashlib
+import logging
+import json
+import os
+
+log = logging.getLogger("iam_syncr.shards")
+
+class Shard(object):
+    """
+    Says which part of an account this run is responsible for
+
+    Things are assigned to a shard by a stable hash of their name so every
+    node agrees on the split without talking to each other.
+    """
+    def __init__(self, index, count):
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def from_string(kls, value):
+        """Make a shard from a string like 0/4"""
+        try:
+            index, count = [int(part) for part in str(value).split("/")]
+        except ValueError:
+            raise SyncrError("Shard should be specified as <index>/<count>", got=value)
+
+        if count < 1 or index < 0 or index >= count:
+            raise SyncrError("Shard index should be between 0 and the number of shards", got=value)
+
+        return kls(index, count)
+
+    @property
+    def is_first(self):
+        """The first shard does the steps that can't be split"""
+        return self.index == 0
+
+    def includes(self, name):
+        """Say whether the thing with this name belongs to this shard"""
+        return shard_for(name, self.count) == self.index
+
+    def as_dict(self):
+        return {"index": self.index, "count": self.count}
+
+    def __str__(self):
+        return "{0}/{1}".format(self.index, self.count)
+
+def shard_for(name, count):
+    """Return the index of the shard this name belongs to"""
+    digest = hashlib.md5(str(name).encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) % count
+
+def account_result(outcome):
+    """Return the shard result for one account from an Outcome of syncing it"""
+    result = {
+          "account_name": os.path.basename(outcome.key)
+        , "ok": not outcome.failed
+        , "error": None
+        , "changes": False
+        , "items": {}
+        }
+
+    if outcome.failed:
+        result["error"] = "{0} |:| {1}".format(outcome.error.__class__.__name__, outcome.error)
+    else:
+        sync = outcome.result
+        result["account_id"] = str(sync.amazon.account_id)
+        result["changes"] = bool(sync.amazon.changes)
+        result["items"] = dict((typ, sorted(names)) for typ, names in sync.synced.items())
+
+        if getattr(sync, "skipped", None):
+            result["ok"] = False
+            result["error"] = "Skipped because amazon kept failing |:| {0}".format(", ".join("{0}:{1}".format(typ, name) for typ in sorted(sync.skipped) for name in sync.skipped[typ]))
+
+    return result
+
+def make_result(shard, outcomes):
+    """Return the mergeable result for this shard"""
+    accounts = {}
+    for outcome in outcomes:
+        result = account_result(outcome)
+        accounts[result["account_name"]] = result
+    return {"shard": shard.as_dict(), "accounts": accounts}
+
+def write_result(location, shard, outcomes):
+    """Write the result for this shard as json"""
+    try:
+        with open(location, "w") as fle:
+            json.dump(make_result(shard, outcomes), fle, sort_keys=True, indent=2, separators=(",", ": "))
+    except (IOError, OSError) as error:
+        raise SyncrError("Couldn't write the shard result", location=location, error=error)
+
+def read_results(locations):
+    """Read shard results from these locations"""
+    results = []
+    for location in locations:
+        try:
+            with open(location) as fle:
+                results.append(json.load(fle))
+        except (IOError, OSError, ValueError) as error:
+            raise SyncrError("Couldn't read a shard result", location=location, error=error)
+    return results
+
+def merge_results(results):
+    """
+    Merge the results of every shard into one report
+
+    The report is only complete if every shard of the same split is present exactly once
+    """
+    counts = set(result["shard"]["count"] for result in results)
+    if len(counts) > 1:
+        raise SyncrError("Shard results come from different splits", counts=sorted(counts))
+
+    count = counts.pop() if counts else 0
+    seen = [result["shard"]["index"] for result in results]
+    duplicated = sorted(set(index for index in seen if seen.count(index) > 1))
+    if duplicated:
+        raise SyncrError("Got the same shard more than once", shards=duplicated)
+
+    accounts = {}
+    for result in sorted(results, key=lambda result: result["shard"]["index"]):
+        for name, account in result["accounts"].items():
+            if name not in accounts:
+                accounts[name] = {"account_name": name, "ok": True, "errors": [], "changes": False, "items": {}}
+            merged = accounts[name]
+
+            if account.get("account_id"):
+                merged["account_id"] = account["account_id"]
+
+            if not account["ok"]:
+                merged["ok"] = False
+                merged["errors"].append({"shard": result["shard"]["index"], "error": account["error"]})
+
+            merged["changes"] = merged["changes"] or account["changes"]
+            for typ, names in account["items"].items():
+                merged["items"][typ] = sorted(set(merged["items"].get(typ, [])) | set(names))
+
+    missing = sorted(set(range(count)) - set(seen))
+    return {"shards": count, "complete": not missing, "missing": missing, "accounts": accounts}
@@ -1,8 +1,8 @@
 from iam_syncr.errors import InvalidDocument, BadPolicy, ProgrammerError
 from iam_syncr.helpers import listify, listified, as_list
+from iam_syncr.policy import Statement, Document
 
 import logging
-import json
 import six
 
 log = logging.getLogger("iam_syncr.roles")
@@ -33,7 +33,7 @@ class Statements(object):
         if "Sid" not in result:
             result["Sid"] = ""
 
-        yield result
+        yield Statement(result)
 
     def expand_principal(self, statement, result):
         """Expand out Principal and NotPrincipal"""
@@ -117,7 +117,7 @@ class Statements(object):
                 else:
                     result[thing] = sorted(result[thing])
 
-        yield result
+        yield Statement(result)
 
     def fill_out_resources(self, resources):
         """Fill out the resources"""
@@ -260,15 +260,25 @@ class Statements(object):
                             for user in users:
                                 yield "{0}/{1}".format(arn, user)
 
+    def roles_referenced(self, statements, arns=None):
+        """Return the names of roles in our account that are principals in these statements or are in arns"""
+        prefix = "arn:aws:iam::{0}:role/".format(self.account_id)
+        found = list(arns or [])
+        for statement in statements:
+            for key in ("Principal", "NotPrincipal"):
+                principal = statement.get(key)
+                if isinstance(principal, dict):
+                    found.extend(as_list(principal.get("AWS")))
+
+        return set(arn[len(prefix):] for arn in found if isinstance(arn, six.string_types) and arn.startswith(prefix))
+
     def make_document(self, statements):
         """Make sure our document is valid and return it formatted correctly"""
         if not isinstance(statements, list):
             raise Exception("Statements should be a list!: got {0}".format(statements))
 
-        document = {"Version": "2012-10-17", "Statement": statements}
-
         try:
-            return json.dumps(document, indent=2)
+            return Document(statements).dumps()
         except (TypeError, ValueError) as err:
             raise InvalidDocument("Document wasn't valid json", error=err, **{self.self_type:self.name})
 
@@ -1,8 +1,14 @@
-from iam_syncr.errors import SyncrError, InvalidConfiguration, ConflictingConfiguration, BadConfiguration, DuplicateItem
+from iam_syncr.errors import SyncrError, CircuitOpen, InvalidConfiguration, ConflictingConfiguration, BadConfiguration, DuplicateItem
+from iam_syncr.journal import definition_digest, item_digest
+from iam_syncr.amazon.changes import ChangeRecorder
+from iam_syncr.profiling import profiled
+from iam_syncr.scheduler import Graph
+from iam_syncr.tracing import span
 from iam_syncr.roles import Role, RoleRemoval
 from iam_syncr.buckets import Bucket
 from iam_syncr.kms import Kms
 
+from contextlib import contextmanager
 from collections import defaultdict
 import logging
 
@@ -23,44 +29,122 @@ class Template(object):
 class Sync(object):
     """Knows how to interpret configuration for syncing"""
 
-    def __init__(self, amazon):
+    def __init__(self, amazon, shard=None, journal=None, workers=1, engine="threads", prefetch=0):
+        self.shard = shard
         self.amazon = amazon
+        self.engine = engine
+        self.journal = journal
+        self.workers = workers
+        self.prefetch = prefetch
 
         self.types = {}
         self.the_types = []
+        self.unsharded = set()
         self.templates = {}
         self.configurations = defaultdict(list)
+        self.synced = defaultdict(list)
+        self.resumed = defaultdict(list)
+        self.skipped = defaultdict(list)
 
     def sync(self, combined):
-        """Let's do this!"""
+        """
+        Let's do this!
+
+        Everything is setup in the order of the priority of its type, and then
+        resolved in the order of the dependencies between them, up to
+        ``workers`` at a time using our ``engine`` (threads or asyncio).
+
+        What amazon has for up to ``prefetch`` things is read in the background
+        while other things are resolved.
+
+        The changes for each thing are shown in the order things were added,
+        however many are resolved at the same time.
+        """
+        graph = Graph()
+        for priority, name in sorted(self.the_types):
+            if name in combined:
+                things = self.create_things(combined[name], name)
+
+                with profiled("sync.{0}".format(name), account=self.amazon.account_name):
+                    for thing, definition in self.setup_things(self.in_shard(name, things), name):
+                        resolve = lambda remote=None, thing=thing, name=name, definition=definition: self.resolve_thing(thing, name, definition, remote=remote)
+                        graph.add(name, thing, resolve, priority=priority, prefetch=self.prefetcher_for(thing, name, definition))
+                self.remember_templates(name, things)
+
+        recorder = self.recorder
+        if recorder is not None:
+            for node in graph.nodes:
+                recorder.expect((node.typ, node.name))
+
+        try:
+            with profiled("sync.resolve", account=self.amazon.account_name):
+                graph.link().run(self.workers, engine=self.engine, prefetch=self.prefetch)
+        finally:
+            if recorder is not None:
+                recorder.flush()
+
+    def in_shard(self, name, things):
+        """
+        Return the things that belong to our shard
+
+        Roles make their own instance profile, so a shard only ever touches
+        the instance profiles of roles it owns.
+        """
+        if self.shard is None or name in self.unsharded:
+            return things
+
+        return [thing for thing in things if self.shard.includes(thing.name)]
+
+    def compile(self, combined):
+        """
+        Setup everything without talking to amazon
+
+        And return {<type>: {<name>: <compiled>}} for the things that know how to compile themselves
+        """
+        compiled = {}
         for _, name in sorted(self.the_types):
             if name in combined:
                 things = self.create_things(combined[name], name)
-                self.setup_and_resolve(things)
+                for thing in things:
+                    thing.setup()
+                self.remember_templates(name, things)
 
-                # Special case the templates
-                if name == "templates":
-                    for template in things:
-                        self.templates[template.name] = template.template
+                for thing in things:
+                    if hasattr(thing, "compiled"):
+                        if name not in compiled:
+                            compiled[name] = {}
+                        compiled[name][thing.name] = thing.compiled()
+
+        return compiled
+
+    def remember_templates(self, name, things):
+        """Special case the templates"""
+        if name == "templates":
+            for template in things:
+                self.templates[template.name] = template.template
 
     def register_default_types(self):
         """Register the default things syncr looks for"""
-        self.register_type("templates", dict, Template, priority=0)
+        self.register_type("templates", dict, Template, priority=0, sharded=False)
         self.register_type("remove_roles", list, RoleRemoval, key_conflicts_with=["roles"], priority=10)
         self.register_type("roles", dict, Role, key_conflicts_with=["remove_roles"], priority=20)
         self.register_type("keys", dict, Kms, priority=30)
         self.register_type("buckets", dict, Bucket, priority=40)
 
-    def register_type(self, name, typ, kls, key_conflicts_with=None, priority=None):
+    def register_type(self, name, typ, kls, key_conflicts_with=None, priority=None, sharded=True):
         """
         Register a type to be synced
 
         Override existing types
+
+        Types that aren't sharded are given to every shard
         """
         if key_conflicts_with and not isinstance(key_conflicts_with, list):
             key_conflicts_with = [key_conflicts_with]
         self.types[name] = (typ, key_conflicts_with, kls)
         self.the_types.append((priority, name))
+        if not sharded:
+            self.unsharded.add(name)
 
     def create_things(self, things, name):
         """Creates a list of objects"""
@@ -70,13 +154,112 @@ class Sync(object):
         else:
             return [kls(thing, val, self.amazon, self.templates) for thing, val in things.items()]
 
-    def setup_and_resolve(self, things):
+    def setup_and_resolve(self, things, name=None):
         """Runs setup on all the provided things and once they are setup, resolve them"""
-        for thing in things:
-            thing.setup()
+        for thing, definition in self.setup_things(things, name):
+            self.resolve_thing(thing, name, definition)
+
+    @property
+    def recorder(self):
+        """The ChangeRecorder of our amazon, if it has one"""
+        recorder = getattr(self.amazon, "recorder", None)
+        if isinstance(recorder, ChangeRecorder):
+            return recorder
+
+    @contextmanager
+    def recording(self, name, thing):
+        """Keep the changes made by resolving this thing together"""
+        recorder = self.recorder
+        if recorder is None or name is None:
+            yield
+        else:
+            with recorder.item((name, thing.name)):
+                yield
+
+    @property
+    def using_journal(self):
+        return self.journal is not None and not self.amazon.dry_run
+
+    def setup_things(self, things, name=None):
+        """
+        Runs setup on all the provided things and return [(thing, definition_digest), ...]
 
+        The digest is of the definition before setup changes it, and is only
+        worked out if we have a journal.
+        """
+        found = []
         for thing in things:
-            thing.resolve()
+            definition = None
+            if self.using_journal and name is not None:
+                definition = definition_digest(thing)
+            with span("setup", type=name, thing=getattr(thing, "name", None), account=self.amazon.account_name):
+                thing.setup()
+            found.append((thing, definition))
+        return found
+
+    def prefetcher_for(self, thing, name, definition):
+        """Return a function that reads what amazon has for this thing, or None if it can't"""
+        if not self.prefetch or not hasattr(thing, "prefetch"):
+            return None
+
+        def prefetch():
+            if self.using_journal and self.journal.is_complete(self.amazon.account_id, name, thing.name, item_digest(name, thing, definition)):
+                return None
+            return thing.prefetch()
+        return prefetch
+
+    def resolve_thing(self, thing, name=None, definition=None, remote=None):
+        """
+        Resolve one thing that has been setup
+
+        remote is what the thing's prefetch gave back, if it was called.
+
+        If we have a journal, then things it says are already done with the same
+        digest are skipped and everything we resolve is recorded in it.
+
+        Things that can't be resolved because amazon kept failing are skipped
+        and remembered in ``skipped``, so everything else can carry on.
+        """
+        journal = None
+        if self.using_journal and name is not None:
+            journal = self.journal
+
+        digest = None
+        if journal:
+            digest = item_digest(name, thing, definition)
+            if journal.is_complete(self.amazon.account_id, name, thing.name, digest):
+                log.info("Already synced according to the journal\ttype=%s\tname=%s", name, thing.name)
+                self.resumed[name].append(thing.name)
+                self.synced[name].append(thing.name)
+
+                # Nothing to show, but the things after us shouldn't wait for us
+                recorder = self.recorder
+                if recorder is not None:
+                    recorder.finish((name, thing.name), [])
+                return
+
+        try:
+            with self.recording(name, thing), span("resolve", type=name, thing=getattr(thing, "name", None), account=self.amazon.account_name):
+                if remote is None:
+                    thing.resolve()
+                else:
+                    thing.resolve(remote=remote)
+        except CircuitOpen as error:
+            log.warning("Skipping because amazon kept failing\ttype=%s\tname=%s\terror=%s", name, thing.name, error)
+            if journal:
+                journal.record(self.amazon.account_id, name, thing.name, digest, "skipped")
+            if name is not None:
+                self.skipped[name].append(thing.name)
+            return
+        except Exception:
+            if journal:
+                journal.record(self.amazon.account_id, name, thing.name, digest, "failed")
+            raise
+
+        if journal:
+            journal.record(self.amazon.account_id, name, thing.name, digest, "ok")
+        if name is not None:
+            self.synced[name].append(thing.name)
 
     def add(self, configuration, location, only_consider=None):
         """Add a new configuration"""
@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+import threading
+import logging
+import json
+import time
+import os
+
+log = logging.getLogger("iam_syncr.tracing")
+
+timer = getattr(time, "perf_counter", time.time)
+
+class Tracer(object):
+    """
+    Lightweight spans written out in the chrome trace event format
+
+    Tracing does nothing until ``start()`` is called, after which every
+    ``span`` is remembered until ``write(location)``.
+
+    The result can be opened in chrome://tracing or https://ui.perfetto.dev
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.events = []
+        self.threads = {}
+        self.started = timer()
+
+    def start(self):
+        """Start remembering spans"""
+        with self.lock:
+            self.enabled = True
+            self.events = []
+            self.threads = {}
+            self.started = timer()
+
+    def stop(self):
+        with self.lock:
+            self.enabled = False
+
+    @contextmanager
+    def span(self, name, **args):
+        """Record how long the body of this context manager takes"""
+        if not self.enabled:
+            yield
+            return
+
+        start = timer()
+        try:
+            yield
+        finally:
+            self.add(name, start, timer(), args)
+
+    def add(self, name, start, end, args):
+        """Add a complete event"""
+        thread = threading.current_thread()
+        event = {
+              "name": name
+            , "cat": name.split(".")[0]
+            , "ph": "X"
+            , "ts": int((start - self.started) * 1000000)
+            , "dur": int((end - start) * 1000000)
+            , "pid": os.getpid()
+            , "tid": thread.ident
+            , "args": dict((key, str(val)) for key, val in args.items())
+            }
+
+        with self.lock:
+            if thread.ident not in self.threads:
+                self.threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    def as_dict(self):
+        """Return the trace as chrome wants it"""
+        with self.lock:
+            events = [
+                  {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": name}}
+                  for ident, name in sorted(self.threads.items())
+                ]
+            events.extend(sorted(self.events, key=lambda event: event["ts"]))
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, location):
+        with open(location, "w") as fle:
+            json.dump(self.as_dict(), fle)
+        log.info("Wrote trace\tlocation=%s\tspans=%s", location, len(self.events))
+
+tracer = Tracer()
+
+def span(name, **args):
+    """Record a span with our global tracer"""
+    return tracer.span(name, **args)
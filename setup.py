@@ -1,18 +1,28 @@
+from setuptools.command.build_py import build_py
 from setuptools import setup, find_packages
 from iam_syncr import VERSION
+import sys
+
+class BuildPy(build_py):
+    """Leave out the asyncio engine on pythons that can't compile async and await"""
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 5):
+            modules = [module for module in modules if (module[0], module[1]) != ("iam_syncr", "aio")]
+        return modules
 
 setup(
       name = "iam_syncr"
     , version = VERSION
     , packages = ['iam_syncr'] + ['iam_syncr.%s' % pkg for pkg in find_packages('iam_syncr')]
     , include_package_data = True
+    , cmdclass = {"build_py": BuildPy}
 
     , install_requires =
       [ "rainbow_logging_handler"
       , "pyYaml"
       , "boto>=2.32.1"
       , "option_merge==0.7"
-      , "datadiff"
       , "delfick_error"
       , "six"
       ]
@@ -0,0 +1,81 @@
+# coding: spec
+
+from benchmarks.generate import generate, counts_for
+from benchmarks.baselines import environment, save_baseline, load_baseline
+from benchmarks.run import run_once, regressions
+from benchmarks import micro
+
+from iam_syncr.executor import find_configurations, parse_configurations
+
+from six import StringIO
+import tempfile
+import shutil
+import json
+import six
+import os
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+from tests.helpers import TestCase
+
+describe TestCase, "Benchmarks":
+    it "generates configuration that can be synced":
+        folder = tempfile.mkdtemp()
+        try:
+            accounts = generate(folder, 30, files=3, keys=False)
+            self.assertEqual(sorted(accounts), ["development", "staging"])
+
+            parsed = parse_configurations(find_configurations("{0}/development".format(folder), "*.yaml"))
+            self.assertEqual(len(parsed), 3)
+            self.assertEqual(sum(len(configuration.get("roles", {})) for configuration in parsed.values()), counts_for(30, keys=False)["roles"])
+
+            items, timings, calls = run_once(folder)
+            self.assertEqual(items, 30)
+            self.assertEqual(sorted(timings), ["combine", "compile", "noop_resolve", "parse", "resolve", "setup"])
+            assert calls > items
+        finally:
+            shutil.rmtree(folder)
+
+    it "finds phases that got slower than the threshold":
+        baseline = {"10": {"parse": {"items_per_second": 100}, "resolve": {"items_per_second": 100}}}
+        results = {"10": {"parse": {"items_per_second": 80}, "resolve": {"items_per_second": 70}, "setup": {"items_per_second": 1}}}
+        self.assertEqual(regressions(results, baseline, 0.25), [("10", "resolve", 100, 70)])
+
+    it "only compares against a baseline made in the same environment":
+        folder = tempfile.mkdtemp()
+        try:
+            location = os.path.join(folder, "baseline.json")
+            results = {"10": {"parse": {"items_per_second": 100}}}
+            with mock.patch("sys.stdout", StringIO()):
+                self.assertIs(load_baseline(location), None)
+
+                save_baseline(location, results)
+                self.assertEqual(load_baseline(location), results)
+
+                with open(location, "w") as fle:
+                    json.dump({"environment": dict(environment(), python="2.6.0"), "results": results}, fle)
+                out = StringIO()
+                with mock.patch("sys.stdout", out):
+                    self.assertIs(load_baseline(location), None)
+                assert "made with a different python" in out.getvalue(), out.getvalue()
+
+                with open(location, "w") as fle:
+                    json.dump({"python": "3.6.15", "results": results}, fle)
+                self.assertIs(load_baseline(location), None)
+        finally:
+            shutil.rmtree(folder)
+
+describe TestCase, "Microbenchmarks":
+    it "compares documents that are the same and different":
+        found = dict(("{0}.{1}".format(group, name), func) for group, name, func in micro.cases())
+        self.assertEqual(found["compare.identical_large"](), [])
+        self.assertEqual(found["compare.reordered_large"](), [])
+        assert found["compare.different_large"]()
+
+    it "times every case":
+        results = micro.run(number=1, repeat=1)
+        self.assertEqual(len(results), len(micro.cases()))
+        self.assertEqual(micro.regressions(results, dict((case, {"usec_per_call": 0.0001}) for case in results), 0.25)[0][0], sorted(results)[0])
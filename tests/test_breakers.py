@@ -0,0 +1,61 @@
+# coding: spec
+
+from iam_syncr.amazon.breakers import Breakers, Deadline
+from iam_syncr.errors import CircuitOpen, DeadlineExceeded
+from iam_syncr.amazon.calls import AmazonCalls
+
+import boto
+import time
+
+from tests.helpers import TestCase
+
+describe TestCase, "Breakers":
+    def calls(self, breakers, deadline=None):
+        return AmazonCalls("dev", breakers=breakers, deadline=deadline)
+
+    def fail(self, status):
+        raise boto.exception.BotoServerError(status, "Oops")
+
+    it "stops calling a service and region after it keeps failing":
+        called = []
+        calls = self.calls(Breakers(threshold=2, cooldown=60))
+        for _ in range(2):
+            with self.fuzzyAssertRaisesError(boto.exception.BotoServerError):
+                calls.call("iam", "global", "get_role", lambda: called.append(1) or self.fail(500))
+
+        with self.fuzzyAssertRaisesError(CircuitOpen, service="iam", region="global"):
+            calls.call("iam", "global", "get_role", lambda: called.append(1))
+        self.assertEqual(len(called), 2)
+
+        # Other services and regions are fine
+        self.assertEqual(calls.call("kms", "us-east-1", "describe_key", lambda: "key"), "key")
+
+    it "doesn't count amazon saying no":
+        calls = self.calls(Breakers(threshold=1, cooldown=60))
+        for _ in range(3):
+            with self.fuzzyAssertRaisesError(boto.exception.BotoServerError):
+                calls.call("iam", "global", "get_role", lambda: self.fail(404))
+        self.assertEqual(calls.call("iam", "global", "get_role", lambda: "role"), "role")
+
+    it "lets one call through after the cooldown":
+        breakers = Breakers(threshold=1, cooldown=0.05)
+        calls = self.calls(breakers)
+        with self.fuzzyAssertRaisesError(boto.exception.BotoServerError):
+            calls.call("s3", "global", "get_bucket", lambda: self.fail(503))
+        with self.fuzzyAssertRaisesError(CircuitOpen):
+            calls.call("s3", "global", "get_bucket", lambda: "bucket")
+
+        time.sleep(0.06)
+        self.assertEqual(calls.call("s3", "global", "get_bucket", lambda: "bucket"), "bucket")
+        self.assertEqual(calls.call("s3", "global", "get_bucket", lambda: "bucket"), "bucket")
+
+    it "never stops calls with a threshold of 0":
+        calls = self.calls(Breakers(threshold=0))
+        for _ in range(10):
+            with self.fuzzyAssertRaisesError(boto.exception.BotoServerError):
+                calls.call("iam", "global", "get_role", lambda: self.fail(500))
+
+    it "doesn't start calls after the deadline":
+        calls = self.calls(Breakers(), deadline=Deadline(0))
+        with self.fuzzyAssertRaisesError(DeadlineExceeded, operation="get_role"):
+            calls.call("iam", "global", "get_role", lambda: "role")
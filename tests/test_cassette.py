@@ -0,0 +1,72 @@
+# coding: spec
+
+from iam_syncr.amazon.cassette import Cassette, ReplayBackend, encode, decode
+from iam_syncr.amazon.fake import FakeAmazonBackend
+from iam_syncr.amazon.buckets import AmazonBuckets
+from iam_syncr.amazon.roles import AmazonRoles
+from iam_syncr.errors import BadCassette
+from iam_syncr.amazon.base import Amazon
+
+from boto.s3.tagging import Tags, TagSet
+from boto.s3.bucket import Bucket
+import tempfile
+import shutil
+import json
+
+from tests.helpers import TestCase
+
+describe TestCase, "Cassette":
+    def sync(self, amazon):
+        """Do some things and return what we found"""
+        amazon.setup()
+        roles = AmazonRoles(amazon)
+        buckets = AmazonBuckets(amazon)
+
+        found = [roles.role_info("thing")]
+        roles.create_role("thing", "{}", policies={"policy": json.dumps({"Statement": []})})
+        found.append(roles.role_info("thing")["role"]["role_name"])
+        found.append(roles.current_role_policies("thing", comparing=["policy"]))
+
+        buckets.create_bucket("stuff", "ap-southeast-2", permission_document="{}")
+        buckets.modify_bucket("stuff", "ap-southeast-2", "{}", {"owner": "me"})
+        found.append(buckets.current_tags(buckets.bucket_info("stuff")))
+        found.append(buckets.current_policy(buckets.bucket_info("stuff")))
+        return found
+
+    it "replays what it recorded":
+        folder = tempfile.mkdtemp()
+        try:
+            backend = FakeAmazonBackend(123456789012)
+            backend.add_role("bootstrap")
+
+            recording = Cassette(folder, "dev")
+            expected = self.sync(Amazon("123456789012", "dev", {}, backend=backend, cassette=recording))
+            recording.close()
+            self.assertEqual(expected[0], False)
+
+            replaying = Cassette(folder, "dev", replaying=True)
+            amazon = Amazon("123456789012", "dev", {}, backend=ReplayBackend(), cassette=replaying)
+            self.assertEqual(self.sync(amazon), expected)
+            self.assertIs(amazon.changes, True)
+            self.assertEqual(amazon.metrics.total_calls, backend.total_calls)
+
+            with self.fuzzyAssertRaisesError(BadCassette, "Nothing recorded for this call", operation="get_role"):
+                AmazonRoles(amazon).role_info("other")
+        finally:
+            shutil.rmtree(folder)
+
+    it "complains if nothing was recorded for the account":
+        with self.fuzzyAssertRaisesError(BadCassette, "Nothing was recorded for this account"):
+            Cassette(tempfile.gettempdir(), "not-an-account-ever", replaying=True)
+
+    it "can encode what boto gives back":
+        tag_set = TagSet()
+        tag_set.add_tag("one", "two")
+        tags = Tags()
+        tags.add_tag_set(tag_set)
+
+        decoded = decode(json.loads(json.dumps(encode({"bucket": Bucket(name="stuff"), "policy": b"{}", "tags": tags, "list": [1, "two"]}))))
+        self.assertEqual(decoded["bucket"].name, "stuff")
+        self.assertEqual(decoded["policy"], b"{}")
+        self.assertEqual([(tag.key, tag.value) for found in decoded["tags"] for tag in found], [("one", "two")])
+        self.assertEqual(decoded["list"], [1, "two"])
@@ -0,0 +1,114 @@
+# coding: spec
+
+from iam_syncr.amazon.changes import Change, ChangeRecorder, JsonlWriter, jsonl_sink
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from six import StringIO
+import threading
+import json
+import time
+
+from tests.helpers import TestCase
+
+describe TestCase, "ChangeRecorder":
+    before_each:
+        self.shown = []
+        self.recorder = ChangeRecorder(sink=lambda changes: self.shown.append([change.values["name"] for change in changes]))
+
+    def change(self, name, symbol="+", typ="role"):
+        return Change(symbol, typ, {"name": name})
+
+    it "shows the changes of each item together in the order items were expected":
+        for key in ("one", "two", "three"):
+            self.recorder.expect(key)
+
+        def resolve(key, delay):
+            with self.recorder.item(key):
+                self.recorder.record(self.change("{0}-a".format(key)))
+                time.sleep(delay)
+                self.recorder.record(self.change("{0}-b".format(key)))
+
+        threads = [threading.Thread(target=resolve, args=(key, delay)) for key, delay in (("one", 0.05), ("two", 0), ("three", 0.02))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.shown, [["one-a", "one-b"], ["two-a", "two-b"], ["three-a", "three-b"]])
+
+    it "shows changes outside of an item straight away":
+        self.recorder.expect("one")
+        self.recorder.record(self.change("outside"))
+        self.assertEqual(self.shown, [["outside"]])
+
+    it "shows what is finished when flushed even if an earlier item never finishes":
+        self.recorder.expect("one")
+        self.recorder.expect("two")
+        with self.recorder.item("two"):
+            self.recorder.record(self.change("two"))
+        self.assertEqual(self.shown, [])
+
+        self.recorder.flush()
+        self.assertEqual(self.shown, [["two"]])
+
+    it "counts creates, modifies and deletes of each type":
+        self.recorder.record(self.change("a", "+", "role"))
+        self.recorder.record(self.change("b", "M", "role_policy"))
+        self.recorder.record(self.change("c", "-", "role"))
+        self.recorder.record(self.change("d", "+", "bucket[ap-southeast-2] "))
+
+        self.assertEqual(self.recorder.total, 4)
+        self.assertEqual(self.recorder.summary(),
+            [ "type         create  modify  delete"
+            , "bucket            1       0       0"
+            , "role              1       0       1"
+            , "role_policy       0       1       0"
+            ]
+        )
+
+describe TestCase, "JsonlWriter":
+    it "writes a json object per line in batches":
+        stream = StringIO()
+        writer = JsonlWriter(stream, batch_size=2, interval=60)
+        writer.write([{"one": 1}])
+        self.assertEqual(stream.getvalue(), "")
+
+        writer.write([{"two": 2}])
+        self.assertEqual(stream.getvalue(), '{"one":1}\n{"two":2}\n')
+
+        writer.write([{"three": 3}])
+        writer.flush()
+        self.assertEqual(stream.getvalue().split("\n")[2], '{"three":3}')
+
+    it "writes what it has every interval once started, even if nothing else is written":
+        stream = StringIO()
+        writer = JsonlWriter(stream, batch_size=50, interval=0.01).start()
+        try:
+            writer.write([{"one": 1}])
+            start = time.time()
+            while not stream.getvalue() and time.time() - start < 5:
+                time.sleep(0.01)
+            self.assertEqual(stream.getvalue(), '{"one":1}\n')
+
+            writer.write([{"two": 2}])
+        finally:
+            writer.close()
+        self.assertEqual(stream.getvalue(), '{"one":1}\n{"two":2}\n')
+        self.assertIs(writer.thread, None)
+
+    it "writes a record for each change with what was changed and how":
+        stream = StringIO()
+        writer = JsonlWriter(stream, batch_size=1)
+        recorder = ChangeRecorder(sink=jsonl_sink(writer, "dev", dry_run=True))
+        recorder.expect(("roles", "thing"))
+        with recorder.item(("roles", "thing")):
+            recorder.record(Change("M", "role_policy", {"role": "thing", "policy": "syncr_policy"}, changes=["-\ta", "+\tb"]))
+            recorder.record(Change("+", "bucket_policy", {"bucket": "stuff"}, document='{ "b": 1, "a": [] }'))
+
+        records = [json.loads(line) for line in stream.getvalue().strip().split("\n")]
+        self.assertEqual([(record["account"], record["dry_run"], record["item"]) for record in records], [("dev", True, ["roles", "thing"])] * 2)
+        self.assertEqual((records[0]["symbol"], records[0]["kind"], records[0]["type"]), ("M", "modify", "role_policy"))
+        self.assertEqual(records[0]["identifiers"], {"role": "thing", "policy": "syncr_policy"})
+        self.assertEqual(records[0]["diff"], ["-\ta", "+\tb"])
+        self.assertEqual(records[1]["document"], '{"a":[],"b":1}')
+        assert records[1]["item_seconds"] >= 0
@@ -0,0 +1,70 @@
+# coding: spec
+
+from iam_syncr.amazon.documents import AmazonDocuments
+from iam_syncr.amazon.diff import diff_documents
+
+import json
+
+from tests.helpers import TestCase
+
+describe TestCase, "diff_documents":
+    it "doesn't care about order or lists of one thing":
+        first = {"Version": "2012-10-17", "Statement": [
+              {"Effect": "Allow", "Action": ["s3:Get", "s3:Put"], "Resource": ["b", "a"], "Principal": {"AWS": ["two", "one"]}}
+            , {"Effect": "Allow", "Action": ["sqs:Send"], "Resource": "*"}
+            ]}
+        second = {"Statement": [
+              {"Action": "sqs:Send", "Effect": "Allow", "Resource": ["*"]}
+            , {"Effect": "Allow", "Resource": ["a", "b"], "Action": ["s3:Put", "s3:Get"], "Principal": {"AWS": ["one", "two"]}}
+            ], "Version": "2012-10-17"}
+        self.assertIs(bool(diff_documents(first, second)), False)
+
+    it "matches statements by sid and reports the fields that changed":
+        first = {"Statement": [{"Sid": "one", "Effect": "Allow", "Action": ["s3:Get", "s3:Put"], "Resource": "*"}, {"Effect": "Allow", "Action": "sqs:Send", "Resource": "*"}]}
+        second = {"Statement": [{"Sid": "one", "Effect": "Deny", "Action": ["s3:Get", "s3:Delete"], "Resource": "*"}, {"Effect": "Allow", "Action": "sns:Publish", "Resource": "*"}]}
+
+        diff = diff_documents(first, second)
+        self.assertEqual([change.statement["Action"] for change in diff.added], ["sns:Publish"])
+        self.assertEqual([change.statement["Action"] for change in diff.removed], ["sqs:Send"])
+        self.assertEqual([change.sid for change in diff.modified], ["one"])
+        self.assertEqual(list(diff.lines()), [
+              '- statement {"Action": "sqs:Send", "Effect": "Allow", "Resource": "*"}'
+            , '~ statement Sid="one"'
+            , '    Action: + "s3:Delete"'
+            , '    Action: - "s3:Put"'
+            , '    Effect: "Allow" -> "Deny"'
+            , '+ statement {"Action": "sns:Publish", "Effect": "Allow", "Resource": "*"}'
+            ])
+
+    it "says what else changed in the document":
+        diff = diff_documents({"Version": "2008-10-17", "Statement": []}, {"Version": "2012-10-17", "Statement": []})
+        self.assertEqual(list(diff.lines()), ['Version: "2008-10-17" -> "2012-10-17"'])
+
+    it "handles duplicate statements":
+        statement = {"Effect": "Allow", "Action": "s3:Get", "Resource": "*"}
+        diff = diff_documents({"Statement": [statement]}, {"Statement": [statement, statement]})
+        self.assertEqual([change.symbol for change in diff.added], ["+"])
+        self.assertEqual(diff.removed, [])
+
+describe TestCase, "AmazonDocuments":
+    it "yields nothing for documents that aren't json":
+        self.assertEqual(list(AmazonDocuments().compare_two_documents("{", "{}")), [])
+
+    it "yields everything when there was no document before":
+        new = json.dumps({"Statement": [{"Effect": "Allow", "Action": "s3:Get", "Resource": "*"}]})
+        self.assertEqual(list(AmazonDocuments().compare_two_documents("{}", new)), ['+ statement {"Action": "s3:Get", "Effect": "Allow", "Resource": "*"}'])
+
+    it "says documents are different without working out the diff":
+        old = json.dumps({"Statement": [{"Effect": "Allow", "Action": "s3:Get", "Resource": "*"}]})
+        new = json.dumps({"Statement": [{"Effect": "Allow", "Action": "s3:Put", "Resource": "*"}]})
+        change = AmazonDocuments().document_change(old, new)
+        assert change
+        self.assertIs(change._lines, None)
+        self.assertEqual(len(change.digest), 64)
+
+        self.assertEqual(list(change), ['- statement {"Action": "s3:Get", "Effect": "Allow", "Resource": "*"}', '+ statement {"Action": "s3:Put", "Effect": "Allow", "Resource": "*"}'])
+
+    it "says nothing changed when only the order of statements did":
+        one = {"Effect": "Allow", "Action": "s3:Get", "Resource": "*"}
+        two = {"Effect": "Deny", "Action": "s3:Put", "Resource": "*"}
+        self.assertIs(AmazonDocuments().document_change(json.dumps({"Statement": [one, two]}), json.dumps({"Statement": [two, one]})), None)
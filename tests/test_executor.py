@@ -6,6 +6,7 @@ from iam_syncr import executor
 from tests.helpers import a_file, a_directory
 
 from argparse import ArgumentTypeError
+from six import StringIO
 import yaml
 import six
 import os
@@ -94,7 +95,7 @@ describe TestCase, "Making Amazon object":
                     instance = executor.make_amazon(folder)
 
         self.assertIs(instance, amazon_instance)
-        fakeAmazon.assert_called_once_with(12, "dev", accounts, dry_run=False)
+        fakeAmazon.assert_called_once_with(12, "dev", accounts, dry_run=False, profile_name=None)
         amazon_instance.setup.assert_called_once()
 
         # Mock probably makes it easier to do this check, I'll come back to it another day
@@ -121,9 +122,21 @@ describe TestCase, "Making Amazon object":
                     instance = executor.make_amazon(folder, accounts_location)
 
         self.assertIs(instance, amazon_instance)
-        fakeAmazon.assert_called_once_with(32, "staging", accounts, dry_run=False)
+        fakeAmazon.assert_called_once_with(32, "staging", accounts, dry_run=False, profile_name=None)
         amazon_instance.setup.assert_called_once()
-        fake_accounts_from.assert_called_once_with(accounts_location)
+        fake_accounts_from.assert_called_once_with(accounts_location, cache=None)
+
+    it "uses a profile named after the account if asked to":
+        fakeAmazon = mock.Mock(name="fakeAmazon")
+        accounts = {"dev": 12}
+        fake_accounts_from = mock.Mock(name="accounts_from", return_value=accounts)
+
+        with mock.patch("iam_syncr.executor.accounts_from", fake_accounts_from):
+            with mock.patch("iam_syncr.executor.Amazon", fakeAmazon):
+                with a_directory() as directory:
+                    executor.make_amazon(os.path.join(directory, "dev"), profile_per_account=True)
+
+        fakeAmazon.assert_called_once_with(12, "dev", accounts, dry_run=False, profile_name="dev")
 
     it "complains if can't find the account name in the accounts":
         accounts = {}
@@ -137,6 +150,59 @@ describe TestCase, "Making Amazon object":
                     folder = os.path.join(directory, "prod")
                     executor.make_amazon(folder, accounts_location)
 
+describe TestCase, "Finding account folders":
+    it "returns the folders as is if given more than one":
+        folders = [mock.Mock(name="one"), mock.Mock(name="two")]
+        self.assertEqual(executor.account_folders(folders), folders)
+
+    it "returns the folder as is if it has no accounts.yaml":
+        with a_directory() as directory:
+            self.assertEqual(executor.account_folders([directory]), [directory])
+
+    it "returns the folders named after accounts if given a root folder":
+        with a_directory() as directory:
+            for name in ("dev", "prod", "other"):
+                os.makedirs(os.path.join(directory, name))
+            with open(os.path.join(directory, "accounts.yaml"), 'w') as fle:
+                fle.write(yaml.dump({"dev": 12, "prod": 34, "stg": 56}))
+
+            self.assertEqual(executor.account_folders([directory]), [os.path.join(directory, "dev"), os.path.join(directory, "prod")])
+
+    it "complains if a root folder has no account folders":
+        with self.fuzzyAssertRaisesError(NoConfiguration, "Didn't find any folders named after the accounts"):
+            with a_directory() as directory:
+                with open(os.path.join(directory, "accounts.yaml"), 'w') as fle:
+                    fle.write(yaml.dump({"dev": 12}))
+                executor.account_folders([directory])
+
+describe TestCase, "Parse cache":
+    it "only parses a file once and gives out copies":
+        cache = executor.ParseCache()
+        with a_file("{roles: {one: {}}}") as filename:
+            fake_load = mock.Mock(name="load", side_effect=lambda fle: {"roles": {"one": {}}})
+            with mock.patch("yaml.load", fake_load):
+                first = cache.load(filename)
+                second = cache.load(filename)
+
+        self.assertEqual(first, {"roles": {"one": {}}})
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(len(fake_load.mock_calls), 1)
+
+describe TestCase, "Printing":
+    it "prints errors and skipped things to the stream it is given instead of stdout":
+        out = StringIO()
+        stdout = StringIO()
+        with mock.patch("sys.stdout", stdout):
+            executor.print_error(SyncrError("nope"), out=out)
+            executor.print_skipped({"roles": ["one", "two"], "buckets": ["three"]}, out=out)
+
+        self.assertEqual(stdout.getvalue(), "")
+        lines = out.getvalue().split("\n")
+        self.assertEqual(lines[0], "!" * 80)
+        assert lines[1].startswith("Something went wrong => SyncrError"), lines[1]
+        self.assertEqual(lines[2], "Skipped because amazon kept failing: buckets:three, roles:one, roles:two")
+
 describe TestCase, "Doing the sync":
     it "Parses configurations, creates sync, adds configurations and does the sync":
         fake_found = mock.Mock(name="found")
@@ -0,0 +1,146 @@
+# coding: spec
+
+from iam_syncr.amazon.fake import FakeAmazonBackend
+from iam_syncr.amazon.buckets import AmazonBuckets
+from iam_syncr.amazon.roles import AmazonRoles
+from iam_syncr.amazon.kms import AmazonKms
+from iam_syncr.amazon.base import Amazon
+from iam_syncr.errors import BadAmazon
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from six import StringIO
+import boto
+import json
+import time
+import six
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+from tests.helpers import TestCase
+
+describe TestCase, "FakeAmazonBackend":
+    before_each:
+        self.backend = FakeAmazonBackend(123456789012, page_size=2)
+        for index in range(5):
+            self.backend.add_role("role{0}".format(index))
+        self.backend.add_user("bob")
+
+        self.amazon = Amazon("123456789012", "dev", {"dev": "123456789012"}, backend=self.backend)
+        self.amazon.setup()
+
+    it "pages through roles and users":
+        self.assertEqual([role["role_name"] for role in self.amazon.all_roles], ["role{0}".format(index) for index in range(5)])
+        self.assertEqual([user["user_name"] for user in self.amazon.all_users], ["bob"])
+        self.assertEqual(self.backend.calls[("iam", "list_roles")], 3)
+        self.assertEqual(self.amazon.metrics.total_calls, 4)
+
+    it "creates and then leaves alone roles":
+        roles = AmazonRoles(self.amazon)
+        trust = json.dumps({"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Principal": {"Service": "ec2.amazonaws.com"}, "Action": "sts:AssumeRole"}]}, indent=2)
+        policy = json.dumps({"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Action": "s3:*", "Resource": "*"}]}, indent=2)
+
+        roles.create_role("/blah/thing", trust, policies={"syncr_policy": policy})
+        roles.make_instance_profile("thing")
+        self.assertEqual(self.backend.roles["thing"]["path"], "/blah/")
+        self.assertEqual(self.backend.instance_profiles, {"thing": ["thing"]})
+        self.assertIs(self.amazon.changes, True)
+
+        self.amazon.changes = False
+        roles.modify_role(roles.role_info("thing"), "/blah/thing", trust, policies={"syncr_policy": policy})
+        roles.make_instance_profile("thing")
+        self.assertIs(self.amazon.changes, False)
+
+        roles.remove_role("thing")
+        assert "thing" not in self.backend.roles
+
+    it "only asks amazon about a role again after changing it":
+        roles = AmazonRoles(self.amazon)
+        roles.create_role("thing", "{}")
+        roles.role_info("thing")
+        roles.has_role("thing")
+        self.assertEqual(self.backend.calls[("iam", "get_role")], 1)
+
+        roles.remove_role("thing")
+        self.assertIs(roles.has_role("thing"), False)
+        self.assertEqual(self.backend.calls[("iam", "get_role")], 2)
+
+    it "waits for amazon to know about roles it just made":
+        self.backend.propagation_delay = 0.05
+        self.amazon.propagation.first = 0.01
+        roles = AmazonRoles(self.amazon)
+
+        roles.create_role("thing", "{}", policies={"syncr_policy": "{}"})
+        roles.make_instance_profile("thing")
+        self.assertEqual(self.backend.role_policies["thing"], {"syncr_policy": "{}"})
+        self.assertEqual(self.backend.instance_profiles, {"thing": ["thing"]})
+
+        found = self.amazon.metrics.as_dict()
+        retries = dict((operation["operation"], operation["retries"]) for operation in found["operations"])
+        assert retries["put_role_policy"] > 0
+        self.assertEqual(sorted(propagated["operation"] for propagated in found["propagation"]), ["add_role_to_instance_profile", "put_role_policy"])
+
+    it "doesn't wait for roles it didn't make":
+        self.backend.propagation_delay = 60
+        self.backend.made_roles["role0"] = time.time()
+        with self.fuzzyAssertRaisesError(boto.exception.BotoServerError, error_code="NoSuchEntity"):
+            AmazonRoles(self.amazon).modify_role({"role": {}}, "role0", None, policies={"syncr_policy": "{}"})
+        self.assertEqual(self.backend.calls[("iam", "put_role_policy")], 1)
+
+    it "creates buckets with policies and tags":
+        buckets = AmazonBuckets(self.amazon)
+        policy = json.dumps({"Statement": [{"Effect": "Allow", "Action": "s3:GetObject", "Resource": "arn:aws:s3:::stuff/*"}]})
+
+        buckets.create_bucket("stuff", "ap-southeast-2", permission_document=policy)
+        buckets.modify_bucket("stuff", "ap-southeast-2", policy, {"owner": "me"})
+        self.assertEqual(self.backend.buckets["stuff"], {"location": "ap-southeast-2", "policy": policy, "tags": {"owner": "me"}})
+
+        self.amazon.changes = False
+        buckets.modify_bucket("stuff", "ap-southeast-2", policy, {"owner": "me"})
+        self.assertIs(self.amazon.changes, False)
+
+    it "creates keys with grants":
+        if six.PY2:
+            return
+
+        kms = AmazonKms(self.amazon, self.amazon.kms_connection_for("ap-southeast-2"))
+        kms.create_key("stuff", "some key", permission_document="{}")
+        kms.modify_key("stuff", "better key", "{}")
+        kms.modify_grant("stuff", "better key", [{"grantee": self.backend.users["bob"]["arn"], "operations": ["Decrypt"]}])
+
+        key = kms.key_info("stuff")
+        self.assertEqual(key["Description"], "better key")
+        self.assertEqual(len(self.backend.grants[key["KeyId"]]), 1)
+        self.assertIs(kms.key_info("other"), False)
+
+    it "leaves the grants it remembers as amazon gave them when modifying grants":
+        kms = AmazonKms(self.amazon, self.amazon.kms_connection_for("ap-southeast-2"))
+        kms.create_key("stuff", "some key", permission_document="{}")
+        grant = [{"grantee": self.backend.users["bob"]["arn"], "operations": ["Encrypt", "Decrypt"]}]
+        kms.modify_grant("stuff", "some key", grant)
+
+        key_id = kms.key_info("stuff")["KeyId"]
+        self.assertEqual(kms.current_grants(key_id)[0]["Operations"], ["Encrypt", "Decrypt"])
+
+        kms.modify_grant("stuff", "some key", grant)
+        self.assertEqual(kms.current_grants(key_id)[0]["Operations"], ["Encrypt", "Decrypt"])
+        self.assertEqual(len(self.backend.grants[key_id]), 1)
+
+    it "throttles when asked to":
+        self.backend.throttle_probability = 1
+        with self.fuzzyAssertRaisesError(BadAmazon, error_code="Throttling"):
+            AmazonRoles(self.amazon).create_role("thing", "{}")
+
+    it "shows the document amazon complained about on stderr":
+        self.backend.throttle_probability = 1
+        stdout, stderr = StringIO(), StringIO()
+        with mock.patch("sys.stdout", stdout), mock.patch("sys.stderr", stderr):
+            with self.fuzzyAssertRaisesError(BadAmazon, error_code="Throttling"):
+                AmazonRoles(self.amazon).create_role("thing", '{"Statement": []}')
+
+        assert "=" * 80 not in stdout.getvalue(), stdout.getvalue()
+        lines = stderr.getvalue().split("\n")
+        self.assertEqual(lines[:2], ["=" * 80, "thing trust document"])
+        assert '"Statement": []' in stderr.getvalue(), stderr.getvalue()
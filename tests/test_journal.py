@@ -0,0 +1,79 @@
+# coding: spec
+
+from iam_syncr.journal import Journal, definition_digest, item_digest
+
+from tests.helpers import a_directory
+
+import json
+import six
+import os
+
+from tests.helpers import TestCase
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+describe TestCase, "Journal":
+    it "remembers what completed successfully when resuming":
+        with a_directory() as directory:
+            location = os.path.join(directory, "journal")
+            journal = Journal(location)
+            journal.record(12, "roles", "one", "d1", "ok")
+            journal.record(12, "roles", "two", "d2", "failed")
+            journal.record(12, "buckets", "three", "d3", "ok")
+            journal.close()
+
+            resumed = Journal(location, resume=True)
+            self.assertTrue(resumed.is_complete(12, "roles", "one", "d1"))
+            self.assertFalse(resumed.is_complete(12, "roles", "one", "changed"))
+            self.assertFalse(resumed.is_complete(12, "roles", "two", "d2"))
+            self.assertTrue(resumed.is_complete("12", "buckets", "three", "d3"))
+            self.assertFalse(resumed.is_complete(13, "buckets", "three", "d3"))
+            resumed.close()
+
+    it "starts again if not resuming and ignores half written lines":
+        with a_directory() as directory:
+            location = os.path.join(directory, "journal")
+            with open(location, "w") as fle:
+                fle.write(json.dumps({"account": "12", "type": "roles", "name": "one", "digest": "d1", "outcome": "ok"}))
+                fle.write('\n{"account": "12", "ty')
+
+            resumed = Journal(location, resume=True)
+            self.assertTrue(resumed.is_complete(12, "roles", "one", "d1"))
+            resumed.close()
+
+            fresh = Journal(location)
+            self.assertFalse(fresh.is_complete(12, "roles", "one", "d1"))
+            fresh.close()
+            self.assertEqual(open(location).read(), "")
+
+    it "only fsyncs in batches":
+        with a_directory() as directory:
+            fake_fsync = mock.Mock(name="fsync")
+            with mock.patch("os.fsync", fake_fsync):
+                journal = Journal(os.path.join(directory, "journal"), batch_size=3, interval=1000)
+                for num in range(7):
+                    journal.record(12, "roles", str(num), "d", "ok")
+                self.assertEqual(len(fake_fsync.mock_calls), 2)
+                journal.close()
+                self.assertEqual(len(fake_fsync.mock_calls), 3)
+
+describe TestCase, "Item digests":
+    it "changes when the definition, template or compiled documents change":
+        thing = mock.Mock(name="thing", spec=["name", "definition", "templates", "compiled"])
+        thing.name = "one"
+        thing.definition = {"use": "base", "description": "hi"}
+        thing.templates = {"base": {"make_instance_profile": True}}
+        thing.compiled.return_value = {"permission_document": "{}"}
+
+        first = item_digest("roles", thing, definition_digest(thing))
+        self.assertEqual(item_digest("roles", thing, definition_digest(thing)), first)
+
+        thing.templates["base"]["make_instance_profile"] = False
+        second = item_digest("roles", thing, definition_digest(thing))
+        self.assertNotEqual(second, first)
+
+        thing.compiled.return_value = {"permission_document": '{"Statement": []}'}
+        self.assertNotEqual(item_digest("roles", thing, definition_digest(thing)), second)
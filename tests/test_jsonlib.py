@@ -0,0 +1,49 @@
+# coding: spec
+
+from iam_syncr import jsonlib
+
+import json
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from tests.helpers import TestCase
+
+describe TestCase, "jsonlib":
+    before_each:
+        jsonlib.backend.use()
+
+    it "makes the same canonical json whichever backend it uses":
+        document = {"Version": "2012-10-17", "Statement": [{"Resource": "arn:aws:s3:::bucket/*", "Action": ["s3:Get"], "Condition": {"StringEquals": {"aws:UserAgent": u"caf\u00e9 \"quoted\"\n"}}}]}
+        expected = u'{"Statement":[{"Action":["s3:Get"],"Condition":{"StringEquals":{"aws:UserAgent":"caf\u00e9 \\"quoted\\"\\n"}},"Resource":"arn:aws:s3:::bucket/*"}],"Version":"2012-10-17"}'
+        for name, found in jsonlib.BACKENDS.items():
+            if found:
+                jsonlib.backend.use(name)
+                self.assertEqual(jsonlib.dumps(document), expected)
+                self.assertEqual(jsonlib.loads(expected), document)
+        jsonlib.backend.use()
+
+    it "writes floats, big numbers and keys that aren't strings like the stdlib whichever backend it uses":
+        documents = [
+              ({"small": 1e-05, "big": 1e100, "exact": 1e16, "half": [0.5, 3]}, '{"big":1e+100,"exact":1e+16,"half":[0.5,3],"small":1e-05}')
+            , ({"inf": float("inf"), "nan": float("nan")}, '{"inf":Infinity,"nan":NaN}')
+            , (1e16, '1e+16')
+            , ({"big": 2 ** 70, "small": -2 ** 70}, '{"big":1180591620717411303424,"small":-1180591620717411303424}')
+            , ({1: "a", 10: "b", 2: "c"}, '{"1":"a","2":"c","10":"b"}')
+            , ({"nested": {True: None}}, '{"nested":{"true":null}}')
+            , ({"ip": "10.0.0.1/32", "arn": "arn:aws:iam::123456789012:role/x", "count": [1, -2]}, '{"arn":"arn:aws:iam::123456789012:role/x","count":[1,-2],"ip":"10.0.0.1/32"}')
+            ]
+        for name, found in jsonlib.BACKENDS.items():
+            if found:
+                jsonlib.backend.use(name)
+                for document, expected in documents:
+                    self.assertEqual((name, jsonlib.dumps(document)), (name, expected))
+        jsonlib.backend.use()
+
+    it "uses the fastest backend if the one asked for isn't there":
+        jsonlib.backend.use("not-a-backend")
+        self.assertIn(jsonlib.backend.name, ("orjson", "ujson", "json"))
+        self.assertIs(jsonlib.BACKENDS[jsonlib.backend.name] is not None, True)
+
+    it "only pretty prints things that are json":
+        self.assertEqual(jsonlib.pretty('{"b":1,"a":[2]}'), json.dumps({"a": [2], "b": 1}, indent=2, sort_keys=True, separators=(",", ": ")))
+        self.assertEqual(jsonlib.pretty("not json"), "not json")
+        self.assertEqual(jsonlib.pretty(None), None)
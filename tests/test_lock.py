@@ -0,0 +1,72 @@
+# coding: spec
+
+from iam_syncr import lock, VERSION
+
+from tests.helpers import a_directory
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+import json
+import six
+import os
+
+from tests.helpers import TestCase
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+describe TestCase, "Lock files":
+    describe "Sources digest":
+        it "changes when the configuration or accounts change":
+            with a_directory() as directory:
+                conf = os.path.join(directory, "roles.yaml")
+                with open(conf, 'w') as fle:
+                    fle.write("roles: {}")
+
+                first = lock.sources_digest([conf], {"dev": 12}, folder=directory)
+                self.assertEqual(lock.sources_digest([conf], {"dev": 12}, folder=directory), first)
+                self.assertNotEqual(lock.sources_digest([conf], {"dev": 13}, folder=directory), first)
+
+                with open(conf, 'w') as fle:
+                    fle.write("roles: {one: {}}")
+                self.assertNotEqual(lock.sources_digest([conf], {"dev": 12}, folder=directory), first)
+
+        it "doesn't care about the order of the locations or where the folder is":
+            with a_directory() as directory:
+                with a_directory() as directory2:
+                    for folder in (directory, directory2):
+                        for name in ("one.yaml", "two.yaml"):
+                            with open(os.path.join(folder, name), 'w') as fle:
+                                fle.write(name)
+
+                    first = lock.sources_digest([os.path.join(directory, "one.yaml"), os.path.join(directory, "two.yaml")], {}, folder=directory)
+                    second = lock.sources_digest([os.path.join(directory2, "two.yaml"), os.path.join(directory2, "one.yaml")], {}, folder=directory2)
+                    self.assertEqual(first, second)
+
+    describe "Making and reading a lock":
+        before_each:
+            self.amazon = mock.Mock(name="amazon", account_id=123, account_name="dev")
+            self.compiled = {"roles": {"one": {"trust_document": None, "policies": {"syncr_policy_one": '{"Statement": [], "Version": "2012-10-17"}'}}}}
+
+        it "turns documents into objects and is deterministic":
+            made = lock.make_lock(self.amazon, self.compiled, "digest")
+            self.assertEqual(made["compiled"]["roles"]["one"]["policies"]["syncr_policy_one"], {"Statement": [], "Version": "2012-10-17"})
+            self.assertEqual(made["account_id"], "123")
+            self.assertEqual(lock.dump_lock(made), lock.dump_lock(json.loads(lock.dump_lock(made))))
+
+        it "knows when the lock is current":
+            with a_directory() as directory:
+                location = os.path.join(directory, "dev.lock.json")
+                self.assertFalse(lock.lock_is_current(location, "digest"))
+
+                lock.write_lock(location, lock.make_lock(self.amazon, self.compiled, "digest"))
+                self.assertTrue(lock.lock_is_current(location, "digest"))
+                self.assertFalse(lock.lock_is_current(location, "other"))
+
+        it "ignores locks that aren't json":
+            with a_directory() as directory:
+                location = os.path.join(directory, "dev.lock.json")
+                with open(location, 'w') as fle:
+                    fle.write("{{{")
+                self.assertIs(lock.read_lock(location), None)
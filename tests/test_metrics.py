@@ -0,0 +1,106 @@
+# coding: spec
+
+from iam_syncr.amazon.limits import Limits, parse_cap
+from iam_syncr.amazon.calls import AmazonCalls
+from iam_syncr.metrics import Metrics, Histogram
+
+import threading
+import boto
+import time
+import six
+
+from tests.helpers import TestCase
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+describe TestCase, "Histogram":
+    it "puts observations in the first bucket they fit in and reports them cumulatively":
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), ("+Inf", 4)])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.total, 3.65)
+
+describe TestCase, "Metrics":
+    it "records calls, errors and retries per operation":
+        metrics = Metrics()
+        metrics.record_call("dev", "iam", "global", "get_role", 0.02)
+        metrics.record_call("dev", "iam", "global", "get_role", 0.3, error_code="Throttling")
+        metrics.record_retry("dev", "iam", "global", "get_role")
+        metrics.record_call("dev", "kms", "us-east-1", "describe_key", 0.01)
+
+        found = metrics.as_dict()["operations"]
+        self.assertEqual([(op["service"], op["operation"], op["calls"]) for op in found], [("iam", "get_role", 2), ("kms", "describe_key", 1)])
+        self.assertEqual(found[0]["errors"], {"Throttling": 1})
+        self.assertEqual(found[0]["retries"], 1)
+        self.assertEqual(metrics.total_calls, 3)
+
+    it "can be written for prometheus":
+        metrics = Metrics()
+        metrics.record_call("dev", "iam", "global", "get_role", 0.02, error_code="Throttling")
+        text = metrics.as_prometheus()
+
+        labels = 'account="dev",service="iam",region="global",operation="get_role"'
+        self.assertIn('iam_syncr_api_calls_total{{{0}}} 1'.format(labels), text)
+        self.assertIn('iam_syncr_api_errors_total{{{0},code="Throttling"}} 1'.format(labels), text)
+        self.assertIn('iam_syncr_api_call_duration_seconds_bucket{{{0},le="0.025"}} 1'.format(labels), text)
+        self.assertIn('iam_syncr_api_call_duration_seconds_bucket{{{0},le="+Inf"}} 1'.format(labels), text)
+        self.assertIn('iam_syncr_api_call_duration_seconds_count{{{0}}} 1'.format(labels), text)
+
+describe TestCase, "Limits":
+    it "uses the cap for the region before the cap for the service":
+        limits = Limits({"kms": 2, "kms:us-east-1": 8, "s3": 0})
+        self.assertEqual(limits.cap_for("kms", "us-east-1"), 8)
+        self.assertEqual(limits.cap_for("kms", "ap-southeast-2"), 2)
+        self.assertIs(limits.semaphore_for("s3", "global"), None)
+        self.assertEqual(parse_cap("kms:us-east-1=8"), ("kms:us-east-1", 8))
+        with self.fuzzyAssertRaisesError(ValueError):
+            parse_cap("iam")
+
+    it "makes calls to a service wait for a slot without holding up other services":
+        running = []
+        most = {"iam": 0, "s3": 0}
+        lock = threading.Lock()
+        def call(service):
+            with lock:
+                running.append(service)
+                most[service] = max(most[service], running.count(service))
+            time.sleep(0.05)
+            with lock:
+                running.remove(service)
+
+        calls = AmazonCalls("dev", limits=Limits({"iam": 1, "s3": 4}))
+        threads = [threading.Thread(target=calls.call, args=(service, "global", "thing", call, service)) for service in ["iam"] * 3 + ["s3"] * 3]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(most, {"iam": 1, "s3": 3})
+        queues = dict((queue["service"], queue) for queue in calls.metrics.as_dict()["queues"])
+        self.assertEqual(queues["iam"]["wait_seconds"]["count"], 3)
+        self.assertGreaterEqual(queues["iam"]["max_queue_depth"], 1)
+        self.assertEqual(queues["s3"]["max_queue_depth"], 0)
+
+describe TestCase, "AmazonCalls":
+    it "records every method called on a wrapped connection":
+        connection = mock.Mock(name="connection")
+        connection.get_role.return_value = {"role": 1}
+        connection.get_user.side_effect = boto.exception.BotoServerError(404, "Not Found", body={"Error": {"Code": "NoSuchEntity"}})
+
+        calls = AmazonCalls("dev")
+        wrapped = calls.wrap(connection, "iam", "global")
+        self.assertEqual(wrapped.get_role("one"), {"role": 1})
+        connection.get_role.assert_called_once_with("one")
+
+        with self.fuzzyAssertRaisesError(boto.exception.BotoServerError):
+            wrapped.get_user("two")
+
+        found = dict((op["operation"], op) for op in calls.metrics.as_dict()["operations"])
+        self.assertEqual(found["get_role"]["calls"], 1)
+        self.assertEqual(found["get_user"]["errors"], {"NoSuchEntity": 1})
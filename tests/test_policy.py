@@ -0,0 +1,56 @@
+# coding: spec
+
+from iam_syncr.policy import Statement, Document, InternPool, documents
+
+import json
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from tests.helpers import TestCase
+
+describe TestCase, "Statement":
+    it "is the same as the dictionary it was made from":
+        statement = Statement({"Effect": "Allow", "Action": ["s3:Get"], "Resource": ["b", "a"]})
+        self.assertEqual(statement, {"Effect": "Allow", "Action": "s3:Get", "Resource": ["a", "b"]})
+        self.assertEqual(dict(statement), {"Effect": "Allow", "Action": "s3:Get", "Resource": ["a", "b"]})
+
+    it "doesn't care about the order of actions, resources or principals":
+        first = Statement({"Effect": "Allow", "Action": ["s3:Put", "s3:Get"], "Principal": {"AWS": ["two", "one"]}})
+        second = Statement({"Principal": {"AWS": ["one", "two"]}, "Action": ["s3:Get", "s3:Put"], "Effect": "Allow"})
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertEqual(len(set([first, second])), 1)
+
+    it "can't be changed":
+        statement = Statement({"Effect": "Allow"})
+        with self.fuzzyAssertRaisesError(AttributeError, "Statements can't be changed"):
+            statement.Effect = "Deny"
+        with self.fuzzyAssertRaisesError(TypeError):
+            statement["Effect"] = "Deny"
+
+describe TestCase, "Document":
+    before_each:
+        documents.clear()
+
+    it "only parses json it has already dumped once":
+        document = Document([{"Effect": "Allow", "Action": "s3:Get", "Resource": "*"}])
+        self.assertIs(Document.loads(document.dumps()), document)
+
+    it "is equal to the same document written differently":
+        text = json.dumps({"Statement": [{"Action": ["sqs:Send", "sns:Publish"], "Effect": "Allow"}], "Version": "2012-10-17"})
+        loaded = Document.loads(text)
+        self.assertEqual(loaded, Document([{"Effect": "Allow", "Action": ["sns:Publish", "sqs:Send"]}]))
+        self.assertIs(Document.loads(text), loaded)
+
+describe TestCase, "Interning":
+    it "keeps one copy of statements that documents share":
+        first = Document([{"Effect": "Allow", "Action": ["logs:Put", "logs:Create"], "Resource": "*"}])
+        second = Document([{"Resource": "*", "Action": ["logs:Create", "logs:Put"], "Effect": "Allow"}, {"Effect": "Deny", "Action": "s3:Get"}])
+        self.assertIs(first.statements[0], second.statements[0])
+        self.assertIs(first.statements[0].dumps(), second.statements[0].dumps())
+
+    it "knows how much it saved":
+        pool = InternPool()
+        self.assertEqual(pool.ratio, 1.0)
+        for thing in ("one", "one", "one", "two"):
+            pool.intern(thing)
+        self.assertEqual((pool.seen, pool.unique, pool.ratio), (4, 2, 2.0))
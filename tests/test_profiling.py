@@ -0,0 +1,72 @@
+# coding: spec
+
+from iam_syncr.profiling import Profiler
+
+from tests.helpers import a_directory
+
+import threading
+import six
+import os
+
+from tests.helpers import TestCase
+
+describe TestCase, "Profiler":
+    it "does nothing until started":
+        profiler = Profiler()
+        with profiler.phase("parse"):
+            pass
+        self.assertEqual(profiler.phases, [])
+        self.assertEqual(profiler.summary(), "")
+
+    it "writes a pstats per phase and summarises it":
+        with a_directory() as directory:
+            profiler = Profiler()
+            profiler.start(directory, cpu=True)
+            with profiler.phase("parse", account="dev"):
+                sorted(range(1000), key=lambda num: -num)
+            profiler.stop()
+
+            self.assertTrue(os.path.exists(os.path.join(directory, "dev.parse.pstats")))
+            self.assertFalse(os.path.exists(os.path.join(directory, "dev.parse.memory.txt")))
+            summary = profiler.summary()
+            self.assertTrue(summary.startswith("dev.parse\n"))
+            self.assertIn("calls", summary)
+
+    it "profiles one phase at a time when phases run in different threads":
+        with a_directory() as directory:
+            profiler = Profiler()
+            profiler.start(directory, cpu=True)
+
+            inside = []
+            overlapped = []
+            def run(num):
+                with profiler.phase("sync", account="account{0}".format(num)):
+                    inside.append(num)
+                    if len(inside) > 1:
+                        overlapped.append(num)
+                    sorted(range(20000), key=lambda n: -n)
+                    inside.remove(num)
+
+            threads = [threading.Thread(target=run, args=(num, )) for num in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            profiler.stop()
+
+            self.assertEqual(overlapped, [])
+            self.assertEqual(sorted(phase["label"] for phase in profiler.phases), ["account{0}.sync".format(num) for num in range(4)])
+
+    if not six.PY2:
+        it "writes the top allocations per phase":
+            with a_directory() as directory:
+                profiler = Profiler()
+                profiler.start(directory, cpu=False, memory=True)
+                with profiler.phase("combine"):
+                    kept = [str(num) * 10 for num in range(10000)]
+                profiler.stop()
+
+                with open(os.path.join(directory, "combine.memory.txt")) as fle:
+                    self.assertIn("test_profiling.py", fle.read())
+                self.assertIn("bytes", profiler.summary())
+                self.assertEqual(len(kept), 10000)
@@ -0,0 +1,75 @@
+# coding: spec
+
+from iam_syncr.amazon.propagation import Propagation, principals_in
+from iam_syncr.amazon.fake import iam_error
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+import boto
+import json
+import six
+
+from tests.helpers import TestCase
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+ROLE = "arn:aws:iam::123456789012:role/new"
+
+describe TestCase, "Propagation":
+    before_each:
+        self.slept = []
+        self.metrics = mock.Mock(name="metrics")
+        self.propagation = Propagation("dev", self.metrics, first=0.5, most=8, give_up=60, sleep=self.slept.append)
+        self.propagation.made_role(ROLE)
+
+    def failing(self, *errors):
+        """Return a func that raises these errors in turn and then says done"""
+        errors = list(errors)
+        def func():
+            if errors:
+                raise errors.pop(0)
+            return "done"
+        return func
+
+    def document(self, principal=None, resource="*"):
+        statement = {"Effect": "Allow", "Action": "s3:GetObject", "Resource": resource}
+        if principal is not None:
+            statement["Principal"] = principal
+        return json.dumps({"Statement": [statement]})
+
+    it "tries again while amazon says a new role in the principal is invalid":
+        error = iam_error(400, "MalformedPolicyDocument", "Invalid principal in policy: \"AWS\":\"{0}\"".format(ROLE))
+        func = self.failing(error, error)
+        self.assertEqual(self.propagation.call("iam", "global", "update_assume_role_policy", func, document=self.document({"AWS": ROLE})), "done")
+        self.assertEqual(self.slept, [0.5, 1])
+
+    it "doesn't try again when the policy is wrong for any other reason":
+        error = iam_error(400, "MalformedPolicyDocument", "Policy document should not specify a principal.")
+        with self.fuzzyAssertRaisesError(boto.exception.BotoServerError, error_code="MalformedPolicyDocument"):
+            self.propagation.call("iam", "global", "put_role_policy", self.failing(error), document=self.document({"AWS": [ROLE]}))
+        self.assertEqual(self.slept, [])
+
+    it "tries again when a call needs a new role that amazon doesn't know about yet":
+        func = self.failing(iam_error(404, "NoSuchEntity", "The role with name new cannot be found."))
+        self.assertEqual(self.propagation.call("iam", "global", "put_role_policy", func, arns=[ROLE]), "done")
+        self.assertEqual(self.slept, [0.5])
+
+    it "only waits for new roles that are principals of the document":
+        self.assertEqual(list(self.propagation.new_roles(document=self.document({"AWS": ROLE}))), [ROLE])
+        self.assertEqual(list(self.propagation.new_roles(document=self.document(ROLE))), [ROLE])
+        self.assertEqual(self.propagation.new_roles(document=self.document({"Service": "ec2.amazonaws.com"}, resource=ROLE)), {})
+        self.assertEqual(self.propagation.new_roles(document="not json"), {})
+
+describe TestCase, "principals_in":
+    it "finds the AWS principals of every statement":
+        document = {"Statement": [
+              {"Principal": {"AWS": ["one", "two"], "Service": "ec2.amazonaws.com"}}
+            , {"Principal": "*"}
+            , {"Principal": {"Federated": "saml"}}
+            , {"Action": "s3:*"}
+            ]}
+        self.assertEqual(principals_in(json.dumps(document)), ["one", "two", "*"])
+        self.assertEqual(principals_in(json.dumps({"Statement": {"Principal": {"AWS": "three"}}})), ["three"])
+        self.assertEqual(principals_in("[]"), [])
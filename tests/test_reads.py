@@ -0,0 +1,59 @@
+# coding: spec
+
+from iam_syncr.amazon.reads import ReadCache
+
+import threading
+import time
+
+from tests.helpers import TestCase
+
+describe TestCase, "ReadCache":
+    it "only reads a key once":
+        called = []
+        reads = ReadCache()
+        read = lambda: called.append(1) or "thing"
+        self.assertEqual(reads.get(("role", "one"), read), "thing")
+        self.assertEqual(reads.get(("role", "one"), read), "thing")
+        self.assertEqual(called, [1])
+        self.assertEqual((reads.misses, reads.hits), (1, 1))
+
+    it "shares a read that is happening with everyone who asks at the same time":
+        called = []
+        reads = ReadCache()
+        def read():
+            called.append(1)
+            time.sleep(0.05)
+            return "thing"
+
+        got = []
+        threads = [threading.Thread(target=lambda: got.append(reads.get("key", read))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(called, [1])
+        self.assertEqual(got, ["thing"] * 5)
+        self.assertEqual(reads.misses + reads.shared + reads.hits, 5)
+
+    it "reads again after a key is forgotten":
+        reads = ReadCache()
+        self.assertEqual(reads.get("key", lambda: 1), 1)
+        reads.forget("key")
+        self.assertEqual(reads.get("key", lambda: 2), 2)
+
+    it "doesn't remember a read that was forgotten while it happened":
+        reads = ReadCache()
+        def read():
+            reads.forget("key")
+            return "old"
+        self.assertEqual(reads.get("key", read), "old")
+        self.assertEqual(reads.get("key", lambda: "new"), "new")
+
+    it "doesn't remember errors":
+        reads = ReadCache()
+        def fail():
+            raise ValueError("nope")
+        with self.fuzzyAssertRaisesError(ValueError, "nope"):
+            reads.get("key", fail)
+        self.assertEqual(reads.get("key", lambda: "thing"), "thing")
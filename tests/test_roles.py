@@ -225,6 +225,25 @@ describe TestCase, "Role":
                     make_instance_profile.assert_called_once_with(self.name)
                     self.assertEqual(called, [1, 2])
 
+            it "uses what was prefetched instead of asking amazon again":
+                role_info = mock.Mock(name="role_info")
+                modify_role = mock.Mock(name="modify_role")
+                make_instance_profile = mock.Mock(name="make_instance_profile")
+                current = {self.policy_name: self.permission_document}
+
+                with mock.patch.multiple(AmazonRoles, role_info=role_info, modify_role=modify_role, make_instance_profile=make_instance_profile):
+                    fake_make_trust_document = mock.Mock(name="make_trust_document")
+                    fake_make_trust_document.return_value = self.trust_document
+
+                    fake_make_permission_document = mock.Mock(name="make_permission_document")
+                    fake_make_permission_document.return_value = self.permission_document
+
+                    with mock.patch.multiple(self.role, make_trust_document=fake_make_trust_document, make_permission_document=fake_make_permission_document):
+                        self.role.resolve(remote={"role_info": "info", "policies": current})
+
+                    self.assertEqual(len(role_info.mock_calls), 0)
+                    modify_role.assert_called_once_with("info", self.name, self.trust_document, policies={self.policy_name: self.permission_document}, current_policies=current)
+
     describe "Making a trust document":
         before_each:
             self.role = Role(self.name, self.definition, self.amazon)
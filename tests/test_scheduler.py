@@ -0,0 +1,145 @@
+# coding: spec
+
+from iam_syncr.scheduler import Graph, HAS_ASYNCIO
+from iam_syncr.errors import SyncrError
+
+import time
+import six
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+from tests.helpers import TestCase
+
+class Thing(object):
+    def __init__(self, name, provides=None, removes=None, requires=None):
+        self.name = name
+        self._provides = provides or []
+        self._removes = removes or []
+        self._requires = requires or []
+
+    def provides(self):
+        return self._provides
+
+    def removes(self):
+        return self._removes
+
+    def requires(self):
+        return self._requires
+
+describe TestCase, "Graph":
+    engines = ["threads", "asyncio"] if HAS_ASYNCIO else ["threads"]
+
+    def graph(self, things, called, delays=None):
+        graph = Graph()
+        for priority, typ, thing in things:
+            def func(thing=thing):
+                time.sleep((delays or {}).get(thing.name, 0))
+                called.append(thing.name)
+            graph.add(typ, thing, func, priority=priority)
+        return graph.link()
+
+    it "runs things after what they require and creates after removals":
+        called = []
+        things = [
+              (30, "keys", Thing("key", requires=[("role", "reader")]))
+            , (20, "roles", Thing("reader", provides=[("role", "reader")]))
+            , (40, "buckets", Thing("bucket"))
+            , (10, "remove_roles", Thing("old", removes=[("role", "reader")]))
+            ]
+        self.graph(things, called).run()
+        self.assertEqual(called, ["old", "reader", "key", "bucket"])
+
+    it "lets things that don't depend on a slow one go ahead":
+        called = []
+        things = [
+              (20, "roles", Thing("slow", provides=[("role", "slow")]))
+            , (20, "roles", Thing("fast", provides=[("role", "fast")]))
+            , (30, "keys", Thing("needs_slow", requires=[("role", "slow")]))
+            , (30, "keys", Thing("needs_fast", requires=[("role", "fast")]))
+            ]
+        self.graph(things, called, delays={"slow": 0.2}).run(workers=2)
+        self.assertLess(called.index("needs_fast"), called.index("slow"))
+        self.assertGreater(called.index("needs_slow"), called.index("slow"))
+
+    it "goes ahead anyway when there is a cycle":
+        called = []
+        things = [
+              (20, "roles", Thing("one", provides=[("role", "one")], requires=[("role", "two")]))
+            , (20, "roles", Thing("two", provides=[("role", "two")], requires=[("role", "one")]))
+            ]
+        self.graph(things, called).run(workers=2)
+        self.assertEqual(called, ["one", "two"])
+
+    it "stops starting things after something fails":
+        for engine in self.engines:
+            called = []
+            graph = Graph()
+            def fail():
+                raise ValueError("nope")
+            graph.add("roles", Thing("bad", provides=[("role", "bad")]), fail)
+            graph.add("keys", Thing("key", requires=[("role", "bad")]), lambda: called.append("key"))
+
+            with self.fuzzyAssertRaisesError(ValueError, "nope"):
+                graph.link().run(workers=2, engine=engine)
+            self.assertEqual(called, [])
+
+    it "runs the same way with either engine":
+        for engine in self.engines:
+            called = []
+            things = [
+                  (30, "keys", Thing("key", requires=[("role", "slow")]))
+                , (20, "roles", Thing("slow", provides=[("role", "slow")]))
+                , (20, "roles", Thing("fast"))
+                , (40, "buckets", Thing("bucket"))
+                ]
+            self.graph(things, called, delays={"slow": 0.1}).run(workers=3, engine=engine)
+            self.assertEqual(called[-2:], ["slow", "key"])
+            self.assertEqual(sorted(called), ["bucket", "fast", "key", "slow"])
+
+    it "complains about the asyncio engine on a python that can't compile it":
+        called = []
+        graph = self.graph([(10, "roles", Thing("role"))], called)
+        with mock.patch("iam_syncr.scheduler.HAS_ASYNCIO", False):
+            with self.fuzzyAssertRaisesError(SyncrError, "The asyncio engine needs python 3.5 or newer"):
+                graph.run(engine="asyncio")
+        self.assertEqual(called, [])
+
+    it "hands things what was prefetched for them":
+        for engine in self.engines:
+            got = {}
+            prefetched = []
+            graph = Graph()
+            for name in ("one", "two", "three"):
+                def prefetch(name=name):
+                    prefetched.append(name)
+                    return {"name": name}
+                def func(remote=None, name=name):
+                    got[name] = remote
+                graph.add("roles", Thing(name), func, prefetch=prefetch)
+
+            graph.link().run(workers=1, engine=engine, prefetch=3)
+            self.assertEqual(sorted(prefetched), ["one", "three", "two"])
+            self.assertEqual(got, {"one": {"name": "one"}, "two": {"name": "two"}, "three": {"name": "three"}})
+
+    it "doesn't prefetch until what a thing requires is done":
+        called = []
+        graph = Graph()
+        graph.add("roles", Thing("role", provides=[("role", "role")]), lambda: time.sleep(0.05) or called.append("role"))
+        graph.add("keys", Thing("key", requires=[("role", "role")]), lambda remote=None: called.append("key"), prefetch=lambda: called.append("prefetch"))
+
+        graph.link().run(workers=1, prefetch=1)
+        self.assertEqual(called[0], "role")
+        self.assertEqual(called[-1], "key")
+
+    it "gives None when the prefetch fails or isn't used":
+        got = []
+        graph = Graph()
+        def prefetch():
+            raise ValueError("nope")
+        graph.add("roles", Thing("role"), lambda remote=None: got.append(remote), prefetch=prefetch)
+        graph.link().run(workers=1, prefetch=1)
+        graph.link().run(workers=1, prefetch=0)
+        self.assertEqual(got, [None, None])
@@ -0,0 +1,54 @@
+# coding: spec
+
+from iam_syncr.shards import Shard, shard_for, merge_results
+from iam_syncr.errors import SyncrError
+
+from tests.helpers import TestCase
+
+describe TestCase, "Shards":
+    it "can be made from a string":
+        shard = Shard.from_string("1/4")
+        self.assertEqual((shard.index, shard.count), (1, 4))
+        self.assertFalse(shard.is_first)
+        self.assertTrue(Shard.from_string("0/4").is_first)
+
+    it "complains about nonsense":
+        for value in ("", "1", "a/b", "4/4", "-1/4", "0/0", "1/2/3"):
+            with self.fuzzyAssertRaisesError(SyncrError):
+                Shard.from_string(value)
+
+    it "puts every name in exactly one shard and always the same one":
+        names = ["role{0}".format(num) for num in range(200)]
+        shards = [Shard(index, 5) for index in range(5)]
+        for name in names:
+            self.assertEqual([shard.index for shard in shards if shard.includes(name)], [shard_for(name, 5)])
+        self.assertEqual(len(set(shard_for(name, 5) for name in names)), 5)
+
+describe TestCase, "Merging shard results":
+    def result(self, index, count, accounts):
+        return {"shard": {"index": index, "count": count}, "accounts": accounts}
+
+    it "combines the items and changes for each account":
+        merged = merge_results(
+            [ self.result(1, 2, {"dev": {"account_name": "dev", "account_id": "12", "ok": True, "error": None, "changes": True, "items": {"roles": ["b"]}}})
+            , self.result(0, 2, {"dev": {"account_name": "dev", "account_id": "12", "ok": True, "error": None, "changes": False, "items": {"roles": ["a"], "buckets": ["c"]}}})
+            ]
+            )
+
+        self.assertTrue(merged["complete"])
+        self.assertEqual(merged["accounts"]["dev"]["items"], {"roles": ["a", "b"], "buckets": ["c"]})
+        self.assertTrue(merged["accounts"]["dev"]["changes"])
+        self.assertTrue(merged["accounts"]["dev"]["ok"])
+
+    it "records errors and missing shards":
+        merged = merge_results([self.result(2, 3, {"dev": {"account_name": "dev", "ok": False, "error": "BadAmazon |:| nope", "changes": False, "items": {}}})])
+        self.assertFalse(merged["complete"])
+        self.assertEqual(merged["missing"], [0, 1])
+        self.assertEqual(merged["accounts"]["dev"]["errors"], [{"shard": 2, "error": "BadAmazon |:| nope"}])
+
+    it "complains about mismatched or duplicated shards":
+        with self.fuzzyAssertRaisesError(SyncrError, "Shard results come from different splits"):
+            merge_results([self.result(0, 2, {}), self.result(1, 3, {})])
+
+        with self.fuzzyAssertRaisesError(SyncrError, "Got the same shard more than once"):
+            merge_results([self.result(0, 2, {}), self.result(0, 2, {})])
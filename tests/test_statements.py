@@ -303,6 +303,14 @@ describe TestCase, "Statements":
                 , ["arn:aws:iam::9003:role/bob", "arn:aws:iam::9003:role/jane", "arn:aws:iam::9004:role/bob", "arn:aws:iam::9004:role/jane"]
                 )
 
+    describe "finding the roles we reference":
+        it "finds roles in our account that are principals":
+            statements = list(self.statements.expand_trust_statement({"iam": ["role/one", "role/path/two"]}, allow=True))
+            statements.extend(self.statements.make_permission_statements({"principal": {"iam": "role/other", "account": "prod"}, "action": "s3:Get", "resource": "*"}, allow=True))
+            statements.append({"Effect": "Allow", "Principal": {"AWS": "arn:aws:iam::123:role/elsewhere"}})
+            found = self.statements.roles_referenced(statements, arns=["arn:aws:iam::{0}:role/grantee".format(self.account_id), None])
+            self.assertEqual(found, set(["one", "path/two", "other", "grantee"]))
+
     describe "making a document":
         it "complains if given something that isn't a list":
             for statements in (0, 1, None, True, False, {}, {1:2}, lambda: 1, mock.Mock(name="blah"), "blah"):
@@ -316,9 +324,9 @@ describe TestCase, "Statements":
             fake_dumps = mock.Mock(name="dumps")
             fake_dumps.return_value = dumped
 
-            with mock.patch("json.dumps", fake_dumps):
+            with mock.patch("iam_syncr.jsonlib.dumps", fake_dumps):
                 self.assertIs(self.statements.make_document(statements), dumped)
-            fake_dumps.assert_called_once_with({"Version": "2012-10-17", "Statement":statements}, indent=2)
+            fake_dumps.assert_called_once_with({"Version": "2012-10-17", "Statement":statements})
 
         it "raises invalid json as an InvalidDocument exception":
             with self.fuzzyAssertRaisesError(InvalidDocument, "Document wasn't valid json"):
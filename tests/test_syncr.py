@@ -1,8 +1,11 @@
 # coding: spec
 
-from iam_syncr.errors import SyncrError, BadConfiguration, DuplicateItem, ConflictingConfiguration, InvalidConfiguration
+from iam_syncr.errors import SyncrError, CircuitOpen, BadConfiguration, DuplicateItem, ConflictingConfiguration, InvalidConfiguration
+from iam_syncr.amazon.changes import Change, ChangeRecorder
+from iam_syncr.amazon.fake import FakeAmazonBackend
 from iam_syncr.amazon.base import Amazon
-from iam_syncr.syncer import Sync
+from iam_syncr.shards import Shard, shard_for
+from iam_syncr.syncer import Sync, Template
 
 from noseOfYeti.tokeniser.support import noy_sup_setUp
 import six
@@ -44,13 +47,14 @@ describe TestCase, "Sync":
 
             fake_create_things = mock.Mock(name="create_things")
             fake_create_things.return_value = things
-            fake_setup_and_resolve = mock.Mock(name="setup_and_resolve")
+            fake_setup_things = mock.Mock(name="setup_things")
+            fake_setup_things.return_value = []
 
-            with mock.patch.multiple(self.sync, create_things=fake_create_things, setup_and_resolve=fake_setup_and_resolve):
+            with mock.patch.multiple(self.sync, create_things=fake_create_things, setup_things=fake_setup_things):
                 self.sync.sync(combined)
 
             fake_create_things.assert_called_once_with(roles, "roles")
-            fake_setup_and_resolve.called_once_with(things)
+            fake_setup_things.assert_called_once_with(things, "roles")
 
     describe "Registering a type":
         it "just adds it to types":
@@ -136,6 +140,166 @@ describe TestCase, "Sync":
                   ]
                 )
 
+    describe "Sharding":
+        before_each:
+            self.called = []
+
+        def make_kls(self, typ):
+            def instantiate(thing, val, amazon, templates):
+                nxt = mock.Mock(name=thing, spec=["name", "setup", "resolve", "definition"])
+                nxt.name = thing
+                nxt.definition = val
+                nxt.setup.side_effect = lambda: self.called.append(("setup", typ, thing))
+                nxt.resolve.side_effect = lambda: self.called.append(("resolve", typ, thing))
+                return nxt
+            return mock.Mock(name=typ, side_effect=instantiate)
+
+        it "only sets up and resolves the things in the shard":
+            names = ["thing{0}".format(num) for num in range(20)]
+            for index in (0, 1):
+                del self.called[:]
+                sync = Sync(self.amazon, shard=Shard(index, 2))
+                sync.register_type("templates", dict, Template, priority=0, sharded=False)
+                sync.register_type("roles", dict, self.make_kls("roles"), priority=1)
+
+                sync.sync({"templates": {"t": {}}, "roles": dict((name, {}) for name in names)})
+
+                mine = sorted(name for name in names if shard_for(name, 2) == index)
+                self.assertEqual(sorted(sync.synced["roles"]), mine)
+                self.assertEqual(sync.synced["templates"], ["t"])
+                self.assertEqual(sorted(name for action, typ, name in self.called if action == "setup" and typ == "roles"), mine)
+                self.assertEqual(sorted(name for action, typ, name in self.called if action == "resolve" and typ == "roles"), mine)
+
+        it "only makes instance profiles for the roles in the shard, whatever order the shards run in":
+            backend = FakeAmazonBackend(123456789012)
+            backend.add_role("existing")
+            amazon = Amazon("123456789012", "dev", {"dev": "123456789012"}, backend=backend)
+            amazon.setup()
+
+            names = ["thing{0}".format(num) for num in range(10)]
+            roles = dict((name, {"make_instance_profile": True, "allow_to_assume_me": [{"service": "ec2"}]}) for name in names)
+            for index in (0, 1):
+                sync = Sync(amazon, shard=Shard(index, 2))
+                sync.register_default_types()
+                sync.sync({"roles": roles})
+
+                done = sorted(name for name in names if shard_for(name, 2) <= index)
+                self.assertEqual(sorted(role for role in backend.roles if role != "existing"), done)
+                self.assertEqual(sorted(backend.instance_profiles), done)
+
+        it "looks for conflicts in every shard":
+            for index in (0, 1):
+                sync = Sync(self.amazon, shard=Shard(index, 2))
+                sync.register_type("roles", dict, mock.Mock(name="kls"))
+                sync.add({"roles": {"one": {}}}, "somewhere")
+                sync.add({"roles": {"one": {}}}, "somewhere_else")
+
+                with self.fuzzyAssertRaisesError(BadConfiguration):
+                    sync.combine_configurations()
+
+    describe "Compiling":
+        it "sets up things without resolving them and collects what they compile to":
+            called = []
+            def make_kls(compiled):
+                def instantiate(thing, val, amazon, templates):
+                    nxt = mock.Mock(name=thing, spec=["name", "setup", "resolve", "compiled"])
+                    nxt.name = thing
+                    nxt.setup.side_effect = lambda: called.append(("setup", thing))
+                    nxt.resolve.side_effect = lambda: called.append(("resolve", thing))
+                    nxt.compiled.return_value = compiled[thing]
+                    return nxt
+                return instantiate
+
+            compiled = {"one": mock.Mock(name="one_compiled"), "two": mock.Mock(name="two_compiled")}
+            self.sync.register_type("blah", dict, mock.Mock(name="kls", side_effect=make_kls(compiled)))
+
+            result = self.sync.compile({"blah": {"one": {}, "two": {}}, "other": {"three": {}}})
+            self.assertEqual(result, {"blah": compiled})
+            self.assertSortedEqual(called, [("setup", "one"), ("setup", "two")])
+
+        it "remembers templates for the things that use them":
+            self.sync.templates = {}
+            self.sync.register_type("templates", dict, Template, priority=0)
+            self.sync.compile({"templates": {"base": {"description": "hi"}}})
+            self.assertEqual(self.sync.templates, {"base": {"description": "hi"}})
+
+    describe "setup and resolve with a journal":
+        it "skips things that are complete and records the rest":
+            called = []
+            def make_mock(name):
+                nxt = mock.Mock(name=name, spec=["name", "definition", "setup", "resolve"])
+                nxt.name = name
+                nxt.definition = {"description": name}
+                nxt.resolve.side_effect = lambda: called.append(name)
+                return nxt
+
+            journal = mock.Mock(name="journal")
+            journal.is_complete.side_effect = lambda account, typ, name, digest: name == "thing2"
+            self.amazon.account_id = 12
+            self.amazon.dry_run = False
+            self.sync.journal = journal
+
+            self.sync.setup_and_resolve([make_mock("thing1"), make_mock("thing2"), make_mock("thing3")], "roles")
+            self.assertEqual(called, ["thing1", "thing3"])
+            self.assertEqual(self.sync.resumed["roles"], ["thing2"])
+            self.assertEqual(self.sync.synced["roles"], ["thing1", "thing2", "thing3"])
+            self.assertEqual([(call[1][2], call[1][4]) for call in journal.record.mock_calls], [("thing1", "ok"), ("thing3", "ok")])
+
+        it "doesn't hold up the changes of later things when it skips one":
+            shown = []
+            amazon = mock.Mock(name="amazon", account_id=12, dry_run=False)
+            amazon.recorder = ChangeRecorder(sink=lambda changes: shown.extend(change.values["name"] for change in changes))
+
+            def make_mock(name):
+                nxt = mock.Mock(name=name, spec=["name", "definition", "setup", "resolve"])
+                nxt.name = name
+                nxt.definition = {"description": name}
+                nxt.resolve.side_effect = lambda: amazon.recorder.record(Change("M", "role", {"name": name}))
+                return nxt
+
+            journal = mock.Mock(name="journal")
+            journal.is_complete.side_effect = lambda account, typ, name, digest: name == "thing1"
+            sync = Sync(amazon, journal=journal)
+
+            things = [make_mock("thing1"), make_mock("thing2"), make_mock("thing3")]
+            for thing in things:
+                amazon.recorder.expect(("roles", thing.name))
+            for thing in things:
+                sync.resolve_thing(thing, "roles", thing.definition)
+
+            self.assertEqual(sync.resumed["roles"], ["thing1"])
+            self.assertEqual(shown, ["thing2", "thing3"])
+
+        it "records failures":
+            thing = mock.Mock(name="thing", spec=["name", "definition", "setup", "resolve"])
+            thing.name = "thing"
+            thing.resolve.side_effect = ValueError("nope")
+            journal = mock.Mock(name="journal")
+            journal.is_complete.return_value = False
+            self.amazon.dry_run = False
+            self.sync.journal = journal
+
+            with self.fuzzyAssertRaisesError(ValueError, "nope"):
+                self.sync.setup_and_resolve([thing], "roles")
+            self.assertEqual(journal.record.mock_calls[0][1][4], "failed")
+
+        it "skips things when amazon keeps failing and carries on":
+            def make_mock(name, error=None):
+                nxt = mock.Mock(name=name, spec=["name", "definition", "setup", "resolve"])
+                nxt.name = name
+                nxt.resolve.side_effect = error
+                return nxt
+
+            journal = mock.Mock(name="journal")
+            journal.is_complete.return_value = False
+            self.amazon.dry_run = False
+            self.sync.journal = journal
+
+            self.sync.setup_and_resolve([make_mock("thing1", CircuitOpen("Amazon kept failing")), make_mock("thing2")], "roles")
+            self.assertEqual(self.sync.skipped["roles"], ["thing1"])
+            self.assertEqual(self.sync.synced["roles"], ["thing2"])
+            self.assertEqual([(call[1][2], call[1][4]) for call in journal.record.mock_calls], [("thing1", "skipped"), ("thing2", "ok")])
+
     describe "Adding configuration":
         it "complains if types is empty":
             self.assertEqual(self.sync.types, {})
@@ -0,0 +1,46 @@
+# coding: spec
+
+from iam_syncr.tracing import Tracer
+
+from tests.helpers import a_file
+
+import threading
+import json
+
+from tests.helpers import TestCase
+
+describe TestCase, "Tracer":
+    it "does nothing until started":
+        tracer = Tracer()
+        with tracer.span("parse"):
+            pass
+        self.assertEqual(tracer.as_dict()["traceEvents"], [])
+
+    it "records complete events per thread":
+        tracer = Tracer()
+        tracer.start()
+
+        with tracer.span("sync", account="dev"):
+            with tracer.span("resolve", thing="two"):
+                pass
+
+        events = tracer.as_dict()["traceEvents"]
+        complete = [event for event in events if event["ph"] == "X"]
+        self.assertEqual([event["name"] for event in complete], ["sync", "resolve"])
+        self.assertEqual(complete[0]["args"], {"account": "dev"})
+        self.assertLessEqual(complete[0]["ts"], complete[1]["ts"])
+        self.assertGreaterEqual(complete[0]["dur"], complete[1]["dur"])
+
+        names = [event for event in events if event["ph"] == "M"]
+        self.assertEqual([event["args"]["name"] for event in names], [threading.current_thread().name])
+
+    it "writes json that chrome can read":
+        tracer = Tracer()
+        tracer.start()
+        with tracer.span("parse"):
+            pass
+
+        with a_file() as filename:
+            tracer.write(filename)
+            with open(filename) as fle:
+                self.assertEqual(json.load(fle)["traceEvents"][-1]["name"], "parse")